@@ -0,0 +1,781 @@
+"""Endpoint load benchmark
+
+Boots main.app (or async_main.app) in process against local SQLite database, seeds readers,
+authors, books, rents and rent history, and sends requests to every endpoint of main.py from
+concurrent clients through httpx ASGI transport, so no server and no network are involved.
+
+For every scenario one JSON line is printed with throughput and p50/p95/p99 latency.
+--output writes the whole run as JSON report, --baseline compares the run with previous
+report and exits with code 1 if p95 latency of any scenario grew more than --tolerance.
+Run from repository root:
+
+    python benchmarks/bench_endpoints.py --requests 200 --concurrency 16
+    python benchmarks/bench_endpoints.py --app async_main --scenarios book_get book_list
+    python benchmarks/bench_endpoints.py --output run.json --baseline previous.json
+
+Tables of --db-url database are dropped and created again on every run.
+Engines are instrumented as in db/core.py, run with METRICS_ENABLED=false to measure
+the app without request metrics.
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import platform
+import random
+import subprocess
+import sys
+from collections import Counter
+from datetime import date, datetime, timedelta, timezone
+from importlib import import_module
+from time import perf_counter
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+sys.path.append(SRC_DIR)
+os.chdir(SRC_DIR)  # settings are loaded from src/.env
+
+import httpx
+from sqlalchemy import create_engine, event, insert, select
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine
+import db.core as core
+import db.search  # registers full-text search DDL before tables are created
+from config import settings
+from db.models import Base, User, Author, Book, Rent, RentHistory
+from ingest import ingest_authors, ingest_books
+from metrics import InstrumentedAsyncQueuePool, InstrumentedQueuePool, instrument_engine
+from overdue import sweep_overdue
+from pagination import encode_cursor
+from passwords import password_hasher
+from seed_rows import (
+    GENRES,
+    author_rows,
+    book_rows,
+    history_rows,
+    insert_rows,
+    reader_rows,
+    rent_rows,
+)
+
+PASSWORD = "benchmark-password"
+RETURN_DATE = (date.today() + timedelta(days=30)).isoformat()
+
+
+class Context:
+    """Seeded volumes, random generator and clients shared by scenarios"""
+
+    def __init__(self, args, rng: random.Random):
+        self.readers = args.readers
+        self.authors = args.authors
+        self.books = args.books
+        self.batch_items = args.batch_items
+        self.bulk_size = args.bulk_size
+        self.rng = rng
+        self.admin = None
+        self.anonymous = None
+        self.reader_clients = []
+        self.prepared = {}  # scenario name -> ids created by its prepare step
+
+    def reader_id(self) -> int:
+        """Random seeded reader"""
+        return self.rng.randint(1, self.readers)
+
+    def author_id(self) -> int:
+        """Random seeded author"""
+        return self.rng.randint(1, self.authors)
+
+    def book_id(self) -> int:
+        """Random seeded book"""
+        return self.rng.randint(1, self.books)
+
+
+def seed(engine, readers: int, authors: int, books: int, rents: int, history: int):
+    """Creates readers with one shared password, admin, authors, books, active rents
+    (one per reader, every tenth is overdue) and returned rents, then fills overdue_rent
+    """
+    rents = min(rents, readers)
+    password_hash = password_hasher.hash(PASSWORD)
+    with engine.begin() as connection:
+        insert_rows(
+            connection, User.__table__, reader_rows(readers, password_hash, rents)
+        )
+        connection.execute(
+            insert(User.__table__).values(
+                id=readers + 1,
+                first_name="Admin",
+                second_name="Admin",
+                birth_date=date(1990, 1, 1),
+                username="admin",
+                password=password_hash,
+                is_admin=True,
+            )
+        )
+        insert_rows(connection, Author.__table__, author_rows(authors))
+        insert_rows(connection, Book.__table__, book_rows(books, authors, quantity=100))
+        insert_rows(
+            connection,
+            Rent.__table__,
+            rent_rows(rents, readers, books, overdue_every=10),
+        )
+        insert_rows(
+            connection,
+            RentHistory.__table__,
+            history_rows(history, readers, books, first_id=rents + 1),
+        )
+    sweep_overdue(pause_sec=0)
+
+
+def _free_reader_slots(amount: int) -> list:
+    """Returns reader ids which can rent 'amount' books, a reader repeats up to its free slots"""
+    with core.SessionLocal() as session:
+        readers = session.execute(
+            select(User.id, User.active_rents)
+            .where(
+                User.is_admin == False,
+                User.active_rents < settings.BOOKS_LIMIT_FOR_READER,
+            )
+            .order_by(User.active_rents, User.id)
+        ).all()
+    # readers are interleaved, so concurrent requests rarely rent for the same reader
+    slots = [
+        reader.id
+        for slot in range(settings.BOOKS_LIMIT_FOR_READER)
+        for reader in readers
+        if reader.active_rents + slot < settings.BOOKS_LIMIT_FOR_READER
+    ]
+    if len(slots) < amount:
+        raise SystemExit(f"Readers have only {len(slots)} free rent slots, seed more")
+    return slots[:amount]
+
+
+def prepare_rent(ctx: Context, requests: int, items: int = 1) -> None:
+    """Picks readers with free slots for rent requests"""
+    ctx.prepared["rent"] = _free_reader_slots(requests * items)
+
+
+def prepare_rent_batch(ctx: Context, requests: int) -> None:
+    """Picks readers with free slots for batch rent requests"""
+    prepare_rent(ctx, requests, ctx.batch_items)
+
+
+def prepare_return(ctx: Context, requests: int, items: int = 1) -> None:
+    """Creates rents to be returned by return requests"""
+    reader_ids = _free_reader_slots(requests * items)
+    with core.SessionLocal() as session:
+        report = Rent.rent_books(
+            session,
+            [
+                (reader_id, ctx.book_id(), date.fromisoformat(RETURN_DATE))
+                for reader_id in reader_ids
+            ],
+            all_or_nothing=True,
+        )
+    ctx.prepared["return"] = [row["rent_id"] for row in report["ids"]]
+
+
+def prepare_return_batch(ctx: Context, requests: int) -> None:
+    """Creates rents to be returned by batch return requests"""
+    prepare_return(ctx, requests, ctx.batch_items)
+
+
+def prepare_author_delete(ctx: Context, requests: int) -> None:
+    """Creates authors without books to be deleted"""
+    records = [
+        {"name": f"Deleted author {i}", "bio": "bio", "birth_date": "1900-01-01"}
+        for i in range(requests)
+    ]
+    with core.SessionLocal() as session:
+        report = ingest_authors(session, records)
+    ctx.prepared["author_delete"] = [row["id"] for row in report["ids"]]
+
+
+def prepare_book_delete(ctx: Context, requests: int) -> None:
+    """Creates books without rents to be deleted"""
+    records = [
+        {
+            "name": f"Deleted book {i}",
+            "description": "description",
+            "publication_date": "1950-01-01",
+            "author_id": ctx.author_id(),
+            "genre": "deleted",
+            "quantity": 1,
+        }
+        for i in range(requests)
+    ]
+    with core.SessionLocal() as session:
+        report = ingest_books(session, records)
+    ctx.prepared["book_delete"] = [row["id"] for row in report["ids"]]
+
+
+def author_update_request(ctx: Context, i: int) -> tuple:
+    """Updates bio of seeded author, name and birth date are kept"""
+    author_id = ctx.author_id()
+    body = {
+        "name": f"Author {author_id}",
+        "bio": f"bio {i}",
+        "birth_date": "1900-01-01",
+    }
+    return f"/author/{author_id}", {"json": body}
+
+
+def book_update_request(ctx: Context, i: int) -> tuple:
+    """Updates description of seeded book, name and publication date are kept"""
+    book_id = ctx.book_id()
+    body = {
+        "name": f"Book {book_id}",
+        "description": f"description of book {book_id}, update {i}",
+        "publication_date": date(1900 + book_id % 120, 1, 1).isoformat(),
+        "author_id": book_id % ctx.authors + 1,
+        "genre": f"genre{book_id % GENRES}",
+        "quantity": 100,
+    }
+    return f"/book/{book_id}", {"json": body}
+
+
+def _new_book_body(ctx: Context, name: str) -> dict:
+    """Book record with unique name"""
+    return {
+        "name": name,
+        "description": "description",
+        "publication_date": "2000-01-01",
+        "author_id": ctx.author_id(),
+        "genre": f"genre{ctx.rng.randrange(GENRES)}",
+        "quantity": 10,
+    }
+
+
+# Every scenario: HTTP method, client role (anonymous, admin or reader), function building
+# (url, httpx request kwargs) of i-th request and optional untimed prepare step
+SCENARIOS = {
+    "auth_register": {
+        "method": "POST",
+        "role": "anonymous",
+        "request": lambda ctx, i: (
+            "/auth/register",
+            {
+                "json": {
+                    "first_name": "New",
+                    "second_name": "Reader",
+                    "birth_date": "1990-01-01",
+                    "username": f"new{i}",
+                    "password": PASSWORD,
+                }
+            },
+        ),
+    },
+    "auth_login": {
+        "method": "POST",
+        "role": "anonymous",
+        "request": lambda ctx, i: (
+            "/auth/login",
+            {"json": {"username": f"reader{ctx.reader_id()}", "password": PASSWORD}},
+        ),
+    },
+    "auth_refresh": {
+        "method": "GET",
+        "role": "reader",
+        "request": lambda ctx, i: ("/auth/refresh", {}),
+    },
+    "auth_logout": {
+        "method": "GET",
+        "role": "anonymous",
+        "request": lambda ctx, i: ("/auth/logout", {}),
+    },
+    "author_create": {
+        "method": "POST",
+        "role": "admin",
+        "request": lambda ctx, i: (
+            "/author/create",
+            {
+                "json": {
+                    "name": f"New author {i}",
+                    "bio": "bio",
+                    "birth_date": "1950-01-01",
+                }
+            },
+        ),
+    },
+    "author_bulk": {
+        "method": "POST",
+        "role": "admin",
+        "request": lambda ctx, i: (
+            "/author/bulk",
+            {
+                "json": [
+                    {
+                        "name": f"Bulk author {i}-{k}",
+                        "bio": "bio",
+                        "birth_date": "1950-01-01",
+                    }
+                    for k in range(ctx.bulk_size)
+                ]
+            },
+        ),
+    },
+    "author_get": {
+        "method": "GET",
+        "role": "admin",
+        "request": lambda ctx, i: (f"/author/{ctx.author_id()}", {}),
+    },
+    "author_list": {
+        "method": "GET",
+        "role": "admin",
+        "request": lambda ctx, i: ("/author", {"params": {"after": ctx.author_id()}}),
+    },
+    "author_update": {
+        "method": "PUT",
+        "role": "admin",
+        "request": author_update_request,
+    },
+    "author_delete": {
+        "method": "DELETE",
+        "role": "admin",
+        "request": lambda ctx, i: (f"/author/{ctx.prepared['author_delete'][i]}", {}),
+        "prepare": prepare_author_delete,
+    },
+    "book_create": {
+        "method": "POST",
+        "role": "admin",
+        "request": lambda ctx, i: (
+            "/book/create",
+            {"json": _new_book_body(ctx, f"New book {i}")},
+        ),
+    },
+    "book_bulk": {
+        "method": "POST",
+        "role": "admin",
+        "request": lambda ctx, i: (
+            "/book/bulk",
+            {
+                "json": [
+                    _new_book_body(ctx, f"Bulk book {i}-{k}")
+                    for k in range(ctx.bulk_size)
+                ]
+            },
+        ),
+    },
+    "book_get": {
+        "method": "GET",
+        "role": "admin",
+        "request": lambda ctx, i: (f"/book/{ctx.book_id()}", {}),
+    },
+    "book_get_reader": {
+        "method": "GET",
+        "role": "reader",
+        "request": lambda ctx, i: (f"/book/{ctx.book_id()}", {}),
+    },
+    "book_list": {
+        "method": "GET",
+        "role": "admin",
+        "request": lambda ctx, i: (
+            "/book",
+            {"params": {"after": encode_cursor(ctx.book_id())}},
+        ),
+    },
+    "book_list_filtered": {
+        "method": "GET",
+        "role": "admin",
+        "request": lambda ctx, i: (
+            "/book",
+            {
+                "params": {
+                    "genre": f"genre{ctx.rng.randrange(GENRES)}",
+                    "available": "true",
+                    "sort": "-publication_date",
+                }
+            },
+        ),
+    },
+    "book_search": {
+        "method": "GET",
+        "role": "reader",
+        "request": lambda ctx, i: (
+            "/book/search",
+            {"params": {"q": f"book {ctx.book_id()}"}},
+        ),
+    },
+    "book_update": {
+        "method": "PUT",
+        "role": "admin",
+        "request": book_update_request,
+    },
+    "book_delete": {
+        "method": "DELETE",
+        "role": "admin",
+        "request": lambda ctx, i: (f"/book/{ctx.prepared['book_delete'][i]}", {}),
+        "prepare": prepare_book_delete,
+    },
+    "rent": {
+        "method": "POST",
+        "role": "admin",
+        "request": lambda ctx, i: (
+            "/book/rent",
+            {
+                "json": {
+                    "reader_id": ctx.prepared["rent"][i],
+                    "book_id": ctx.book_id(),
+                    "return_date": RETURN_DATE,
+                }
+            },
+        ),
+        "prepare": prepare_rent,
+    },
+    "rent_batch": {
+        "method": "POST",
+        "role": "admin",
+        "request": lambda ctx, i: (
+            "/book/rent/batch",
+            {
+                "json": [
+                    {
+                        "reader_id": reader_id,
+                        "book_id": ctx.book_id(),
+                        "return_date": RETURN_DATE,
+                    }
+                    for reader_id in ctx.prepared["rent"][
+                        i * ctx.batch_items : (i + 1) * ctx.batch_items
+                    ]
+                ]
+            },
+        ),
+        "prepare": prepare_rent_batch,
+    },
+    "return": {
+        "method": "POST",
+        "role": "admin",
+        "request": lambda ctx, i: (
+            "/book/return",
+            {"json": {"rent_id": ctx.prepared["return"][i]}},
+        ),
+        "prepare": prepare_return,
+    },
+    "return_batch": {
+        "method": "POST",
+        "role": "admin",
+        "request": lambda ctx, i: (
+            "/book/return/batch",
+            {
+                "json": [
+                    {"rent_id": rent_id}
+                    for rent_id in ctx.prepared["return"][
+                        i * ctx.batch_items : (i + 1) * ctx.batch_items
+                    ]
+                ]
+            },
+        ),
+        "prepare": prepare_return_batch,
+    },
+    "rent_overdue": {
+        "method": "GET",
+        "role": "admin",
+        "request": lambda ctx, i: ("/rent/overdue", {}),
+    },
+    "rent_history": {
+        "method": "GET",
+        "role": "admin",
+        "request": lambda ctx, i: (
+            "/rent/history",
+            {"params": {"reader_id": ctx.reader_id()}},
+        ),
+    },
+    "reader_list": {
+        "method": "GET",
+        "role": "admin",
+        "request": lambda ctx, i: ("/reader", {"params": {"after": ctx.reader_id()}}),
+    },
+    "reader_get": {
+        "method": "GET",
+        "role": "admin",
+        "request": lambda ctx, i: (f"/reader/{ctx.reader_id()}", {}),
+    },
+    "profile_get": {
+        "method": "GET",
+        "role": "reader",
+        "request": lambda ctx, i: ("/profile", {}),
+    },
+    "profile_update": {
+        "method": "PUT",
+        "role": "reader",
+        "request": lambda ctx, i: (
+            "/profile",
+            {
+                "json": {
+                    "first_name": "Reader",
+                    "second_name": f"U{i}",
+                    "birth_date": "1990-01-01",
+                }
+            },
+        ),
+    },
+    "export_author": {
+        "method": "GET",
+        "role": "admin",
+        "request": lambda ctx, i: ("/export/author", {}),
+    },
+    "stats_cache": {
+        "method": "GET",
+        "role": "admin",
+        "request": lambda ctx, i: ("/stats/cache", {}),
+    },
+}
+
+
+def percentile(latencies: list, q: float) -> float:
+    """Nearest-rank percentile of sorted latencies"""
+    return latencies[max(math.ceil(q / 100 * len(latencies)), 1) - 1]
+
+
+async def run_scenario(
+    ctx: Context, name: str, requests: int, concurrency: int
+) -> dict:
+    """Sends 'requests' requests of scenario from 'concurrency' concurrent clients"""
+    scenario = SCENARIOS[name]
+    if "prepare" in scenario:
+        await asyncio.to_thread(scenario["prepare"], ctx, requests)
+    calls = [scenario["request"](ctx, i) for i in range(requests)]
+    clients = {
+        "anonymous": lambda i: ctx.anonymous,
+        "admin": lambda i: ctx.admin,
+        "reader": lambda i: ctx.reader_clients[i % len(ctx.reader_clients)],
+    }[scenario["role"]]
+
+    latencies = []
+    status_codes = Counter()
+    next_calls = iter(
+        range(requests)
+    )  # shared by workers, so each request is sent once
+
+    async def worker() -> None:
+        for i in next_calls:
+            url, kwargs = calls[i]
+            started = perf_counter()
+            response = await clients(i).request(scenario["method"], url, **kwargs)
+            latencies.append(perf_counter() - started)
+            status_codes[response.status_code] += 1
+
+    started = perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = perf_counter() - started
+
+    latencies.sort()
+    return {
+        "benchmark": "endpoint_load",
+        "scenario": name,
+        "method": scenario["method"],
+        "requests": requests,
+        "concurrency": concurrency,
+        "errors": sum(count for code, count in status_codes.items() if code >= 400),
+        "status_codes": {
+            str(code): count for code, count in sorted(status_codes.items())
+        },
+        "seconds": round(elapsed, 4),
+        "throughput_rps": round(requests / elapsed, 2),
+        "mean_ms": round(sum(latencies) / len(latencies) * 1000, 3),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+        "max_ms": round(latencies[-1] * 1000, 3),
+    }
+
+
+async def _login(client: httpx.AsyncClient, username: str) -> None:
+    """Logs client in, tokens are kept in its cookies"""
+    response = await client.post(
+        "/auth/login", json={"username": username, "password": PASSWORD}
+    )
+    response.raise_for_status()
+
+
+async def run(
+    app, ctx: Context, scenarios: list, requests: int, concurrency: int
+) -> list:
+    """Logs clients in and runs scenarios one after another"""
+    transport = httpx.ASGITransport(app=app)
+
+    def client() -> httpx.AsyncClient:
+        return httpx.AsyncClient(transport=transport, base_url="http://testserver")
+
+    ctx.anonymous, ctx.admin = client(), client()
+    ctx.reader_clients = [client() for _ in range(concurrency)]
+    await _login(ctx.admin, "admin")
+    for number, reader_client in enumerate(ctx.reader_clients, start=1):
+        await _login(reader_client, f"reader{number}")
+
+    results = []
+    try:
+        for name in scenarios:
+            result = await run_scenario(ctx, name, requests, concurrency)
+            print(json.dumps(result), flush=True)
+            results.append(result)
+    finally:
+        for opened in [ctx.anonymous, ctx.admin] + ctx.reader_clients:
+            await opened.aclose()
+    return results
+
+
+def compare(results: list, baseline: dict, tolerance: float) -> list:
+    """Returns scenarios whose p95 latency grew more than tolerance or which got errors"""
+    previous = {row["scenario"]: row for row in baseline["results"]}
+    regressions = []
+    for row in results:
+        old = previous.get(row["scenario"])
+        if old is None:
+            continue
+        if (
+            row["p95_ms"] > old["p95_ms"] * (1 + tolerance)
+            or row["errors"] > old["errors"]
+        ):
+            regressions.append(
+                {
+                    "scenario": row["scenario"],
+                    "p95_ms": row["p95_ms"],
+                    "baseline_p95_ms": old["p95_ms"],
+                    "errors": row["errors"],
+                    "baseline_errors": old["errors"],
+                }
+            )
+    return regressions
+
+
+def _git_revision() -> str | None:
+    """Current commit of repository, None outside of git checkout"""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def configure_database(db_url: str, app_name: str, pool_size: int):
+    """Binds session factories of the app to benchmark database and recreates its tables"""
+    url = make_url(db_url)
+    connect_args = {}
+    if url.get_backend_name() == "sqlite":
+        connect_args = {"timeout": 60, "check_same_thread": False}
+    engine = create_engine(
+        url,
+        pool_size=pool_size,
+        max_overflow=pool_size,
+        connect_args=connect_args,
+        poolclass=InstrumentedQueuePool,
+    )
+    instrument_engine("sync", engine)
+    if url.get_backend_name() == "sqlite":
+
+        @event.listens_for(engine, "connect")
+        def _wal(connection, record) -> None:
+            # readers don`t wait for writers, as in PostgreSQL
+            connection.execute("PRAGMA journal_mode=WAL")
+
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    core.SessionLocal.configure(bind=engine)
+    if app_name == "async_main":
+        async_url = (
+            url.set(drivername="sqlite+aiosqlite")
+            if url.get_backend_name() == "sqlite"
+            else url
+        )
+        async_engine = create_async_engine(
+            async_url,
+            connect_args={"timeout": 60} if connect_args else {},
+            poolclass=InstrumentedAsyncQueuePool,
+        )
+        instrument_engine("async", async_engine)
+        core.AsyncSessionLocal.configure(bind=async_engine)
+    return engine
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--app", choices=["main", "async_main"], default="main")
+    parser.add_argument("--db-url", default="sqlite:////tmp/bench_endpoints.sqlite")
+    parser.add_argument("--readers", type=int, default=2_000)
+    parser.add_argument("--authors", type=int, default=500)
+    parser.add_argument("--books", type=int, default=10_000)
+    parser.add_argument("--rents", type=int, default=1_000, help="active rents")
+    parser.add_argument("--history", type=int, default=20_000, help="returned rents")
+    parser.add_argument(
+        "--requests", type=int, default=200, help="requests per scenario"
+    )
+    parser.add_argument(
+        "--concurrency", type=int, default=16, help="concurrent clients"
+    )
+    parser.add_argument(
+        "--batch-items", type=int, default=5, help="items of batch rent and return"
+    )
+    parser.add_argument(
+        "--bulk-size", type=int, default=50, help="records of bulk create"
+    )
+    parser.add_argument(
+        "--scenarios", nargs="+", choices=SCENARIOS.keys(), default=list(SCENARIOS)
+    )
+    parser.add_argument("--seed", type=int, default=1, help="seed of random ids")
+    parser.add_argument("--output", help="write JSON report of the run to file")
+    parser.add_argument(
+        "--baseline", help="JSON report of previous run to compare with"
+    )
+    parser.add_argument(
+        "--tolerance", type=float, default=0.2, help="allowed p95 growth, 0.2 = 20%%"
+    )
+    args = parser.parse_args()
+
+    engine = configure_database(args.db_url, args.app, args.concurrency)
+    seed(engine, args.readers, args.authors, args.books, args.rents, args.history)
+    app = import_module(args.app).app
+    ctx = Context(args, random.Random(args.seed))
+    results = asyncio.run(
+        run(app, ctx, args.scenarios, args.requests, args.concurrency)
+    )
+
+    report = {
+        "meta": {
+            "app": args.app,
+            "dialect": engine.dialect.name,
+            "revision": _git_revision(),
+            "started_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "cpus": os.cpu_count(),
+            "volumes": {
+                "readers": args.readers,
+                "authors": args.authors,
+                "books": args.books,
+                "rents": args.rents,
+                "history": args.history,
+            },
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "seed": args.seed,
+            "metrics_enabled": settings.METRICS_ENABLED,
+        },
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(report, file, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as file:
+            baseline = json.load(file)
+        regressions = compare(results, baseline, args.tolerance)
+        # runs are comparable only with the same app, database and load
+        mismatched = [
+            key
+            for key in (
+                "app",
+                "dialect",
+                "volumes",
+                "requests",
+                "concurrency",
+                "metrics_enabled",
+            )
+            if baseline["meta"].get(key) != report["meta"][key]
+        ]
+        print(json.dumps({"regressions": regressions, "mismatched_meta": mismatched}))
+        sys.exit(1 if regressions else 0)
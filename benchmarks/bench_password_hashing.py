@@ -0,0 +1,74 @@
+"""Password hashing benchmark
+
+Measures logins/sec of PasswordHasher.verify for scrypt hashes and per one CPU core.
+Run from repository root:
+
+    python benchmarks/bench_password_hashing.py --logins 200 --workers 1 2 4
+"""
+
+import argparse
+import json
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from time import perf_counter
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+sys.path.append(SRC_DIR)
+os.chdir(SRC_DIR)  # settings are loaded from src/.env
+
+from config import settings
+from passwords import PasswordHasher
+
+
+def run(workers: int, logins: int, use_processes: bool) -> dict:
+    """Verifies password 'logins' times through hasher with 'workers' pool workers"""
+    hasher = PasswordHasher(
+        n=settings.PASSWORD_HASH_N,
+        r=settings.PASSWORD_HASH_R,
+        p=settings.PASSWORD_HASH_P,
+        workers=workers,
+        max_pending=logins,
+        queue_timeout_sec=60,
+        use_processes=use_processes,
+    )
+    password_hash = hasher.hash("benchmark password")
+
+    started = perf_counter()
+    with ThreadPoolExecutor(max_workers=workers * 2) as clients:
+        results = list(
+            clients.map(
+                lambda _: hasher.verify("benchmark password", password_hash),
+                range(logins),
+            )
+        )
+    elapsed = perf_counter() - started
+    hasher.shutdown()
+
+    assert all(results)
+    cores = min(workers, os.cpu_count() or 1)
+    return {
+        "benchmark": "password_verify",
+        "pool": "process" if use_processes else "thread",
+        "workers": workers,
+        "cores": cores,
+        "n": settings.PASSWORD_HASH_N,
+        "r": settings.PASSWORD_HASH_R,
+        "p": settings.PASSWORD_HASH_P,
+        "logins": logins,
+        "seconds": round(elapsed, 4),
+        "logins_per_sec": round(logins / elapsed, 2),
+        "logins_per_sec_per_core": round(logins / elapsed / cores, 2),
+        "cpu_ms_per_login": round(elapsed / logins * 1000 * cores, 3),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--logins", type=int, default=100)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, os.cpu_count() or 1])
+    parser.add_argument("--processes", action="store_true", help="use process pool")
+    args = parser.parse_args()
+
+    for workers in args.workers:
+        print(json.dumps(run(workers, args.logins, args.processes)))
@@ -0,0 +1,101 @@
+"""Listing serialization benchmark
+
+Measures per-row cost of turning a page of Book ORM objects into response bytes:
+
+* jsonable_encoder - endpoint without response_model: jsonable_encoder and JSONResponse
+* response_model - PageModel[BookResponseModel] validated from ORM attributes,
+  dumped by pydantic and rendered by ORJSONResponse
+
+No database is needed, books are transient ORM objects. Run from repository root:
+
+    python benchmarks/bench_serialization.py --rows 50 500 5000
+"""
+
+import argparse
+import json
+import os
+import sys
+from datetime import date
+from time import perf_counter
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+sys.path.append(SRC_DIR)
+os.chdir(SRC_DIR)  # settings are loaded from src/.env
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, ORJSONResponse
+from pydantic import TypeAdapter
+from db.models import Book
+from validators import PageModel, BookResponseModel
+
+page_adapter = TypeAdapter(PageModel[BookResponseModel])
+
+
+def make_books(rows: int) -> list:
+    """Creates transient books with all attributes loaded"""
+    books = []
+    for i in range(1, rows + 1):
+        book = Book(
+            f"Book {i}", "description " * 20, date(1950, 1, 1), i % 100 + 1, "novel", 10
+        )
+        book.id = i
+        book.version = 1
+        books.append(book)
+    return books
+
+
+def serialize_jsonable_encoder(page: dict) -> bytes:
+    """Response body as FastAPI renders it without response_model"""
+    return JSONResponse(jsonable_encoder(page)).body
+
+
+def serialize_response_model(page: dict) -> bytes:
+    """Response body as FastAPI renders it with response_model and ORJSONResponse"""
+    content = page_adapter.dump_python(page_adapter.validate_python(page), mode="json")
+    return ORJSONResponse(content).body
+
+
+MODES = {
+    "jsonable_encoder": serialize_jsonable_encoder,
+    "response_model": serialize_response_model,
+}
+
+
+def run(mode: str, rows: int, repeat: int) -> dict:
+    """Serializes page of 'rows' books 'repeat' times"""
+    page = {"items": make_books(rows), "next_cursor": rows}
+    serialize = MODES[mode]
+    body = serialize(page)  # warm up
+
+    started = perf_counter()
+    for _ in range(repeat):
+        serialize(page)
+    elapsed = perf_counter() - started
+
+    return {
+        "benchmark": "listing_serialization",
+        "mode": mode,
+        "rows": rows,
+        "repeat": repeat,
+        "body_bytes": len(body),
+        "ms_per_page": round(elapsed / repeat * 1000, 3),
+        "us_per_row": round(elapsed / repeat / rows * 1_000_000, 3),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[50, 500, 5000])
+    parser.add_argument(
+        "--rows-per-mode",
+        type=int,
+        default=200_000,
+        help="rows serialized by each mode, repeat = rows-per-mode / rows",
+    )
+    parser.add_argument("--modes", nargs="+", choices=MODES.keys(), default=list(MODES))
+    args = parser.parse_args()
+
+    for rows in args.rows:
+        repeat = max(args.rows_per_mode // rows, 1)
+        for mode in args.modes:
+            print(json.dumps(run(mode, rows, repeat)))
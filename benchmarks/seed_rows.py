@@ -0,0 +1,103 @@
+"""Rows of seeded databases shared by benchmarks and tests
+
+Row factories yield dicts for Core executemany inserts, 'insert_rows' writes them in batches.
+bench_endpoints.py, stress_rent.py, tests/test_query_plans.py and tests/test_rent_concurrency.py
+seed their databases with them, so benchmark data and query plan test data have the same shape.
+Scripts of this directory import it as 'seed_rows', tests as 'benchmarks.seed_rows'.
+"""
+
+from datetime import date, timedelta
+from sqlalchemy import insert
+from db.models import Author, Book
+
+INSERT_BATCH = 5000
+GENRES = 50
+HISTORY_DAYS = 5 * 365  # returned rents are spread over issue dates of last years
+BIRTH_DATE = date(1990, 1, 1)
+
+
+def insert_rows(connection, table, rows) -> None:
+    """Inserts rows with executemany in batches"""
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == INSERT_BATCH:
+            connection.execute(insert(table), batch)
+            batch = []
+    if batch:
+        connection.execute(insert(table), batch)
+
+
+def reader_rows(readers: int, password: str = "-", rents: int = 0):
+    """Readers with ids 1..readers, active_rents match rents of 'rent_rows(rents, readers, ...)'"""
+    for i in range(1, readers + 1):
+        yield {
+            "id": i,
+            "first_name": "Reader",
+            "second_name": f"N{i}",
+            "birth_date": BIRTH_DATE,
+            "username": f"reader{i}",
+            "password": password,
+            "is_admin": False,
+            "active_rents": rents // readers + (1 if i <= rents % readers else 0),
+        }
+
+
+def author_rows(authors: int):
+    """Authors with ids 1..authors"""
+    for i in range(1, authors + 1):
+        yield {
+            "id": i,
+            "name": f"Author {i}",
+            "bio": "bio",
+            "birth_date": date(1900, 1, 1),
+            "author_hash": Author.make_hash(f"Author {i}", date(1900, 1, 1)),
+        }
+
+
+def book_rows(books: int, authors: int, quantity: int, genres: int = GENRES):
+    """Books with ids 1..books spread over authors, genres and publication years 1900-2019"""
+    for i in range(1, books + 1):
+        publication_date = date(1900 + i % 120, 1, 1)
+        yield {
+            "id": i,
+            "name": f"Book {i}",
+            "description": f"description of book {i} in genre{i % genres}",
+            "publication_date": publication_date,
+            "author_id": i % authors + 1,
+            "genre": f"genre{i % genres}",
+            "quantity": quantity,
+            "book_hash": Book.make_hash(f"Book {i}", publication_date),
+        }
+
+
+def rent_rows(rents: int, readers: int, books: int, overdue_every: int):
+    """Active rents with ids 1..rents, readers take them in turn, every 'overdue_every' one is overdue"""
+    today = date.today()
+    for i in range(1, rents + 1):
+        yield {
+            "rent_id": i,
+            "reader_id": (i - 1) % readers + 1,
+            "book_id": i % books + 1,
+            "issue_date": today - timedelta(days=40),
+            "return_date": (
+                today - timedelta(days=10)
+                if i % overdue_every == 0
+                else today + timedelta(days=i % 60 + 1)
+            ),
+        }
+
+
+def history_rows(history: int, readers: int, books: int, first_id: int):
+    """Returned rents with ids from first_id, issued over last HISTORY_DAYS days"""
+    today = date.today()
+    for i in range(1, history + 1):
+        issue_date = today - timedelta(days=i % HISTORY_DAYS + 60)
+        yield {
+            "rent_id": first_id + i - 1,
+            "reader_id": i % readers + 1,
+            "book_id": i % books + 1,
+            "issue_date": issue_date,
+            "return_date": issue_date + timedelta(days=30),
+            "returned_date": issue_date + timedelta(days=20),
+        }
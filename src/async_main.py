@@ -0,0 +1,711 @@
+"""Async serving mode with FastAPI endpoints
+
+Run with 'uvicorn async_main:app' instead of 'uvicorn main:app'.
+Book, author, rent, reader and profile endpoints use AsyncSession on the async engine,
+authentication endpoints are shared with the sync mode in main.py
+"""
+
+from typing import Annotated, Literal
+from fastapi import FastAPI, Request, Response, HTTPException, Depends, Query, Body
+from fastapi.responses import ORJSONResponse
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from db.models import User, Author, Book, Rent, TableVersion
+from db.core import get_async_session
+from overdue import overdue_sweeper_lifespan
+from config import settings
+from db.search import search_books
+from auth import AsyncValidation, TokenRenewalMiddleware
+from metrics import MetricsMiddleware
+from query_budget import query_budget
+from pagination import (
+    PageParams,
+    CursorPageParams,
+    OffsetPageParams,
+    paginate,
+    make_page,
+    make_sorted_page,
+    make_offset_page,
+)
+from etag import make_etag, etag_matches, set_etag, not_modified
+from validators import *
+import main
+
+
+app = FastAPI(default_response_class=ORJSONResponse, lifespan=overdue_sweeper_lifespan)
+app.add_middleware(TokenRenewalMiddleware)
+app.add_middleware(MetricsMiddleware)
+
+app.add_route(
+    "/auth/refresh", main.refresh, methods=["GET", "POST", "DELETE", "PUT"]
+)
+app.add_api_route("/auth/register", main.register, methods=["POST"])
+app.add_api_route("/auth/login", main.login, methods=["POST"])
+app.add_api_route("/auth/logout", main.logout, methods=["GET"])
+app.add_api_route("/stats/cache", main.get_cache_stats, methods=["GET"])
+app.add_api_route(
+    "/metrics", main.get_metrics, methods=["GET"], include_in_schema=False
+)
+app.add_api_route("/export/{table}", main.export_table, methods=["GET"])
+app.add_api_route("/author/bulk", main.create_authors_bulk, methods=["POST"])
+app.add_api_route("/book/bulk", main.create_books_bulk, methods=["POST"])
+
+
+def check_int_range(value: int, detail: str = "Value out of int range") -> None:
+    """Raises HTTPException if value doesn't fit into int column"""
+    if value not in range(-2_147_483_647, 2_147_483_647):
+        raise HTTPException(status_code=400, detail=detail)
+
+
+@app.post("/author/create")
+@query_budget(3)
+async def create_author(
+    request: Request,
+    author_input: AuthorCreateModel,
+    session: AsyncSession = Depends(get_async_session),
+):
+    """Async version of main.create_author"""
+    validation_response = await AsyncValidation(request, session).validate(
+        request, True
+    )
+    if validation_response is not None:
+        return validation_response
+
+    author = Author(author_input.name, author_input.bio, author_input.birth_date)
+    try:
+        session.add(author)
+        await session.commit()
+    except Exception as e:
+        await session.rollback()
+        raise HTTPException(
+            status_code=400, detail="Cannot create author. Check request."
+        )
+
+    return {"status": "Ok", "detail": "Author created"}
+
+
+@app.get("/author/{id}", response_model=AuthorResponseModel | None)
+@query_budget(3)
+async def get_author(
+    id: int,
+    request: Request,
+    session: AsyncSession = Depends(get_async_session),
+):
+    """Async version of main.get_author"""
+    validation_response = await AsyncValidation(request, session).validate(
+        request, True
+    )
+    if validation_response is not None:
+        return validation_response
+
+    check_int_range(id)
+
+    key = main.detail_cache_key("author", id, True)
+    cached_author = main.response_cache.get(key)
+    etag = None
+    if cached_author is not None:
+        etag = cached_author["etag"]
+    elif "if-none-match" in request.headers:
+        version = await session.scalar(main.AUTHOR_VERSION, {"author_id": id})
+        if version is not None:
+            etag = make_etag("author", id, version)
+    if etag is not None and etag_matches(request, etag):
+        return not_modified(etag)
+
+    if cached_author is None:
+        generation = main.response_cache.generation(key)
+        author = await session.get(Author, id)
+        if author is None:
+            return None
+        cached_author = {
+            "etag": make_etag("author", id, author.version),
+            "body": AuthorResponseModel.model_validate(author).model_dump(mode="json"),
+        }
+        main.response_cache.set(key, cached_author, generation=generation)
+
+    return main.detail_response(cached_author)
+
+
+@app.get("/author", response_model=PageModel[AuthorResponseModel])
+@query_budget(3)
+async def get_all_authors(
+    request: Request,
+    response: Response,
+    page: PageParams = Depends(),
+    session: AsyncSession = Depends(get_async_session),
+):
+    """Async version of main.get_all_authors"""
+    validation_response = await AsyncValidation(request, session).validate(
+        request, True
+    )
+    if validation_response is not None:
+        return validation_response
+
+    version = await session.run_sync(TableVersion.get, "author_table")
+    etag = main.list_etag("author_table", version, page)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+
+    authors = await session.scalars(paginate(select(Author), Author.id, page))
+    set_etag(response, etag)
+    return make_page(authors.all(), page)
+
+
+@app.put("/author/{id}")
+@query_budget(5)
+async def update_author(
+    request: Request,
+    author_input: AuthorCreateModel,
+    id: int,
+    session: AsyncSession = Depends(get_async_session),
+):
+    """Async version of main.update_author"""
+    validation_response = await AsyncValidation(request, session).validate(
+        request, True
+    )
+    if validation_response is not None:
+        return validation_response
+
+    check_int_range(id)
+    author = await session.get(Author, id)
+
+    try:
+        author.name = author_input.name
+        author.bio = author_input.bio
+        author.birth_date = author_input.birth_date
+        await session.commit()
+    except Exception as e:
+        await session.rollback()
+        raise HTTPException(
+            status_code=400,
+            detail="Cannot update author information. Check your request.",
+        )
+
+    main.invalidate_details("author", id)
+    book_ids = await session.scalars(select(Book.id).where(Book.author_id == id))
+    main.invalidate_details("book", *book_ids)
+    return {"status": "Ok", "detail": "Author info updated"}
+
+
+@app.delete("/author/{id}")
+@query_budget(4)
+async def delete_author(
+    request: Request, id: int, session: AsyncSession = Depends(get_async_session)
+):
+    """Async version of main.delete_author"""
+    validation_response = await AsyncValidation(request, session).validate(
+        request, True
+    )
+    if validation_response is not None:
+        return validation_response
+
+    check_int_range(id)
+
+    author = await session.get(Author, id)
+    if author is None:
+        raise HTTPException(status_code=404, detail="Author not found")
+    try:
+        await session.delete(author)
+        await session.commit()
+    except IntegrityError:
+        raise HTTPException(status_code=400, detail="Cannot delete author with books")
+
+    main.invalidate_details("author", id)
+    return {"status": "Ok", "detail": "Author deleted"}
+
+
+@app.post("/book/create")
+@query_budget(4)
+async def create_book(
+    request: Request,
+    book_input: BookCreateModel,
+    session: AsyncSession = Depends(get_async_session),
+):
+    """Async version of main.create_book"""
+    validation_response = await AsyncValidation(request, session).validate(
+        request, True
+    )
+    if validation_response is not None:
+        return validation_response
+
+    check_int_range(book_input.quantity)
+    author = await session.get(Author, book_input.author_id)
+    if author is None:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Author with author_id = {book_input.author_id} doesn't exist.",
+        )
+
+    try:
+        book = Book(
+            book_input.name,
+            book_input.description,
+            book_input.publication_date,
+            book_input.author_id,
+            book_input.genre,
+            book_input.quantity,
+        )
+        session.add(book)
+        await session.commit()
+    except Exception as e:
+        await session.rollback()
+        raise HTTPException(
+            status_code=400, detail="Cannot create new book. Check your request."
+        )
+
+    return {"status": "Ok", "detail": "Book was created"}
+
+
+@app.get("/book/search", response_model=OffsetPageModel[BookSearchResultModel])
+@query_budget(2)
+async def search_book(
+    request: Request,
+    q: str = Query(min_length=1, max_length=200),
+    page: OffsetPageParams = Depends(),
+    session: AsyncSession = Depends(get_async_session),
+):
+    """Async version of main.search_book"""
+    validation_response = await AsyncValidation(request, session).validate(request)
+    if validation_response is not None:
+        return validation_response
+    if not q.split():
+        raise HTTPException(status_code=400, detail="Empty search query")
+
+    dialect_name = session.bind.dialect.name
+    statement = search_books(dialect_name, q, page.limit, page.offset)
+    books = (await session.execute(statement)).all()
+    return make_offset_page(books, page)
+
+
+@app.get(
+    "/book/{id}", response_model=BookResponseModel | BookReaderResponseModel | None
+)
+@query_budget(3)
+async def get_book(
+    request: Request,
+    id: int,
+    session: AsyncSession = Depends(get_async_session),
+):
+    """Async version of main.get_book"""
+    validation = AsyncValidation(request, session)
+    validation_response = await validation.validate(request)
+    if validation_response is not None:
+        return validation_response
+    check_int_range(id, "Value out if int range")
+
+    is_admin = validation.is_admin
+    key = main.detail_cache_key("book", id, is_admin)
+    cached_book = main.response_cache.get(key)
+    etag = None
+    if cached_book is not None:
+        etag = cached_book["etag"]
+    elif "if-none-match" in request.headers:
+        result = await session.execute(main.BOOK_VERSIONS, {"book_id": id})
+        versions = result.first()
+        if versions is not None:
+            etag = main.book_etag(id, is_admin, *versions)
+    if etag is not None and etag_matches(request, etag):
+        return not_modified(etag)
+
+    if cached_book is None:
+        generation = main.response_cache.generation(key)
+        if is_admin:
+            book = await session.get(Book, id)
+            versions = (book.version, None) if book is not None else None
+        else:
+            result = await session.execute(main.BOOK_READER_VIEW, {"book_id": id})
+            book = result.mappings().first()
+            if book is not None:
+                book = dict(book)
+                versions = (book.pop("book_version"), book.pop("author_version"))
+        if book is None:
+            return None
+        cached_book = {
+            "etag": main.book_etag(id, is_admin, *versions),
+            "body": main.book_body(book, is_admin),
+        }
+        main.response_cache.set(key, cached_book, generation=generation)
+
+    return main.detail_response(cached_book)
+
+
+@app.get("/book", response_model=CursorPageModel[BookResponseModel])
+@query_budget(3)
+async def get_all_books(
+    request: Request,
+    response: Response,
+    filters: Annotated[BookFilterModel, Query()],
+    page: CursorPageParams = Depends(),
+    session: AsyncSession = Depends(get_async_session),
+):
+    """Async version of main.get_all_books"""
+    validation_response = await AsyncValidation(request, session).validate(
+        request, True
+    )
+    if validation_response is not None:
+        return validation_response
+
+    statement = main.book_list_statement(filters, page)
+    if "if-none-match" in request.headers:
+        result = await session.execute(
+            statement.with_only_columns(Book.id, Book.version)
+        )
+        etag = main.list_etag(
+            "book_table", main.rows_version(result.all()), page, filters
+        )
+        if etag_matches(request, etag):
+            return not_modified(etag)
+
+    books = (await session.scalars(statement)).all()
+    versions = [(book.id, book.version) for book in books]
+    set_etag(
+        response,
+        main.list_etag("book_table", main.rows_version(versions), page, filters),
+    )
+    return make_sorted_page(books, page, main.BOOK_SORTS[filters.sort][0], Book.id)
+
+
+@app.put("/book/{id}")
+@query_budget(5)
+async def update_book(
+    request: Request,
+    book_input: BookCreateModel,
+    id: int,
+    session: AsyncSession = Depends(get_async_session),
+):
+    """Async version of main.update_book"""
+    validation_response = await AsyncValidation(request, session).validate(
+        request, True
+    )
+    if validation_response is not None:
+        return validation_response
+
+    check_int_range(id, "id value out of int range")
+    check_int_range(book_input.quantity, "Quantity value out of int range")
+    author = await session.get(Author, book_input.author_id)
+    if author is None:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Author with author_id = {book_input.author_id} doesn't exist.",
+        )
+
+    book = await session.get(Book, id)
+
+    try:
+        book.name = book_input.name
+        book.description = book_input.description
+        book.publication_date = book_input.publication_date
+        book.author_id = book_input.author_id
+        book.genre = book_input.genre
+        book.quantity = book_input.quantity
+        await session.commit()
+    except Exception as e:
+        await session.rollback()
+        raise HTTPException(
+            status_code=400, detail="Cannot update book. Check your request."
+        )
+
+    main.invalidate_details("book", id)
+    return {"status": "Ok", "detail": "Book was updated"}
+
+
+@app.delete("/book/{id}")
+@query_budget(4)
+async def delete_book(
+    request: Request, id: int, session: AsyncSession = Depends(get_async_session)
+):
+    """Async version of main.delete_book"""
+    validation_response = await AsyncValidation(request, session).validate(
+        request, True
+    )
+    if validation_response is not None:
+        return validation_response
+
+    check_int_range(id, "Id value out of int range")
+
+    book = await session.get(Book, id)
+    if book is None:
+        raise HTTPException(status_code=404, detail="Book not found")
+    try:
+        await session.delete(book)
+        await session.commit()
+    except IntegrityError:
+        raise HTTPException(status_code=400, detail="Cannot delete book with active rents")
+
+    main.invalidate_details("book", id)
+    return {"status": "Ok", "detail": "Book was deleted"}
+
+
+@app.post("/book/rent")
+@query_budget(5)
+async def rent_book(
+    request: Request,
+    book_input: BookRentModel,
+    session: AsyncSession = Depends(get_async_session),
+):
+    """Async version of main.rent_book"""
+    validation_response = await AsyncValidation(request, session).validate(
+        request, True
+    )
+    if validation_response is not None:
+        return validation_response
+
+    try:
+        rent_id = await session.run_sync(
+            Rent.rent_book,
+            book_input.reader_id,
+            book_input.book_id,
+            book_input.return_date,
+        )
+    except (
+        Rent.ReaderNotFound,
+        Rent.BooksLimitExceed,
+        Rent.BookNotAvailable,
+    ) as e:
+        raise HTTPException(status_code=400, detail=e.reason)
+    except:
+        raise HTTPException(
+            status_code=400, detail="Cannot rent a book. Check your request"
+        )
+
+    main.invalidate_details("book", book_input.book_id)
+    return {"status": "Ok", "detail": "Book was rented", "rent_id": rent_id}
+
+
+@app.post("/book/rent/batch")
+@query_budget(7)
+async def rent_books_batch(
+    request: Request,
+    items: list[BookRentModel] = Body(
+        ..., min_length=1, max_length=settings.RENT_BATCH_MAX_ITEMS
+    ),
+    mode: Literal["all_or_nothing", "per_item"] = "all_or_nothing",
+    session: AsyncSession = Depends(get_async_session),
+):
+    """Async version of main.rent_books_batch"""
+    validation_response = await AsyncValidation(request, session).validate(
+        request, True
+    )
+    if validation_response is not None:
+        return validation_response
+
+    try:
+        report = await session.run_sync(
+            Rent.rent_books,
+            [(item.reader_id, item.book_id, item.return_date) for item in items],
+            mode == "all_or_nothing",
+        )
+    except Rent.BatchFailed as e:
+        raise HTTPException(
+            status_code=400, detail={"reason": e.reason, "errors": e.errors}
+        )
+    except:
+        raise HTTPException(
+            status_code=400, detail="Cannot rent books. Check your request"
+        )
+
+    main.invalidate_details(
+        "book", *{items[row["index"]].book_id for row in report["ids"]}
+    )
+    return report
+
+
+@app.post("/book/return/batch")
+@query_budget(6)
+async def return_books_batch(
+    request: Request,
+    items: list[RentReturnModel] = Body(
+        ..., min_length=1, max_length=settings.RENT_BATCH_MAX_ITEMS
+    ),
+    mode: Literal["all_or_nothing", "per_item"] = "all_or_nothing",
+    session: AsyncSession = Depends(get_async_session),
+):
+    """Async version of main.return_books_batch"""
+    validation_response = await AsyncValidation(request, session).validate(
+        request, True
+    )
+    if validation_response is not None:
+        return validation_response
+
+    try:
+        report = await session.run_sync(
+            Rent.return_books,
+            [item.rent_id for item in items],
+            mode == "all_or_nothing",
+        )
+    except Rent.BatchFailed as e:
+        raise HTTPException(
+            status_code=400, detail={"reason": e.reason, "errors": e.errors}
+        )
+    except:
+        raise HTTPException(400, detail="Cannot return books")
+
+    main.invalidate_details("book", *{row["book_id"] for row in report["ids"]})
+    return report
+
+
+@app.post("/book/return")
+@query_budget(6)
+async def return_book(
+    request: Request,
+    rent_input: RentReturnModel,
+    session: AsyncSession = Depends(get_async_session),
+):
+    """Async version of main.return_book"""
+    validation_response = await AsyncValidation(request, session).validate(
+        request, True
+    )
+    if validation_response is not None:
+        return validation_response
+
+    try:
+        book_id = await session.run_sync(Rent.return_book, rent_input.rent_id)
+    except Rent.RentNotFound as e:
+        raise HTTPException(400, detail=e.reason)
+    except:
+        raise HTTPException(400, detail="Cannot return book")
+
+    main.invalidate_details("book", book_id)
+    return {"status": "Ok", "detail": "Book was returned"}
+
+
+@app.get("/rent/overdue", response_model=PageModel[OverdueRentResponseModel])
+@query_budget(2)
+async def get_overdue_rents(
+    request: Request,
+    reader_id: int | None = Query(None, gt=0),
+    page: PageParams = Depends(),
+    session: AsyncSession = Depends(get_async_session),
+):
+    """Async version of main.get_overdue_rents"""
+    validation_response = await AsyncValidation(request, session).validate(
+        request, True
+    )
+    if validation_response is not None:
+        return validation_response
+
+    rents = await session.scalars(main.overdue_statement(reader_id, page))
+    return make_page(rents.all(), page, get_id=lambda rent: rent.rent_id)
+
+
+@app.get("/rent/history", response_model=PageModel[RentHistoryResponseModel])
+@query_budget(2)
+async def get_rent_history(
+    request: Request,
+    filters: Annotated[RentHistoryFilterModel, Query()],
+    page: PageParams = Depends(),
+    session: AsyncSession = Depends(get_async_session),
+):
+    """Async version of main.get_rent_history"""
+    validation_response = await AsyncValidation(request, session).validate(
+        request, True
+    )
+    if validation_response is not None:
+        return validation_response
+
+    rents = await session.scalars(main.rent_history_statement(filters, page))
+    return make_page(rents.all(), page, get_id=lambda rent: rent.rent_id)
+
+
+@app.get("/reader", response_model=PageModel[ReaderResponseModel])
+@query_budget(2)
+async def get_readers(
+    request: Request,
+    page: PageParams = Depends(),
+    session: AsyncSession = Depends(get_async_session),
+):
+    """Async version of main.get_readers"""
+    validation_response = await AsyncValidation(request, session).validate(
+        request, True
+    )
+    if validation_response is not None:
+        return validation_response
+
+    statement = select(
+        User.id,
+        User.username,
+        User.first_name,
+        User.second_name,
+        User.birth_date,
+    ).filter(User.is_admin == False)
+    result = await session.execute(paginate(statement, User.id, page))
+    return make_page([row._asdict() for row in result], page, lambda row: row["id"])
+
+
+@app.get("/reader/{id}", response_model=ReaderResponseModel | None)
+@query_budget(2)
+async def get_reader(
+    request: Request, id: int, session: AsyncSession = Depends(get_async_session)
+):
+    """Async version of main.get_reader"""
+    validation_response = await AsyncValidation(request, session).validate(
+        request, True
+    )
+    if validation_response is not None:
+        return validation_response
+
+    check_int_range(id, "Id value out of range")
+
+    result = await session.execute(
+        select(
+            User.id,
+            User.username,
+            User.first_name,
+            User.second_name,
+            User.birth_date,
+        )
+        .filter(User.is_admin == False)
+        .filter(User.id == id)
+    )
+    reader = result.first()
+    return reader._asdict() if reader is not None else None
+
+
+@app.get("/profile", response_model=ProfileResponseModel)
+@query_budget(1)
+async def get_profile(
+    request: Request, session: AsyncSession = Depends(get_async_session)
+):
+    """Async version of main.get_profile"""
+    validation = AsyncValidation(request, session)
+    validation_response = await validation.validate(request, False)
+    if validation_response is not None:
+        return validation_response
+
+    user = await validation.get_user()
+    return {
+        "Username": user.username,
+        "First name": user.first_name,
+        "Second name": user.second_name,
+        "Birth date": user.birth_date,
+    }
+
+
+@app.put("/profile")
+@query_budget(3)
+async def update_profile(
+    input_user: UpdateUserModel,
+    request: Request,
+    session: AsyncSession = Depends(get_async_session),
+):
+    """Async version of main.update_profile"""
+    validation = AsyncValidation(request, session)
+    validation_response = await validation.validate(request)
+    if validation_response is not None:
+        return validation_response
+
+    user = await session.get(User, validation.claims["userId"])
+
+    try:
+        user.first_name = input_user.first_name
+        user.second_name = input_user.second_name
+        user.birth_date = input_user.birth_date
+        await session.commit()
+    except:
+        await session.rollback()
+        raise HTTPException(
+            status_code=400, detail="Cannot update profile. Check your request"
+        )
+
+    return {"status": "Ok", "detail": "Your profile was updated"}
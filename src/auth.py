@@ -3,19 +3,29 @@
     class JWT_decoder provides access and refresh token generation       \n
     class JWT_validator provides token signature validation functionality \n
     class JWT_decoder provides token decoding functionality               \n
+    class CachedUser provides copy of User stored in user cache            \n
+    class TokenRenewalMiddleware renews expired access token in place      \n
 """
 
 
 import jwt
-from time import time
+from time import perf_counter, time
 from fastapi import Response, Request, HTTPException
-from fastapi.responses import RedirectResponse
+from starlette.concurrency import run_in_threadpool
 from config import settings
+from sqlalchemy import event
+from sqlalchemy.orm import Session, object_session
+from sqlalchemy.ext.asyncio import AsyncSession
 from db.models import User
-from db.core import session
+from db.core import SessionLocal
+from cache import TTLCache
+from metrics import record_auth
 
 secret_key = settings.SECRET_KEY
 
+user_cache = TTLCache(settings.USER_CACHE_SIZE, settings.USER_CACHE_TTL_SEC)
+token_cache = TTLCache(settings.TOKEN_CACHE_SIZE, 0)
+
 
 class JWTencoder:
     """
@@ -110,14 +120,77 @@ class JWTvalidator:
 
 class JWTdecoder:
     """Decodes token \n
-    Use 'decode' method to decode token
+    Use 'decode' method to decode token\n
+    Verified tokens are stored in token_cache until their expiration time,
+    so repeated decoding of the same token skips signature check and JSON parsing.
+    Decoding time is added to auth time of current request in metrics
     """
 
     @staticmethod
     def decode(token):
         """Decodes token"""
-        decoded_token = jwt.decode(token, secret_key, algorithms=["HS256"])
-        return decoded_token
+        started = perf_counter()
+        try:
+            decoded_token = token_cache.get(token)
+            if decoded_token is not None:
+                return dict(decoded_token)
+
+            decoded_token = jwt.decode(token, secret_key, algorithms=["HS256"])
+            token_cache.set(token, decoded_token, decoded_token["exp"] - time())
+            return dict(decoded_token)
+        finally:
+            record_auth(perf_counter() - started)
+
+
+class CachedUser:
+    """Read-only copy of User row stored in user cache\n
+    Load User by id in request session to change the row
+    """
+
+    __slots__ = (
+        "id",
+        "first_name",
+        "second_name",
+        "birth_date",
+        "username",
+        "is_admin",
+    )
+
+    def __init__(self, user: User):
+        """Copies columns used by validation and profile endpoints"""
+        self.id = user.id
+        self.first_name = user.first_name
+        self.second_name = user.second_name
+        self.birth_date = user.birth_date
+        self.username = user.username
+        self.is_admin = user.is_admin
+
+    def get_fullname(self):
+        """Returns user fullname"""
+        return str(self.first_name) + " " + str(self.second_name)
+
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _mark_changed_user(mapper, connection, target: User) -> None:
+    """Drops changed user from cache and remembers it to drop again after commit"""
+    user_cache.invalidate(target.id)
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault("changed_user_ids", set()).add(target.id)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_changed_users(session: Session) -> None:
+    """Drops users changed in committed transaction from cache"""
+    for user_id in session.info.pop("changed_user_ids", ()):
+        user_cache.invalidate(user_id)
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_changed_users(session: Session) -> None:
+    """Forgets users changed in rolled back transaction"""
+    session.info.pop("changed_user_ids", None)
 
 
 class TokenHandler:
@@ -125,8 +198,13 @@ class TokenHandler:
     Handles with tokens
     Methods:
     * remove_tokens - removes tokens from user`s cookies
+    * generate_user_tokens - generates pair of tokens for user
     * set_tokens - sets tokens to user`s cookies
-    * get_user_bytoken - returns User (model class) if the token is valid
+    * get_user_bytoken - returns CachedUser if the token is valid
+    * get_user_bytoken_async - same as get_user_bytoken for AsyncSession
+    * get_user_byid - returns CachedUser by user id
+    * get_user_byid_async - same as get_user_byid for AsyncSession
+    * get_claims - returns verified payload of token from request cookies
     """
 
     @staticmethod
@@ -136,81 +214,300 @@ class TokenHandler:
         response.delete_cookie(key="refresh_token")
 
     @staticmethod
-    def set_tokens(user: User, response: Response) -> None:
-        """sets tokens to user cookies"""
+    def generate_user_tokens(user: User) -> tuple[str, str]:
+        """generates pair of tokens (access token, refresh token) for user"""
+        token_body = {"userId": user.id, "is_admin": user.is_admin}
+        return JWTgenerator.generate_tokens(token_body)
+
+    @staticmethod
+    def set_tokens(
+        user: User, response: Response, tokens: tuple[str, str] | None = None
+    ) -> None:
+        """sets tokens to user cookies\n
+        Generates new pair of tokens if tokens are not passed
+        """
         if user is None:
             return TokenHandler.remove_tokens(response)
 
-        token_body = {"userId": user.id, "is_admin": user.is_admin}
+        if tokens is None:
+            tokens = TokenHandler.generate_user_tokens(user)
 
-        access_token, refresh_token = JWTgenerator.generate_tokens(token_body)
+        access_token, refresh_token = tokens
         response.set_cookie(key="access_token", value=access_token, httponly=True)
         response.set_cookie(key="refresh_token", value=refresh_token, httponly=True)
 
     @staticmethod
-    def get_user_bytoken(token: str) -> User:
-        """returns User (model class) if the token is valid"""
+    def get_claims(request: Request, token_name: str = "access_token") -> dict:
+        """returns verified payload of token from request cookies\n
+        Token is decoded once per request, payload is stored in request.state.token_claims.
+        Payload of access token is stored there by TokenRenewalMiddleware
+        """
+        token_claims = getattr(request.state, "token_claims", None)
+        if token_claims is None:
+            token_claims = request.state.token_claims = {}
+        if token_name not in token_claims:
+            token_claims[token_name] = JWTdecoder.decode(request.cookies[token_name])
+        return token_claims[token_name]
+
+    @staticmethod
+    def get_user_bytoken(token: str, session: Session) -> CachedUser:
+        """returns CachedUser if the token is valid\n
+        User row is loaded from DB only on user cache miss
+        """
         decoded_token = JWTdecoder.decode(token)
-        user_id = decoded_token["userId"]
+        return TokenHandler.get_user_byid(decoded_token["userId"], session)
+
+    @staticmethod
+    async def get_user_bytoken_async(token: str, session: AsyncSession) -> CachedUser:
+        """returns CachedUser if the token is valid\n
+        User row is loaded from DB only on user cache miss
+        """
+        decoded_token = JWTdecoder.decode(token)
+        return await TokenHandler.get_user_byid_async(decoded_token["userId"], session)
+
+    @staticmethod
+    def get_user_byid(user_id: int, session: Session) -> CachedUser:
+        """returns CachedUser by user id, User row is loaded from DB only on user cache miss"""
+        cached_user = user_cache.get(user_id)
+        if cached_user is not None:
+            return cached_user
+
+        generation = user_cache.generation(user_id)
         user = session.query(User).filter(User.id == user_id).first()
-        return user
+        if user is None:
+            return None
+        cached_user = CachedUser(user)
+        user_cache.set(user_id, cached_user, generation=generation)
+        return cached_user
+
+    @staticmethod
+    async def get_user_byid_async(user_id: int, session: AsyncSession) -> CachedUser:
+        """same as get_user_byid for AsyncSession"""
+        cached_user = user_cache.get(user_id)
+        if cached_user is not None:
+            return cached_user
+
+        generation = user_cache.generation(user_id)
+        user = await session.get(User, user_id)
+        if user is None:
+            return None
+        cached_user = CachedUser(user)
+        user_cache.set(user_id, cached_user, generation=generation)
+        return cached_user
 
 
 class Validation:
-    """User validation class
+    """User validation class\n
+    Create one object per request with request-scoped session\n
+    With TRUST_TOKEN_CLAIMS setting admin rights are taken from verified token claims
+    and token owner is loaded only when get_user is called
     Attributes:
     * is_token_valid - true if token is valid, false if not
-    * user - User object of token owner
+    * claims - decoded access token payload
+    * user - CachedUser object of token owner
     * is_admin - true if token owner is admin, false if not
     """
 
     is_token_valid: bool
-    user: User
+    claims: dict
+    user: CachedUser
     is_admin: bool
 
-    def get_user(self) -> User:
-        """Returns User object of token owner"""
+    def get_user(self) -> CachedUser:
+        """Returns CachedUser object of token owner, loads it if it wasn`t loaded by validation"""
+        if self.user is None and self.claims is not None:
+            self.user = TokenHandler.get_user_byid(self.claims["userId"], self.session)
         return self.user
 
     def __UserValidation(self, request: Request) -> None:
         """Checks token and raises exceptions if its not valid"""
-        access_token = request.cookies["access_token"]
-        self.is_token_valid = JWTvalidator.check(access_token)
-        self.user = TokenHandler.get_user_bytoken(access_token)
+        self.claims = TokenHandler.get_claims(request)
+        self.is_token_valid = True
+        if settings.TRUST_TOKEN_CLAIMS:
+            self.is_admin = bool(self.claims.get("is_admin", False))
+            return
+
+        self.user = TokenHandler.get_user_byid(self.claims["userId"], self.session)
         if self.user is None:
             raise jwt.exceptions.ExpiredSignatureError
         self.is_admin = self.user.is_admin
 
-    def __init__(self, request: Request):
+    def __init__(self, request: Request, session: Session):
         """Validation constructor"""
-        try:
-            self.__UserValidation(request)
-        except:
-            pass
+        self.request = request
+        self.session = session
+        self.is_token_valid = False
+        self.claims = None
+        self.user = None
+        self.is_admin = False
+
+    def _on_error(self, request: Request, error: Exception) -> None:
+        """Turns validation error into HTTPException\n
+        Expired or missing access token is renewed by TokenRenewalMiddleware before the endpoint,
+        so here it means that refresh token is missing or invalid too, or token owner was deleted
+        """
+        if isinstance(error, (jwt.exceptions.ExpiredSignatureError, KeyError)):
+            raise HTTPException(
+                status_code=401,
+                detail="Token expired or missing. Login via /auth/login",
+            )
+        if isinstance(error, jwt.exceptions.InvalidAudienceError):
+            raise HTTPException(status_code=403, detail=f"You have not permission")
+        raise HTTPException(status_code=401, detail=f"Auth error. {error}")
 
-    @classmethod
-    def validate(
-        cls, request: Request, admin_validation: bool = False
-    ) -> RedirectResponse | None:
+    def validate(self, request: Request, admin_validation: bool = False) -> None:
         """Validates token\n
-        If token expired or access token not found redirects to refresh endpoint via RedirectResponse\n
-        If token not valid raises an exception
+        If token is expired, not found or not valid raises HTTPException
         """
         try:
-            cls.__UserValidation(cls, request)
-            if admin_validation and not cls.user.is_admin:
+            self.__UserValidation(request)
+            if admin_validation and not self.is_admin:
                 raise jwt.exceptions.InvalidAudienceError
-        except jwt.exceptions.ExpiredSignatureError:
-            return RedirectResponse(
-                url=f"/auth/refresh?redirected_from={request.url.path}"
-            )
-        except jwt.exceptions.InvalidAudienceError:
-            raise HTTPException(status_code=403, detail=f"You have not permission")
-        except KeyError:
-            return RedirectResponse(
-                url=f"/auth/refresh?redirected_from={request.url.path}"
+        except Exception as e:
+            return self._on_error(request, e)
+        else:
+            return None
+
+
+class AsyncValidation(Validation):
+    """User validation class for async endpoints\n
+    Same as Validation, but loads token owner via AsyncSession
+    """
+
+    def __init__(self, request: Request, session: AsyncSession):
+        """AsyncValidation constructor"""
+        super().__init__(request, session)
+
+    async def get_user(self) -> CachedUser:
+        """Returns CachedUser object of token owner, loads it if it wasn`t loaded by validation"""
+        if self.user is None and self.claims is not None:
+            self.user = await TokenHandler.get_user_byid_async(
+                self.claims["userId"], self.session
             )
+        return self.user
+
+    async def __UserValidation(self, request: Request) -> None:
+        """Checks token and raises exceptions if its not valid"""
+        self.claims = TokenHandler.get_claims(request)
+        self.is_token_valid = True
+        if settings.TRUST_TOKEN_CLAIMS:
+            self.is_admin = bool(self.claims.get("is_admin", False))
+            return
+
+        self.user = await TokenHandler.get_user_byid_async(
+            self.claims["userId"], self.session
+        )
+        if self.user is None:
+            raise jwt.exceptions.ExpiredSignatureError
+        self.is_admin = self.user.is_admin
+
+    async def validate(self, request: Request, admin_validation: bool = False) -> None:
+        """Validates token, see Validation.validate"""
+        try:
+            await self.__UserValidation(request)
+            if admin_validation and not self.is_admin:
+                raise jwt.exceptions.InvalidAudienceError
         except Exception as e:
-            raise HTTPException(status_code=401, detail=f"Auth error. {e}")
+            return self._on_error(request, e)
         else:
             return None
+
+
+class TokenRenewalMiddleware:
+    """ASGI middleware renewing expired access token in place\n
+    If access token is expired or missing and refresh token is valid, issues new tokens
+    via TokenHandler.set_tokens on the same response and serves the original request
+    with the new access token, without redirect to /auth/refresh\n
+    Verified payload of access token is stored in request.state.token_claims,
+    so TokenHandler.get_claims doesn`t decode it again
+    """
+
+    TOKEN_NAMES = ("access_token", "refresh_token")
+
+    def __init__(self, app):
+        """TokenRenewalMiddleware constructor"""
+        self.app = app
+
+    @staticmethod
+    def __load_user(user_id: int) -> CachedUser:
+        """Loads token owner in new session"""
+        with SessionLocal() as session:
+            return TokenHandler.get_user_byid(user_id, session)
+
+    @staticmethod
+    def __store_claims(scope, claims: dict) -> None:
+        """Stores verified payload of access token in request state"""
+        scope.setdefault("state", {})["token_claims"] = {"access_token": claims}
+
+    async def __renew(self, scope, cookies: dict) -> tuple[CachedUser, tuple[str, str]]:
+        """Returns token owner and new pair of tokens or None if tokens must not be renewed\n
+        Stores payload of valid access token in request state
+        """
+        if "access_token" in cookies:
+            try:
+                self.__store_claims(scope, JWTdecoder.decode(cookies["access_token"]))
+                return None
+            except jwt.exceptions.ExpiredSignatureError:
+                pass
+            except Exception:
+                return None
+
+        if "refresh_token" not in cookies:
+            return None
+
+        try:
+            refresh_claims = JWTdecoder.decode(cookies["refresh_token"])
+        except Exception:
+            return None
+
+        user = await run_in_threadpool(self.__load_user, refresh_claims["userId"])
+        if user is None:
+            return None
+        return user, TokenHandler.generate_user_tokens(user)
+
+    def __replace_cookies(self, scope, tokens: tuple[str, str]) -> None:
+        """Replaces tokens in request Cookie header"""
+        headers = []
+        pairs = []
+        for name, value in scope["headers"]:
+            if name != b"cookie":
+                headers.append((name, value))
+                continue
+            for pair in value.split(b";"):
+                cookie_name = pair.split(b"=", 1)[0].strip().decode("latin-1")
+                if pair.strip() and cookie_name not in self.TOKEN_NAMES:
+                    pairs.append(pair.strip())
+
+        for name, token in zip(self.TOKEN_NAMES, tokens):
+            pairs.append(f"{name}={token}".encode("latin-1"))
+        headers.append((b"cookie", b"; ".join(pairs)))
+        scope["headers"] = headers
+
+    async def __call__(self, scope, receive, send):
+        """Handles ASGI request"""
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        renewal = await self.__renew(scope, Request(scope).cookies)
+        if renewal is None:
+            return await self.app(scope, receive, send)
+
+        user, tokens = renewal
+        self.__replace_cookies(scope, tokens)
+        self.__store_claims(scope, JWTdecoder.decode(tokens[0]))
+        cookie_response = Response()
+        TokenHandler.set_tokens(user, cookie_response, tokens)
+        set_cookie_headers = [
+            header
+            for header in cookie_response.raw_headers
+            if header[0] == b"set-cookie"
+        ]
+
+        async def send_with_cookies(message):
+            """Adds renewed tokens before cookies set by endpoint, so endpoint cookies win"""
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                message["headers"] = set_cookie_headers + headers
+            await send(message)
+
+        await self.app(scope, receive, send_with_cookies)
@@ -0,0 +1,271 @@
+"""Caching module \n
+    class TTLCache provides thread-safe in-process LRU cache with time to live for entries \n
+    class RedisCache provides cache shared between processes with the same interface \n
+    Use 'create_cache' to make cache with backend chosen in settings
+"""
+
+import json
+from collections import OrderedDict
+from threading import Lock
+from time import monotonic
+
+try:
+    import redis
+except ImportError:  # redis backend is optional
+    redis = None
+
+# stores entry only if generation counter of its key is unchanged, atomically on Redis server
+SET_IF_GENERATION = """
+if (redis.call('GET', KEYS[2]) or '0') == ARGV[3] then
+    return redis.call('SET', KEYS[1], ARGV[1], 'PX', ARGV[2])
+end
+"""
+
+
+def _hit_ratio(hits: int, misses: int) -> float:
+    """Returns part of lookups that found entry"""
+    lookups = hits + misses
+    return round(hits / lookups, 4) if lookups else 0.0
+
+
+class TTLCache:
+    """Bounded LRU cache with time to live\n
+    Least recently used entry is evicted when cache is full, expired entries are dropped on access\n
+    Methods:
+    * get - returns cached value or default
+    * generation - returns invalidation counter of key
+    * set - stores value
+    * invalidate - removes entry
+    * clear - removes all entries
+    * stats - returns hit, miss and eviction counters
+    """
+
+    def __init__(self, maxsize: int, ttl_sec: float):
+        """
+        Initialization of new cache.
+
+        :param maxsize: Max amount of stored entries                 \n
+        :param ttl_sec: Default time to live of entry in seconds     \n
+        """
+        self.maxsize = maxsize
+        self.ttl_sec = ttl_sec
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.__entries = OrderedDict()
+        # generations of recently invalidated keys, other keys have generation of the last forgotten one
+        self.__generations = OrderedDict()
+        self.__last_generation = 0
+        self.__forgotten_generation = 0
+        self.__lock = Lock()
+
+    def get(self, key, default=None):
+        """Returns cached value or default if entry not found or expired"""
+        with self.__lock:
+            entry = self.__entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+
+            value, expires_at = entry
+            if expires_at <= monotonic():
+                del self.__entries[key]
+                self.misses += 1
+                return default
+
+            self.__entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def generation(self, key) -> int:
+        """Returns invalidation counter of key, it changes every time key is invalidated"""
+        with self.__lock:
+            return self.__generations.get(key, self.__forgotten_generation)
+
+    def set(
+        self, key, value, ttl_sec: float | None = None, generation: int | None = None
+    ) -> None:
+        """Stores value, ttl_sec overrides default time to live for this entry\n
+        If generation is given, value is stored only if key was not invalidated since generation was read,
+        so value loaded before concurrent change doesn`t replace invalidated entry
+        """
+        if ttl_sec is None:
+            ttl_sec = self.ttl_sec
+        if ttl_sec <= 0 or self.maxsize <= 0:
+            return
+
+        with self.__lock:
+            if generation is not None and generation != self.__generations.get(
+                key, self.__forgotten_generation
+            ):
+                return
+            self.__entries[key] = (value, monotonic() + ttl_sec)
+            self.__entries.move_to_end(key)
+            while len(self.__entries) > self.maxsize:
+                self.__entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key) -> None:
+        """Removes entry if it exists and changes generation of key"""
+        with self.__lock:
+            self.__entries.pop(key, None)
+            self.__last_generation += 1
+            self.__generations[key] = self.__last_generation
+            self.__generations.move_to_end(key)
+            while len(self.__generations) > max(self.maxsize, 0):
+                _, self.__forgotten_generation = self.__generations.popitem(last=False)
+
+    def clear(self) -> None:
+        """Removes all entries and changes generations of all keys"""
+        with self.__lock:
+            self.__entries.clear()
+            self.__generations.clear()
+            self.__last_generation += 1
+            self.__forgotten_generation = self.__last_generation
+
+    def stats(self) -> dict:
+        """Returns cache counters"""
+        with self.__lock:
+            return {
+                "size": len(self.__entries),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": _hit_ratio(self.hits, self.misses),
+                "evictions": self.evictions,
+            }
+
+
+class RedisCache:
+    """Cache in Redis shared by all application processes\n
+    Has the same methods as TTLCache, values must be JSON serializable.
+    Size limit and eviction are configured in Redis (maxmemory and maxmemory-policy allkeys-lru).
+    If Redis is unavailable, lookups are counted as misses and writes are skipped,
+    so stale entries live no longer than their time to live\n
+    Generation of key is a counter in Redis incremented by invalidate, it lives as long as entries,
+    so it protects fills which take less than time to live\n
+    Needs 'redis' package
+    """
+
+    def __init__(self, url: str, ttl_sec: float, prefix: str = "library:"):
+        """
+        Initialization of new cache.
+
+        :param url: Redis URL, for example 'redis://localhost:6379/0'  \n
+        :param ttl_sec: Default time to live of entry in seconds        \n
+        :param prefix: Prefix of keys of this cache                     \n
+        """
+        if redis is None:
+            raise RuntimeError("Install 'redis' package to use redis cache backend")
+        self.ttl_sec = ttl_sec
+        self.prefix = prefix
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+        # short timeouts, so unavailable Redis slows requests down by one second at most
+        self.__client = redis.Redis.from_url(
+            url, socket_timeout=1.0, socket_connect_timeout=1.0
+        )
+        self.__lock = Lock()
+        self.__set_if_generation = self.__client.register_script(SET_IF_GENERATION)
+
+    def __generation_key(self, key) -> str:
+        """Returns Redis key of generation counter of key"""
+        return f"{self.prefix}generation:{key}"
+
+    def get(self, key, default=None):
+        """Returns cached value or default if entry not found or expired"""
+        try:
+            value = self.__client.get(self.prefix + str(key))
+        except redis.RedisError:
+            value = None
+            self.__count_error()
+        with self.__lock:
+            if value is None:
+                self.misses += 1
+                return default
+            self.hits += 1
+        return json.loads(value)
+
+    def generation(self, key) -> int:
+        """Returns invalidation counter of key, it changes every time key is invalidated"""
+        try:
+            return int(self.__client.get(self.__generation_key(key)) or 0)
+        except redis.RedisError:
+            self.__count_error()
+            return 0
+
+    def set(
+        self, key, value, ttl_sec: float | None = None, generation: int | None = None
+    ) -> None:
+        """Stores value, ttl_sec overrides default time to live for this entry\n
+        If generation is given, value is stored only if key was not invalidated since generation was read
+        """
+        if ttl_sec is None:
+            ttl_sec = self.ttl_sec
+        if ttl_sec <= 0:
+            return
+        try:
+            if generation is None:
+                self.__client.set(
+                    self.prefix + str(key), json.dumps(value), px=int(ttl_sec * 1000)
+                )
+            else:
+                self.__set_if_generation(
+                    keys=[self.prefix + str(key), self.__generation_key(key)],
+                    args=[json.dumps(value), int(ttl_sec * 1000), generation],
+                )
+        except redis.RedisError:
+            self.__count_error()
+
+    def invalidate(self, key) -> None:
+        """Removes entry if it exists and changes generation of key"""
+        generation_key = self.__generation_key(key)
+        try:
+            pipeline = self.__client.pipeline()
+            pipeline.delete(self.prefix + str(key))
+            pipeline.incr(generation_key)
+            pipeline.pexpire(generation_key, int(self.ttl_sec * 1000))
+            pipeline.execute()
+        except redis.RedisError:
+            self.__count_error()
+
+    def __count_error(self) -> None:
+        """Counts failed Redis command"""
+        with self.__lock:
+            self.errors += 1
+
+    def clear(self) -> None:
+        """Removes all entries with prefix of this cache"""
+        keys = list(self.__client.scan_iter(match=self.prefix + "*"))
+        if keys:
+            self.__client.delete(*keys)
+
+    def stats(self) -> dict:
+        """Returns counters of this process, size and eviction counter of Redis server"""
+        try:
+            size = self.__client.dbsize()
+            evictions = self.__client.info("stats").get("evicted_keys", 0)
+        except redis.RedisError:
+            size = evictions = None
+        with self.__lock:
+            return {
+                "size": size,
+                "maxsize": None,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": _hit_ratio(self.hits, self.misses),
+                "evictions": evictions,
+                "errors": self.errors,
+            }
+
+
+def create_cache(
+    backend: str, maxsize: int, ttl_sec: float, url: str | None = None
+) -> TTLCache | RedisCache:
+    """Makes cache with 'memory' (TTLCache) or 'redis' (RedisCache) backend"""
+    if backend == "memory":
+        return TTLCache(maxsize, ttl_sec)
+    if backend == "redis":
+        return RedisCache(url, ttl_sec)
+    raise ValueError(f"Unknown cache backend '{backend}'")
@@ -13,6 +13,32 @@ class Settings(BaseSettings):
     REF_TOK_LIFETIME_DAYS: int
     ACCS_TOK_LIFETIME_MIN: int
     BOOKS_LIMIT_FOR_READER: int
+    USER_CACHE_SIZE: int = 10_000
+    USER_CACHE_TTL_SEC: int = 60
+    TRUST_TOKEN_CLAIMS: bool = False
+    DEFAULT_PAGE_SIZE: int = 50
+    MAX_PAGE_SIZE: int = 500
+    MAX_SEARCH_OFFSET: int = 1000
+    BULK_MAX_RECORDS: int = 10_000
+    RENT_BATCH_MAX_ITEMS: int = 100
+    OVERDUE_SWEEP_INTERVAL_SEC: int = 0
+    OVERDUE_SWEEP_BATCH_SIZE: int = 1000
+    OVERDUE_SWEEP_PAUSE_SEC: float = 0.05
+    TOKEN_CACHE_SIZE: int = 10_000
+    PASSWORD_HASH_N: int = 2**14
+    PASSWORD_HASH_R: int = 8
+    PASSWORD_HASH_P: int = 1
+    PASSWORD_HASH_WORKERS: int = 4
+    PASSWORD_HASH_MAX_PENDING: int = 32
+    PASSWORD_HASH_QUEUE_TIMEOUT_SEC: float = 1.0
+    PASSWORD_HASH_USE_PROCESSES: bool = False
+    RESPONSE_CACHE_BACKEND: str = "memory"
+    RESPONSE_CACHE_SIZE: int = 10_000
+    RESPONSE_CACHE_TTL_SEC: int = 300
+    RESPONSE_CACHE_URL: str = "redis://localhost:6379/0"
+    METRICS_ENABLED: bool = True
+    METRICS_TOKEN: str = ""
+    QUERY_BUDGET_MODE: str = "off"
 
     model_config = SettingsConfigDict(env_file=".env")
 
@@ -1,14 +1,21 @@
 """ Core database managing module \n
-    Use 'session' to interact with DB
+    Use 'get_session' dependency to get a request-scoped session \n
+    Use 'SessionLocal' to open a session outside of request handling \n
+    Use 'get_async_session' and 'AsyncSessionLocal' for async endpoints \n
+    Use 'dialect_insert' to build INSERT ... ON CONFLICT statements \n
+    Both engines are instrumented: query and pool checkout times are recorded by metrics module
 """
 import os
 import sys
 parent_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
 sys.path.append(parent_dir)
 
-from sqlalchemy.orm import Session
-from sqlalchemy import create_engine
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy import Table, create_engine
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from config import settings
+from metrics import InstrumentedAsyncQueuePool, InstrumentedQueuePool, instrument_engine
 
 user = settings.DB_USER
 passw = settings.DB_PASS
@@ -22,7 +29,67 @@ engine = create_engine(        # CREATES ENGINE
     url=DB_URL,                # DB URL
     echo=False,                # PRINT LOGS IN CONSOLE
     pool_size=10,              # MAX CONNECTIONS
-    max_overflow=5             # MAX ADDITIONAL CONNECTIONS
+    max_overflow=5,            # MAX ADDITIONAL CONNECTIONS
+    poolclass=InstrumentedQueuePool  # RECORDS CONNECTION CHECKOUT WAIT
 )
+instrument_engine("sync", engine)
 
-session = Session(autocommit=False, autoflush=False, bind=engine)
+SessionLocal = sessionmaker(          # SESSION FACTORY
+    class_=Session,
+    autocommit=False,
+    autoflush=False,
+    bind=engine
+)
+
+
+def get_session():
+    """Yields new session for one request\n
+    Rolls back uncommitted changes on error and returns connection to the pool when request is done
+    """
+    session = SessionLocal()
+    try:
+        yield session
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+
+
+
+def dialect_insert(session: Session, table: Table):
+    """Returns INSERT statement of session`s database dialect\n
+    Dialect statement supports on_conflict_do_nothing and on_conflict_do_update
+    """
+    if session.get_bind().dialect.name == "sqlite":
+        return sqlite.insert(table)
+    return postgresql.insert(table)
+
+
+async_engine = create_async_engine(  # CREATES ASYNC ENGINE (psycopg async driver)
+    url=DB_URL,                      # DB URL
+    echo=False,                      # PRINT LOGS IN CONSOLE
+    pool_size=10,                    # MAX CONNECTIONS
+    max_overflow=5,                  # MAX ADDITIONAL CONNECTIONS
+    poolclass=InstrumentedAsyncQueuePool  # RECORDS CONNECTION CHECKOUT WAIT
+)
+instrument_engine("async", async_engine)
+
+AsyncSessionLocal = async_sessionmaker(     # ASYNC SESSION FACTORY
+    class_=AsyncSession,
+    autoflush=False,
+    expire_on_commit=False,
+    bind=async_engine
+)
+
+
+async def get_async_session():
+    """Yields new async session for one request\n
+    Rolls back uncommitted changes on error and returns connection to the pool when request is done
+    """
+    async with AsyncSessionLocal() as session:
+        try:
+            yield session
+        except Exception:
+            await session.rollback()
+            raise
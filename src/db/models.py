@@ -5,13 +5,19 @@
     * Author - class for author_table
     * Book - class for book_table
     * Rent - class for rent_table
+    * OverdueRent - class for overdue_rent
+    * RentHistory - class for rent_history
+    * TableVersion - class for table_version
 """
 from hashlib import md5
-from datetime import datetime
+from collections import Counter
+from datetime import date, datetime
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy import Column, Integer, String, Boolean, Date, ForeignKey, CheckConstraint
-from db.core import session
+from sqlalchemy import Column, Integer, BigInteger, String, Boolean, Date, ForeignKey, CheckConstraint, Index
+from sqlalchemy import select, insert, update, delete, func, event, case, text
+from sqlalchemy.orm import Session, object_session
 from config import settings
+from db.core import dialect_insert
 
 Base = declarative_base()
 
@@ -25,7 +31,8 @@ class User(Base):
     * birth_date - birth date of current user
     * username - username of current user
     * password - hash of password of current user
-    * is_admin - true if user is admin, false if not\n
+    * is_admin - true if user is admin, false if not
+    * active_rents - amount of books rented by current user now, maintained by Rent.rent_book and Rent.return_book\n
     Methods:\n
     * get_age - returns age at this moment of current user
     * get_fullname - returns user name in format 'first_name second_name'
@@ -37,8 +44,11 @@ class User(Base):
     second_name = Column("second_name", String(100), nullable=False)                # second_name   | character varying(100), not null
     birth_date = Column("birth_date", Date, nullable=False)                         # birth_date    | date, not null
     username = Column("username", String(16), nullable=False, unique=True)          # username      | character varying(16), not null unique
-    password = Column("password", String(64), nullable=False)                       # password      | character varying(32), not null
+    password = Column("password", String(128), nullable=False)                      # password      | character varying(128), not null
     is_admin = Column("is_admin", Boolean, nullable=False, default=False)           # is_admin      | boolean, not null, default = false
+    active_rents = Column("active_rents", Integer,                                   # active_rents  | int, not null, default = 0,
+                          CheckConstraint("active_rents >= 0", name="active_rents_not_negative"),  #                 check for negative values
+                          nullable=False, default=0, server_default="0")
 
 
     def __init__(self,
@@ -82,9 +92,11 @@ class Author(Base):
     * name - name of current author
     * bio - biography of current author
     * birth_date - date of birth of current author
-    * author_hash - unique author hash depending of name and birth_date\n
+    * author_hash - unique author hash depending of name and birth_date
+    * version - version of author row, incremented on every update\n
     Methods:\n
     * get_age - returns age at this moment of current user
+    * make_hash - returns author hash depending of name and birth_date
     """
     __tablename__ = "author_table"                                                  # Table name
 
@@ -93,6 +105,7 @@ class Author(Base):
     bio = Column("bio", String(1000), nullable=False)                               # bio           | character varying(1000), not null
     birth_date = Column("birth_date", Date, nullable=False)                         # birth_date    | date, not null
     author_hash = Column("author_hash", String(32), nullable=False, unique=True)    # author_hash   | character varying(32), not null, unique
+    version = Column("version", Integer, nullable=False, default=1, server_default="1")  # version       | int, not null, default = 1
 
                                                                                     # Author hash uses to store authors with same name and different birth dates
                                                                                     # And not store one author many times
@@ -114,7 +127,11 @@ class Author(Base):
         self.name = name
         self.bio = bio
         self.birth_date = birth_date
-        self.author_hash = md5(str(name).encode("utf-8") + str(birth_date).encode("utf-8")).hexdigest()
+        self.author_hash = Author.make_hash(name, birth_date)
+    @staticmethod
+    def make_hash(name: str, birth_date: str) -> str:
+        """Returns author hash depending of name and birth_date"""
+        return md5(str(name).encode("utf-8") + str(birth_date).encode("utf-8")).hexdigest()
     def get_age(self):
         """Returns actual user age"""
         return datetime.today().strftime('%Y-%m-%d') - self.birth_date
@@ -132,6 +149,9 @@ class Book(Base):
     * genre - genre of current book
     * quantity - quantity of this book`s copies in the library
     * book_hash - unique book hash of current book (depends of book name and publication date)
+    * version - version of book row, incremented on every update\n
+    Methods:\n
+    * make_hash - returns book hash depending of name and publication_date
     """
     __tablename__ = "book_table"                                                    # Table name
 
@@ -139,14 +159,20 @@ class Book(Base):
     name = Column("name", String(64), nullable=False)                                                # name                 | character varying(64), not null
     description = Column("description", String(1000), nullable=False)                                # description          | character varying(1000), not null
     publication_date = Column("publication_date", Date, nullable=False)                              # publication_date     | date, not null
-    author_id = Column(Integer, ForeignKey("author_table.id"), nullable=False)                       # author_id            | int, foreign key
-    genre = Column("genre", String(32), nullable=False)                                              # genre                | character varying(32), not null
+    author_id = Column(Integer, ForeignKey("author_table.id"), nullable=False, index=True)           # author_id            | int, foreign key, index
+    genre = Column("genre", String(32), nullable=False, index=True)                                  # genre                | character varying(32), not null, index
     quantity = Column("quantity", Integer, CheckConstraint("quantity >= 0"), nullable=False)         # quantity             | int, not null, check for negative values
     book_hash = Column("book_hash", String(32), nullable=False, unique=True)                         # book_hash            | character varying(32), not null, unique
+    version = Column("version", Integer, nullable=False, default=1, server_default="1")              # version              | int, not null, default = 1
 
                                                                                                     # Book hash uses to store books with same name and different publication dates
                                                                                                     # And not allows store one book many times
 
+    __table_args__ = (
+        Index("ix_book_table_genre_publication_date", "genre", "publication_date", "id"),          # genre filter, date range and sort inside genre
+        Index("ix_book_table_publication_date", "publication_date", "id"),                         # date range and sort by date without genre
+    )
+
 
     def __init__(self, 
                  name: str, 
@@ -172,7 +198,11 @@ class Book(Base):
         self.author_id = author_id
         self.genre = genre
         self.quantity = quantity
-        self.book_hash = md5(str(name).encode("utf-8") + str(publication_date).encode("utf-8")).hexdigest()
+        self.book_hash = Book.make_hash(name, publication_date)
+    @staticmethod
+    def make_hash(name: str, publication_date: str) -> str:
+        """Returns book hash depending of name and publication_date"""
+        return md5(str(name).encode("utf-8") + str(publication_date).encode("utf-8")).hexdigest()
 
 class Rent(Base):                                                                   # ORM model for rent_table
     """
@@ -182,27 +212,300 @@ class Rent(Base):
     * reader_id - ID (in user_table) of user who rents
     * book_id - ID (in book_table) of renting book
     * issue_date - date of issue this rent
-    * return_date - date of return this rent
+    * return_date - date of return this rent\n
+    Methods:\n
+    * rent_book - rents book in one transaction, safe for concurrent rents
+    * return_book - returns rented book in one transaction and moves rent to rent_history
+    * rent_books - rents many books in one transaction with set-based updates
+    * return_books - returns many rents in one transaction with set-based updates and moves them to rent_history
+    * reconcile_active_rents - rebuilds users` active_rents counters from rent_table
     """
     __tablename__ = "rent_table"                                                                    # Table name
+    __table_args__ = {"sqlite_autoincrement": True}                                                 # SQLite must not reuse rent_id of rents moved to rent_history
 
     rent_id = Column("rent_id", Integer, primary_key=True)                                          # rent_id    | serial, primary key
-    reader_id = Column("reader_id", Integer, ForeignKey("user_table.id"), nullable=False)           # reader_id  | int, foreign key to user_table (id column), not null
-    book_id = Column("book_id", ForeignKey("book_table.id"), nullable=False)                        # book_id    | int, foreign key to book_table (id column), not null
+    reader_id = Column("reader_id", Integer, ForeignKey("user_table.id"), nullable=False, index=True)  # reader_id  | int, foreign key to user_table (id column), not null, index
+    book_id = Column("book_id", ForeignKey("book_table.id"), nullable=False, index=True)            # book_id    | int, foreign key to book_table (id column), not null, index
     issue_date = Column("issue_date", Date, nullable=False)                                         # issue_date | date, not null
-    return_date = Column("return_date", Date, nullable=False)                                       # return_date| date, not null
+    return_date = Column("return_date", Date, nullable=False, index=True)                           # return_date| date, not null, index
 
 
     class BooksLimitExceed(Exception):
         """Exception of overflowing book rent limit for one user"""
         reason:str = f"User already have {settings.BOOKS_LIMIT_FOR_READER} rented books"
 
+    class BookNotAvailable(Exception):
+        """Exception of renting book which doesn`t exist or has no copies left"""
+        reason:str = "Book not found or all copies are rented"
+
+    class ReaderNotFound(Exception):
+        """Exception of renting book to user who doesn`t exist"""
+        reason:str = "Reader not found"
+
+    class RentNotFound(Exception):
+        """Exception of returning rent which doesn`t exist"""
+        reason:str = "Rent not found"
+
+    class BatchFailed(Exception):
+        """Exception of all-or-nothing batch with failed items, 'errors' are {"index", "detail"} of failed items"""
+        reason:str = "Batch was not applied, some items failed"
+
+        def __init__(self, errors: list):
+            super().__init__(errors)
+            self.errors = errors
+
     
-    def __checkBooksLimit(self, reader_id:int) -> None:
-        """Raises BooksLimitExceed exception if user already rented limit amount books"""
-        rented_books = session.query(Rent).filter(Rent.reader_id == reader_id)
-        if rented_books.count() >= settings.BOOKS_LIMIT_FOR_READER:
-            raise self.BooksLimitExceed
+    @staticmethod
+    def __checkBooksLimit(session: Session, reader_id:int) -> None:
+        """Takes one rent slot of reader or raises BooksLimitExceed exception if user already rented limit amount books\n
+        Increments user`s active_rents with conditional 'UPDATE ... WHERE active_rents < limit', so check costs one row update
+        and concurrent rents of one reader can`t both pass it. Slot is given back if transaction is rolled back
+        """
+        reader = session.execute(
+            update(User)
+            .where(User.id == reader_id, User.active_rents < settings.BOOKS_LIMIT_FOR_READER)
+            .values(active_rents=User.active_rents + 1)
+            .returning(User.id)
+        ).first()
+        if reader is not None:
+            return
+        if session.scalar(select(User.id).where(User.id == reader_id)) is None:
+            raise Rent.ReaderNotFound
+        raise Rent.BooksLimitExceed
+
+    @staticmethod
+    def reconcile_active_rents(session: Session) -> dict:
+        """Rebuilds active_rents counters of all users from rent_table and commits\n
+        Readers with more rents than BOOKS_LIMIT_FOR_READER get their real count too and are returned in 'over_limit'.
+        Limit is checked by conditional updates of rents, not by schema, so it can be changed without migration
+        """
+        rented_books = (
+            select(func.count())
+            .select_from(Rent)
+            .where(Rent.reader_id == User.id)
+            .scalar_subquery()
+        )
+        over_limit = list(session.scalars(
+            select(User.id).where(rented_books > settings.BOOKS_LIMIT_FOR_READER).order_by(User.id)
+        ))
+        updated = session.execute(
+            update(User)
+            .where(User.active_rents != rented_books)
+            .values(active_rents=rented_books)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        session.commit()
+        return {"updated": updated, "over_limit": over_limit}
+
+    @staticmethod
+    def rent_book(session: Session, reader_id: int, book_id: int, return_date: date) -> int:
+        """Rents book in one short transaction, returns rent_id\n
+        Checks reader`s limit, takes one copy with conditional 'UPDATE ... WHERE quantity > 0 RETURNING'
+        and inserts rent, so concurrent rents of the last copy can`t both succeed.
+        Raises ReaderNotFound, BooksLimitExceed or BookNotAvailable and rolls back on failure
+        """
+        try:
+            Rent.__checkBooksLimit(session, reader_id)
+
+            taken_book = session.execute(
+                update(Book)
+                .where(Book.id == book_id, Book.quantity > 0)
+                .values(quantity=Book.quantity - 1, version=Book.version + 1)
+                .returning(Book.id)
+            ).first()
+            if taken_book is None:
+                raise Rent.BookNotAvailable
+
+            rent_id = session.execute(
+                insert(Rent)
+                .values(
+                    reader_id=reader_id,
+                    book_id=book_id,
+                    issue_date=date.today(),
+                    return_date=return_date,
+                )
+                .returning(Rent.rent_id)
+            ).scalar_one()
+            session.commit()
+        except Exception:
+            session.rollback()
+            raise
+
+        return rent_id
+
+    @staticmethod
+    def return_book(session: Session, rent_id: int) -> int:
+        """Returns rented book in one short transaction\n
+        Deletes rent with 'DELETE ... RETURNING' and appends it to rent_history, gives the copy back
+        with 'UPDATE ... SET quantity = quantity + 1' and decrements reader`s active_rents.
+        Returns book_id of returned book. Raises RentNotFound and rolls back on failure
+        """
+        try:
+            rent = session.execute(
+                delete(Rent).where(Rent.rent_id == rent_id).returning(*RENT_COLUMNS)
+            ).first()
+            if rent is None:
+                raise Rent.RentNotFound
+            RentHistory.add(session, [rent], date.today())
+
+            session.execute(
+                update(User)
+                .where(User.id == rent.reader_id)
+                .values(active_rents=User.active_rents - 1)
+            )
+
+            session.execute(
+                update(Book)
+                .where(Book.id == rent.book_id)
+                .values(quantity=Book.quantity + 1, version=Book.version + 1)
+            )
+            session.commit()
+        except Exception:
+            session.rollback()
+            raise
+
+        return rent.book_id
+
+    @staticmethod
+    def rent_books(session: Session, items: list, all_or_nothing: bool = True) -> dict:
+        """Rents many books in one transaction, items are (reader_id, book_id, return_date)\n
+        Readers and books of the batch are locked with one 'SELECT ... FOR UPDATE' each, so limits and copies
+        are checked once for the whole batch, in order of items. Then active_rents and quantities are changed
+        by one set-based 'UPDATE ... SET x = x + CASE id ... END' each and rents are inserted by one multi-row INSERT.
+        Returns {"status", "rented", "failed", "ids": [{"index", "rent_id"}], "errors": [{"index", "detail"}]}.
+        With all_or_nothing any failed item rolls the batch back and raises BatchFailed
+        """
+        try:
+            reader_ids = sorted({reader_id for reader_id, _, _ in items})
+            book_ids = sorted({book_id for _, book_id, _ in items})
+            free_slots = {
+                row.id: settings.BOOKS_LIMIT_FOR_READER - row.active_rents
+                for row in session.execute(
+                    select(User.id, User.active_rents).where(User.id.in_(reader_ids)).order_by(User.id).with_for_update()
+                )
+            }
+            free_copies = dict(session.execute(
+                select(Book.id, Book.quantity).where(Book.id.in_(book_ids)).order_by(Book.id).with_for_update()
+            ).all())
+
+            rented, errors = [], []
+            for index, (reader_id, book_id, return_date) in enumerate(items):
+                if reader_id not in free_slots:
+                    errors.append({"index": index, "detail": Rent.ReaderNotFound.reason})
+                elif free_slots[reader_id] <= 0:
+                    errors.append({"index": index, "detail": Rent.BooksLimitExceed.reason})
+                elif free_copies.get(book_id, 0) <= 0:
+                    errors.append({"index": index, "detail": Rent.BookNotAvailable.reason})
+                else:
+                    free_slots[reader_id] -= 1
+                    free_copies[book_id] -= 1
+                    rented.append((index, reader_id, book_id, return_date))
+            if errors and all_or_nothing:
+                raise Rent.BatchFailed(errors)
+
+            ids = []
+            if rented:
+                Rent.__applyRentCounts(
+                    session,
+                    [(index, reader_id, book_id) for index, reader_id, book_id, _ in rented],
+                    sign=1,
+                )
+                rent_ids = session.scalars(
+                    insert(Rent).returning(Rent.rent_id, sort_by_parameter_order=True),
+                    [
+                        {"reader_id": reader_id, "book_id": book_id, "issue_date": date.today(), "return_date": return_date}
+                        for _, reader_id, book_id, return_date in rented
+                    ],
+                ).all()
+                ids = [{"index": row[0], "rent_id": rent_id} for row, rent_id in zip(rented, rent_ids)]
+            session.commit()
+        except Exception:
+            session.rollback()
+            raise
+
+        return {"status": "Ok", "rented": len(ids), "failed": len(errors), "ids": ids, "errors": errors}
+
+    @staticmethod
+    def return_books(session: Session, rent_ids: list, all_or_nothing: bool = True) -> dict:
+        """Returns many rents in one transaction\n
+        Rents are deleted by one 'DELETE ... WHERE rent_id IN (...) RETURNING' and appended to rent_history
+        by one multi-row INSERT, readers` active_rents and book quantities are changed by one set-based UPDATE each.
+        Returns {"status", "returned", "failed", "ids": [{"index", "book_id"}], "errors": [{"index", "detail"}]}.
+        With all_or_nothing unknown or repeated rent_id rolls the batch back and raises BatchFailed
+        """
+        try:
+            deleted = {
+                row.rent_id: row
+                for row in session.execute(
+                    delete(Rent).where(Rent.rent_id.in_(set(rent_ids))).returning(*RENT_COLUMNS)
+                )
+            }
+
+            returned, errors = [], []
+            for index, rent_id in enumerate(rent_ids):
+                rent = deleted.pop(rent_id, None)
+                if rent is None:
+                    errors.append({"index": index, "detail": Rent.RentNotFound.reason})
+                else:
+                    returned.append((index, rent))
+            if errors and all_or_nothing:
+                raise Rent.BatchFailed(errors)
+
+            if returned:
+                RentHistory.add(session, [rent for _, rent in returned], date.today())
+                Rent.__applyRentCounts(
+                    session,
+                    [(index, rent.reader_id, rent.book_id) for index, rent in returned],
+                    sign=-1,
+                )
+            session.commit()
+        except Exception:
+            session.rollback()
+            raise
+
+        ids = [{"index": index, "book_id": rent.book_id} for index, rent in returned]
+        return {"status": "Ok", "returned": len(ids), "failed": len(errors), "ids": ids, "errors": errors}
+
+    @staticmethod
+    def __applyRentCounts(session: Session, items: list, sign: int) -> None:
+        """Adds sign to active_rents of reader and takes it from quantity of book for every (index, reader_id, book_id)
+        item, one UPDATE per table\n
+        Conditions repeat limit and quantity checks and keep active_rents from going negative, so counts which
+        no longer fit raise BatchFailed with errors of items whose reader or book row wasn`t updated.
+        Limit is checked only for rents, so readers above lowered limit can still return books
+        """
+        readers = Counter(reader_id for _, reader_id, _ in items)
+        books = Counter(book_id for _, _, book_id in items)
+        reader_delta = case({id: sign * count for id, count in readers.items()}, value=User.id)
+        reader_conditions = [User.id.in_(readers), User.active_rents + reader_delta >= 0]
+        if sign > 0:
+            reader_conditions.append(User.active_rents + reader_delta <= settings.BOOKS_LIMIT_FOR_READER)
+        updated_readers = set(session.scalars(
+            update(User)
+            .where(*reader_conditions)
+            .values(active_rents=User.active_rents + reader_delta)
+            .returning(User.id)
+        ))
+        book_delta = case({id: sign * count for id, count in books.items()}, value=Book.id)
+        updated_books = set(session.scalars(
+            update(Book)
+            .where(Book.id.in_(books), Book.quantity - book_delta >= 0)
+            .values(quantity=Book.quantity - book_delta, version=Book.version + 1)
+            .returning(Book.id)
+        ))
+        if len(updated_readers) == len(readers) and len(updated_books) == len(books):
+            return
+
+        errors = []
+        for index, reader_id, book_id in items:
+            if reader_id not in updated_readers:
+                detail = (f"Reader {reader_id} has no free rent slots" if sign > 0
+                          else f"Reader {reader_id} has fewer active rents than returned")
+                errors.append({"index": index, "detail": detail})
+            elif book_id not in updated_books:
+                detail = f"Book {book_id} has no free copies" if sign > 0 else f"Book {book_id} not found"
+                errors.append({"index": index, "detail": detail})
+        raise Rent.BatchFailed(errors)
 
     def __init__(self, 
                  reader_id: int, 
@@ -212,14 +515,237 @@ class Rent(Base):
         
         """
         Initialization of new Rent object.
+        Doesn`t check reader`s books limit and book quantity, use rent_book or rent_books to rent books
         
         :param reader_id: ID of user who rents book                   \n
         :param book_id: ID of rented book                             \n
         :param return_date: Return date                               \n
         """
-        self.__checkBooksLimit(reader_id)
-
         self.reader_id = reader_id
         self.book_id = book_id
-        self.issue_date =  datetime.today().strftime('%Y-%m-%d')
+        self.issue_date = date.today()
         self.return_date = return_date
+
+
+RENT_COLUMNS = (Rent.rent_id, Rent.reader_id, Rent.book_id, Rent.issue_date, Rent.return_date)  # columns moved to rent_history
+
+
+class OverdueRent(Base):                                                            # ORM model for overdue_rent
+    """
+    Class for overdue_rent, rents not returned in time found by overdue sweeper (see overdue.py)\n
+    Atributes:\n
+    * rent_id - ID of overdue rent
+    * reader_id - ID of user who rents
+    * book_id - ID of rented book
+    * return_date - date when book had to be returned
+    * detected_date - date when sweeper found the rent overdue\n
+    rent_id has no foreign key, so sweeper inserts take no locks on rent_table rows and rents returned
+    after sweeper read them are inserted without error. Such rows are skipped by join with rent_table
+    on read and removed by sweeper at the end of pass\n
+    Methods:\n
+    * add - inserts found overdue rents, skipping already known ones
+    * purge_returned - removes rows of returned rents
+    """
+    __tablename__ = "overdue_rent"                                                                  # Table name
+
+    rent_id = Column("rent_id", Integer, primary_key=True, autoincrement=False)                     # rent_id       | int, primary key
+    reader_id = Column("reader_id", Integer, nullable=False, index=True)                            # reader_id     | int, not null, index
+    book_id = Column("book_id", Integer, nullable=False)                                            # book_id       | int, not null
+    return_date = Column("return_date", Date, nullable=False)                                       # return_date   | date, not null
+    detected_date = Column("detected_date", Date, nullable=False)                                   # detected_date | date, not null
+
+    @staticmethod
+    def add(session: Session, rents: list, detected_date: date) -> int:
+        """Inserts rents (rows with rent_id, reader_id, book_id, return_date) with one multi-row
+        'INSERT ... ON CONFLICT DO NOTHING', returns amount of new rows
+        """
+        statement = dialect_insert(session, OverdueRent.__table__).values([
+            {
+                "rent_id": rent.rent_id,
+                "reader_id": rent.reader_id,
+                "book_id": rent.book_id,
+                "return_date": rent.return_date,
+                "detected_date": detected_date,
+            }
+            for rent in rents
+        ])
+        return session.execute(statement.on_conflict_do_nothing(index_elements=["rent_id"])).rowcount
+
+    @staticmethod
+    def purge_returned(session: Session) -> int:
+        """Deletes rows whose rent no longer exists, returns amount of deleted rows"""
+        returned = ~select(Rent.rent_id).where(Rent.rent_id == OverdueRent.rent_id).exists()
+        return session.execute(
+            delete(OverdueRent).where(returned).execution_options(synchronize_session=False)
+        ).rowcount
+
+
+class RentHistory(Base):                                                            # ORM model for rent_history
+    """
+    Class for rent_history, append-only archive of returned rents\n
+    Atributes:\n
+    * rent_id - ID of returned rent
+    * reader_id - ID of user who rented book
+    * book_id - ID of rented book
+    * issue_date - date of issue this rent
+    * return_date - date when book had to be returned
+    * returned_date - date when book was returned\n
+    Rows are written in the return transaction by Rent.return_book and Rent.return_books
+    and by backfill of history.py, and are never updated.
+    On PostgreSQL table is range-partitioned by issue_date, one partition per year
+    and default partition for years without own partition\n
+    Methods:\n
+    * add - inserts returned rents, skipping already archived ones
+    * partition_name - returns name of year partition
+    * ensure_partitions - creates missing year partitions on PostgreSQL
+    """
+    __tablename__ = "rent_history"                                                                  # Table name
+    __table_args__ = (
+        Index("ix_rent_history_reader_id", "reader_id", "rent_id"),                                 # reader`s history ordered by rent_id
+        Index("ix_rent_history_book_id", "book_id", "rent_id"),                                     # book`s history ordered by rent_id
+        {"postgresql_partition_by": "RANGE (issue_date)"},
+    )
+
+    DEFAULT_PARTITION = "rent_history_default"                                                      # Partition for years without own partition
+
+    rent_id = Column("rent_id", Integer, primary_key=True, autoincrement=False)                     # rent_id       | int, primary key
+    reader_id = Column("reader_id", Integer, nullable=False)                                        # reader_id     | int, not null
+    book_id = Column("book_id", Integer, nullable=False)                                            # book_id       | int, not null
+    issue_date = Column("issue_date", Date, primary_key=True)                                       # issue_date    | date, primary key (partition key must be part of it)
+    return_date = Column("return_date", Date, nullable=False)                                       # return_date   | date, not null
+    returned_date = Column("returned_date", Date, nullable=False)                                   # returned_date | date, not null
+
+    @staticmethod
+    def add(session: Session, rents: list, returned_date: date | None = None) -> int:
+        """Inserts rents (rows with rent_id, reader_id, book_id, issue_date, return_date) with one multi-row
+        'INSERT ... ON CONFLICT DO NOTHING', returns amount of new rows.
+        returned_date is the same for all rents, if it is None rents must have own returned_date
+        """
+        statement = dialect_insert(session, RentHistory.__table__).values([
+            {
+                "rent_id": rent.rent_id,
+                "reader_id": rent.reader_id,
+                "book_id": rent.book_id,
+                "issue_date": rent.issue_date,
+                "return_date": rent.return_date,
+                "returned_date": returned_date or rent.returned_date,
+            }
+            for rent in rents
+        ])
+        return session.execute(
+            statement.on_conflict_do_nothing(index_elements=["rent_id", "issue_date"])
+        ).rowcount
+
+    @staticmethod
+    def partition_name(year: int) -> str:
+        """Returns name of partition with rents issued in year"""
+        return f"rent_history_y{year}"
+
+    @staticmethod
+    def ensure_partitions(connection, years: list) -> dict:
+        """Creates missing year partitions on PostgreSQL, does nothing on other databases\n
+        Year whose rents are already in default partition is skipped, because its partition can`t be attached
+        while default partition holds its rows. Returns {"created": [names], "in_default": [years]}
+        """
+        report = {"created": [], "in_default": []}
+        if connection.dialect.name != "postgresql":
+            return report
+        for year in years:
+            name = RentHistory.partition_name(year)
+            if connection.scalar(text("SELECT to_regclass(:name)"), {"name": name}) is not None:
+                continue
+            start, end = date(year, 1, 1), date(year + 1, 1, 1)
+            in_default = connection.scalar(
+                text(f"SELECT EXISTS (SELECT 1 FROM {RentHistory.DEFAULT_PARTITION} "
+                     "WHERE issue_date >= :start AND issue_date < :end)"),
+                {"start": start, "end": end},
+            )
+            if in_default:
+                report["in_default"].append(year)
+                continue
+            connection.execute(text(
+                f"CREATE TABLE {name} PARTITION OF rent_history "
+                f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+            ))
+            report["created"].append(name)
+        return report
+
+
+@event.listens_for(RentHistory.__table__, "after_create")
+def _create_rent_history_partitions(target, connection, **kw) -> None:
+    """Creates default partition and partitions of current and next year with rent_history on PostgreSQL"""
+    if connection.dialect.name != "postgresql":
+        return
+    connection.execute(text(
+        f"CREATE TABLE IF NOT EXISTS {RentHistory.DEFAULT_PARTITION} PARTITION OF rent_history DEFAULT"
+    ))
+    RentHistory.ensure_partitions(connection, [date.today().year, date.today().year + 1])
+
+
+class TableVersion(Base):                                                           # ORM model for table_version
+    """
+    Class for table_version\n
+    Atributes:\n
+    * table_name - name of versioned table
+    * version - change counter of table, incremented by every transaction which changes its rows\n
+    Methods:\n
+    * bump - increments change counters of tables
+    * get - returns change counter of table
+    """
+    __tablename__ = "table_version"                                                 # Table name
+
+    VERSIONED_TABLES = ("author_table",)                                            # Tables with change counter, book listing is versioned by its rows
+
+    table_name = Column("table_name", String(64), primary_key=True)                 # table_name    | character varying(64), primary key
+    version = Column("version", BigInteger, nullable=False, default=1)              # version       | bigint, not null, default = 1
+
+    @staticmethod
+    def bump(session: Session, *table_names: str) -> None:
+        """Increments change counters of tables in current transaction\n
+        Counter row is locked until commit, so call it right before commit
+        """
+        for table_name in table_names:
+            statement = dialect_insert(session, TableVersion.__table__).values(table_name=table_name, version=1)
+            session.execute(statement.on_conflict_do_update(
+                index_elements=[TableVersion.table_name],
+                set_={"version": TableVersion.version + 1},
+            ))
+
+    @staticmethod
+    def get(session: Session, table_name: str) -> int:
+        """Returns change counter of table, 0 if table wasn`t changed yet"""
+        version = session.scalar(select(TableVersion.version).where(TableVersion.table_name == table_name))
+        return version or 0
+
+
+@event.listens_for(Author, "before_update")
+@event.listens_for(Book, "before_update")
+def _increment_version(mapper, connection, target) -> None:
+    """Increments row version of changed author or book"""
+    session = object_session(target)
+    if session is not None and session.is_modified(target, include_collections=False):
+        target.version = type(target).version + 1
+
+
+@event.listens_for(Author, "after_insert")
+@event.listens_for(Author, "after_update")
+@event.listens_for(Author, "after_delete")
+def _mark_changed_table(mapper, connection, target) -> None:
+    """Remembers changed table to bump its change counter after flush"""
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault("changed_tables", set()).add(mapper.local_table.name)
+
+
+@event.listens_for(Session, "after_flush")
+def _bump_changed_tables(session: Session, flush_context) -> None:
+    """Bumps change counters of tables changed by flush"""
+    changed_tables = session.info.pop("changed_tables", None)
+    if changed_tables:
+        TableVersion.bump(session, *sorted(changed_tables))
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_changed_tables(session: Session) -> None:
+    """Forgets tables changed in rolled back transaction"""
+    session.info.pop("changed_tables", None)
@@ -0,0 +1,124 @@
+""" Full-text book search module \n
+    Search index covers book name, author name and book description:\n
+
+    * PostgreSQL - 'search_vector' tsvector column of book_table with GIN index
+    * SQLite - 'book_search' FTS5 virtual table\n
+    Both are filled by database triggers, so every way of writing books (ORM, Core, bulk ingest) keeps them up to date.
+    DDL is created with metadata.create_all, migration 0006 creates it for existing databases\n
+    Use 'search_books' to build ranked search statement for session`s dialect
+"""
+from sqlalchemy import DDL, Select, column, desc, event, func, literal_column, select, table
+from sqlalchemy.dialects.postgresql import TSVECTOR
+from db.models import Author, Book
+
+SEARCH_CONFIG = "simple"                        # text search configuration, no stemming and stop words
+
+POSTGRESQL_DDL = [
+    "ALTER TABLE book_table ADD COLUMN IF NOT EXISTS search_vector tsvector",
+    "CREATE INDEX IF NOT EXISTS ix_book_table_search_vector ON book_table USING GIN (search_vector)",
+    f"""CREATE OR REPLACE FUNCTION book_search_vector_update() RETURNS trigger AS $$
+BEGIN
+    NEW.search_vector :=
+        setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(NEW.name, '')), 'A') ||
+        setweight(to_tsvector('{SEARCH_CONFIG}', coalesce((SELECT name FROM author_table WHERE id = NEW.author_id), '')), 'B') ||
+        setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(NEW.description, '')), 'C');
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql""",
+    """CREATE TRIGGER book_search_vector BEFORE INSERT OR UPDATE OF name, description, author_id
+ON book_table FOR EACH ROW EXECUTE FUNCTION book_search_vector_update()""",
+    """CREATE OR REPLACE FUNCTION author_search_vector_update() RETURNS trigger AS $$
+BEGIN
+    UPDATE book_table SET name = name WHERE author_id = NEW.id;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql""",
+    """CREATE TRIGGER author_search_vector AFTER UPDATE OF name ON author_table
+FOR EACH ROW WHEN (OLD.name IS DISTINCT FROM NEW.name) EXECUTE FUNCTION author_search_vector_update()""",
+]
+
+SQLITE_DDL = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS book_search
+USING fts5(name, author, description, tokenize = 'unicode61 remove_diacritics 2')""",
+    """CREATE TRIGGER book_search_insert AFTER INSERT ON book_table BEGIN
+    INSERT INTO book_search (rowid, name, author, description)
+    VALUES (NEW.id, NEW.name, (SELECT name FROM author_table WHERE id = NEW.author_id), NEW.description);
+END""",
+    """CREATE TRIGGER book_search_update AFTER UPDATE OF name, description, author_id ON book_table BEGIN
+    UPDATE book_search
+    SET name = NEW.name, author = (SELECT name FROM author_table WHERE id = NEW.author_id), description = NEW.description
+    WHERE rowid = NEW.id;
+END""",
+    """CREATE TRIGGER book_search_delete AFTER DELETE ON book_table BEGIN
+    DELETE FROM book_search WHERE rowid = OLD.id;
+END""",
+    """CREATE TRIGGER author_search_update AFTER UPDATE OF name ON author_table BEGIN
+    UPDATE book_search SET author = NEW.name
+    WHERE rowid IN (SELECT id FROM book_table WHERE author_id = NEW.id);
+END""",
+]
+
+for statement in POSTGRESQL_DDL:
+    event.listen(Book.__table__, "after_create", DDL(statement).execute_if(dialect="postgresql"))
+for statement in SQLITE_DDL:
+    event.listen(Book.__table__, "after_create", DDL(statement).execute_if(dialect="sqlite"))
+event.listen(Book.__table__, "after_drop", DDL("DROP TABLE IF EXISTS book_search").execute_if(dialect="sqlite"))
+
+
+SEARCH_VECTOR = literal_column("book_table.search_vector", TSVECTOR)    # not mapped, so select(Book) doesn`t load it
+BOOK_SEARCH = table("book_search", column("rowid"))                     # FTS5 table, searched by its own name
+
+
+def _postgresql_matches(query: str) -> Select:
+    """Selects id and ts_rank_cd of books whose search_vector matches plainto_tsquery"""
+    ts_query = func.plainto_tsquery(SEARCH_CONFIG, query)
+    return select(
+        Book.id.label("id"), func.ts_rank_cd(SEARCH_VECTOR, ts_query).label("rank")
+    ).where(SEARCH_VECTOR.op("@@")(ts_query))
+
+
+def _fts5_query(query: str) -> str:
+    """Quotes every word of query, so FTS5 syntax in user input is searched as plain text"""
+    return " ".join('"' + word.replace('"', '""') + '"' for word in query.split())
+
+
+def _sqlite_matches(query: str) -> Select:
+    """Selects id and bm25 rank of books matching book_search, with weights of name, author and description"""
+    rank = -func.bm25(literal_column("book_search"), 10.0, 5.0, 1.0)     # bm25 is lower for better matches
+    return select(BOOK_SEARCH.c.rowid.label("id"), rank.label("rank")).where(
+        literal_column("book_search").op("MATCH")(_fts5_query(query))
+    )
+
+
+SEARCH_MATCHES = {
+    "postgresql": _postgresql_matches,
+    "sqlite": _sqlite_matches,
+}
+
+
+def search_books(dialect_name: str, query: str, limit: int, offset: int = 0) -> Select:
+    """Returns statement selecting books matching all words of query\n
+    Rows contain id, name, author, genre, publication_date and rank, best matches first.
+    Matches are ranked and limited by the search index alone, only rows of the page are joined with books and authors.
+    One extra row is selected to find out if next page exists
+    """
+    matches = (
+        SEARCH_MATCHES[dialect_name](query)
+        .order_by(desc("rank"), "id")
+        .offset(offset)
+        .limit(limit + 1)
+        .subquery("matches")
+    )
+    return (
+        select(
+            Book.id.label("id"),
+            Book.name.label("name"),
+            Author.name.label("author"),
+            Book.genre.label("genre"),
+            Book.publication_date.label("publication_date"),
+            matches.c.rank,
+        )
+        .join(matches, matches.c.id == Book.id)
+        .join(Author, Author.id == Book.author_id)
+        .order_by(matches.c.rank.desc(), Book.id)
+    )
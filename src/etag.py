@@ -0,0 +1,35 @@
+""" Conditional GET module \n
+    Use 'make_etag' to build strong ETag from row versions and change counters,
+    'etag_matches' to check If-None-Match header and 'not_modified' to answer with 304
+"""
+
+from fastapi import Request, Response
+
+CACHE_CONTROL = "private, no-cache"  # clients may store responses, but revalidate each time
+
+
+def make_etag(*parts) -> str:
+    """Returns strong ETag built from parts, for example ('book', 15, 'reader', 3, 1)"""
+    return '"' + "-".join(str(part) for part in parts) + '"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """True if If-None-Match header of request contains etag or '*'"""
+    header = request.headers.get("if-none-match")
+    if header is None:
+        return False
+    tags = [tag.strip() for tag in header.split(",")]
+    return "*" in tags or etag in tags or "W/" + etag in tags
+
+
+def set_etag(response: Response, etag: str) -> None:
+    """Adds ETag and Cache-Control headers to response"""
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = CACHE_CONTROL
+
+
+def not_modified(etag: str) -> Response:
+    """Returns empty 304 Not Modified response with etag"""
+    response = Response(status_code=304)
+    set_etag(response, etag)
+    return response
@@ -0,0 +1,81 @@
+""" Catalog export module \n
+    Use 'export_rows' to stream table rows as NDJSON or CSV chunks
+"""
+
+import csv
+import json
+import zlib
+from io import StringIO
+from sqlalchemy import Table, select
+from db.core import SessionLocal
+from db.models import Author, Book, Rent, RentHistory
+
+EXPORT_TABLES = {
+    "book": Book.__table__,
+    "author": Author.__table__,
+    "rent": Rent.__table__,
+    "rent_history": RentHistory.__table__,
+}
+
+MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+
+def _format_ndjson(columns: list, rows: list, with_header: bool) -> str:
+    """Formats rows as JSON objects, one per line"""
+    return "".join(
+        json.dumps(dict(zip(columns, row)), default=str, ensure_ascii=False) + "\n"
+        for row in rows
+    )
+
+
+def _format_csv(columns: list, rows: list, with_header: bool) -> str:
+    """Formats rows as CSV lines, with header line before the first batch"""
+    buffer = StringIO()
+    writer = csv.writer(buffer)
+    if with_header:
+        writer.writerow(columns)
+    writer.writerows(rows)
+    return buffer.getvalue()
+
+
+FORMATTERS = {
+    "ndjson": _format_ndjson,
+    "csv": _format_csv,
+}
+
+
+def export_rows(
+    table: Table, output_format: str, compress: bool = False, batch_size: int = 1000
+):
+    """Yields table rows ordered by primary key as NDJSON or CSV chunks\n
+    Rows are read with server-side cursor 'batch_size' rows at a time,
+    so memory usage doesn`t depend on table size\n
+    Opens own session, because response is streamed after request session is closed
+    """
+    formatter = FORMATTERS[output_format]
+    compressor = zlib.compressobj(wbits=31) if compress else None  # gzip container
+    statement = select(table).order_by(*table.primary_key.columns)
+
+    with SessionLocal() as session:
+        result = session.execute(
+            statement.execution_options(stream_results=True, yield_per=batch_size)
+        )
+        columns = list(result.keys())
+        with_header = True
+        for rows in result.partitions():
+            chunk = formatter(columns, rows, with_header).encode("utf-8")
+            with_header = False
+            if compressor is not None:
+                chunk = compressor.compress(chunk)
+            if chunk:
+                yield chunk
+
+        if with_header and output_format == "csv":
+            chunk = formatter(columns, [], True).encode("utf-8")
+            yield compressor.compress(chunk) if compressor is not None else chunk
+
+    if compressor is not None:
+        yield compressor.flush()
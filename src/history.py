@@ -0,0 +1,96 @@
+""" Rent history module \n
+    Returned rents are moved from rent_table to rent_history by Rent.return_book and Rent.return_books \n
+    Use 'ensure_partitions' to create year partitions of rent_history on PostgreSQL \n
+    Use 'backfill_history' to load returned rents kept outside of the database in batches \n
+    Run 'python history.py partitions' or 'python history.py backfill rents.ndjson --ndjson' from src directory
+"""
+
+import argparse
+import json
+import sys
+from datetime import date
+from sqlalchemy import func, select
+from db.core import SessionLocal
+from db.models import Rent, RentHistory
+from ingest import _read_records, _validate
+from validators import RentHistoryRecordModel
+
+
+def ensure_partitions(years_ahead: int = 1) -> dict:
+    """Creates year partitions of rent_history for issue years of active rents and 'years_ahead' next years\n
+    Active rents are archived into partition of their issue year, so it must exist before they are returned
+    """
+    with SessionLocal() as session:
+        first_issue_date = session.scalar(select(func.min(Rent.issue_date)))
+        first_year = first_issue_date.year if first_issue_date else date.today().year
+        report = RentHistory.ensure_partitions(
+            session.connection(),
+            list(range(first_year, date.today().year + years_ahead + 1)),
+        )
+        session.commit()
+    return report
+
+
+def backfill_history(records: list, batch_size: int = 1000) -> dict:
+    """Validates returned rent records and inserts them into rent_history\n
+    Every batch of 'batch_size' records is inserted in its own short transaction, so backfill
+    doesn`t hold locks long and can be restarted: already archived rents are skipped.
+    Records of rents still present in rent_table are reported as errors
+    """
+    errors = []
+    valid = _validate(records, RentHistoryRecordModel, errors)
+    inserted = candidates = 0
+    for start in range(0, len(valid), batch_size):
+        batch = valid[start : start + batch_size]
+        with SessionLocal() as session:
+            active_ids = set(
+                session.scalars(
+                    select(Rent.rent_id).where(
+                        Rent.rent_id.in_([record.rent_id for _, record in batch])
+                    )
+                )
+            )
+            rents = []
+            for index, record in batch:
+                if record.rent_id in active_ids:
+                    errors.append({"index": index, "detail": "Rent is not returned"})
+                else:
+                    rents.append(record)
+            candidates += len(rents)
+            if rents:
+                inserted += RentHistory.add(session, rents)
+                session.commit()
+
+    return {
+        "status": "Ok",
+        "inserted": inserted,
+        "skipped": candidates - inserted,
+        "failed": len(errors),
+        "errors": sorted(errors, key=lambda row: row["index"]),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rent history maintenance")
+    commands = parser.add_subparsers(dest="command", required=True)
+    partitions = commands.add_parser("partitions", help="create year partitions")
+    partitions.add_argument(
+        "--years-ahead", type=int, default=1, help="partitions of next years to create"
+    )
+    backfill = commands.add_parser("backfill", help="load returned rents")
+    backfill.add_argument("path", help="JSON array or NDJSON file, '-' for stdin")
+    backfill.add_argument("--ndjson", action="store_true", help="file is NDJSON")
+    backfill.add_argument(
+        "--batch-size", type=int, default=1000, help="records in one transaction"
+    )
+    args = parser.parse_args()
+
+    if args.command == "partitions":
+        print(json.dumps(ensure_partitions(args.years_ahead)))
+    else:
+        if args.path == "-":
+            records = _read_records(sys.stdin, args.ndjson)
+        else:
+            with open(args.path, encoding="utf-8") as file:
+                records = _read_records(file, args.ndjson)
+        print(json.dumps(backfill_history(records, args.batch_size)))
@@ -0,0 +1,203 @@
+""" Bulk catalog ingest module \n
+    Use 'ingest_authors' and 'ingest_books' to load many records in one transaction \n
+    Run 'python ingest.py books books.json' from src directory to load records from file
+"""
+
+import argparse
+import json
+import sys
+from pydantic import BaseModel, ValidationError
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from db.core import SessionLocal, dialect_insert
+from db.models import Author, Book, TableVersion
+from validators import AuthorCreateModel, BookCreateModel
+
+INSERT_CHUNK_SIZE = 1000  # rows in one multi-row INSERT
+
+
+def _validate(records: list, model: type[BaseModel], errors: list) -> list:
+    """Validates records, returns list of (index, model) and adds invalid records to errors"""
+    valid = []
+    for index, record in enumerate(records):
+        try:
+            valid.append((index, model.model_validate(record)))
+        except ValidationError as e:
+            detail = "; ".join(
+                f"{'.'.join(map(str, error['loc']))}: {error['msg']}"
+                for error in e.errors()
+            )
+            errors.append({"index": index, "detail": detail})
+    return valid
+
+
+def _insert(
+    session: Session, table, rows: list, hash_column: str, errors: list
+) -> list:
+    """Inserts rows with multi-row INSERT ... ON CONFLICT DO NOTHING\n
+    rows is list of (index, values), returns list of {"index", "id"} of inserted rows
+    and adds rows conflicting with existing hashes to errors.
+    Bumps change counter of versioned table if any row was inserted
+    """
+    inserted = []
+    for start in range(0, len(rows), INSERT_CHUNK_SIZE):
+        chunk = rows[start : start + INSERT_CHUNK_SIZE]
+        statement = (
+            dialect_insert(session, table)
+            .values([values for _, values in chunk])
+            .on_conflict_do_nothing(index_elements=[hash_column])
+            .returning(table.c.id, table.c[hash_column])
+        )
+        ids = {row[1]: row[0] for row in session.execute(statement)}
+        for index, values in chunk:
+            if values[hash_column] in ids:
+                inserted.append({"index": index, "id": ids[values[hash_column]]})
+            else:
+                errors.append(
+                    {"index": index, "detail": f"{hash_column} already exists"}
+                )
+    if inserted and table.name in TableVersion.VERSIONED_TABLES:
+        TableVersion.bump(session, table.name)
+    return inserted
+
+
+def _drop_batch_duplicates(rows: list, hash_column: str, errors: list) -> list:
+    """Keeps first row of each hash in batch, adds other rows to errors"""
+    unique = []
+    seen = {}
+    for index, values in rows:
+        first_index = seen.setdefault(values[hash_column], index)
+        if first_index != index:
+            errors.append(
+                {
+                    "index": index,
+                    "detail": f"{hash_column} duplicates record {first_index}",
+                }
+            )
+            continue
+        unique.append((index, values))
+    return unique
+
+
+def _report(inserted: list, errors: list) -> dict:
+    """Forms ingest report"""
+    return {
+        "status": "Ok",
+        "inserted": len(inserted),
+        "failed": len(errors),
+        "ids": sorted(inserted, key=lambda row: row["index"]),
+        "errors": sorted(errors, key=lambda row: row["index"]),
+    }
+
+
+def ingest_authors(session: Session, records: list) -> dict:
+    """Validates and inserts authors in one transaction\n
+    Invalid records and author_hash conflicts are reported per record and don`t abort the batch
+    """
+    errors = []
+    rows = [
+        (
+            index,
+            {
+                "name": author.name,
+                "bio": author.bio,
+                "birth_date": author.birth_date,
+                "author_hash": Author.make_hash(author.name, author.birth_date),
+            },
+        )
+        for index, author in _validate(records, AuthorCreateModel, errors)
+    ]
+    rows = _drop_batch_duplicates(rows, "author_hash", errors)
+
+    inserted = _insert(session, Author.__table__, rows, "author_hash", errors)
+    session.commit()
+    return _report(inserted, errors)
+
+
+def ingest_books(session: Session, records: list) -> dict:
+    """Validates and inserts books in one transaction\n
+    Invalid records, unknown authors and book_hash conflicts are reported per record
+    and don`t abort the batch
+    """
+    errors = []
+    books = []
+    for index, book in _validate(records, BookCreateModel, errors):
+        if book.quantity not in range(-2_147_483_647, 2_147_483_647):
+            errors.append(
+                {"index": index, "detail": "quantity: Value out of int range"}
+            )
+            continue
+        books.append((index, book))
+
+    author_ids = {book.author_id for _, book in books}
+    existing_author_ids = set(
+        session.scalars(select(Author.id).where(Author.id.in_(author_ids)))
+    )
+
+    rows = []
+    for index, book in books:
+        if book.author_id not in existing_author_ids:
+            errors.append(
+                {
+                    "index": index,
+                    "detail": f"Author with author_id = {book.author_id} doesn't exist.",
+                }
+            )
+            continue
+        rows.append(
+            (
+                index,
+                {
+                    "name": book.name,
+                    "description": book.description,
+                    "publication_date": book.publication_date,
+                    "author_id": book.author_id,
+                    "genre": book.genre,
+                    "quantity": book.quantity,
+                    "book_hash": Book.make_hash(book.name, book.publication_date),
+                },
+            )
+        )
+    rows = _drop_batch_duplicates(rows, "book_hash", errors)
+
+    inserted = _insert(session, Book.__table__, rows, "book_hash", errors)
+    session.commit()
+    return _report(inserted, errors)
+
+
+INGESTERS = {
+    "authors": ingest_authors,
+    "books": ingest_books,
+}
+
+
+def _read_records(file, ndjson: bool) -> list:
+    """Reads JSON array or NDJSON records from file"""
+    if ndjson:
+        return [json.loads(line) for line in file if line.strip()]
+    return json.load(file)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bulk load authors or books")
+    parser.add_argument("kind", choices=INGESTERS.keys())
+    parser.add_argument("path", help="JSON array or NDJSON file, '-' for stdin")
+    parser.add_argument("--ndjson", action="store_true", help="file is NDJSON")
+    parser.add_argument(
+        "--batch-size", type=int, default=5000, help="records in one transaction"
+    )
+    args = parser.parse_args()
+
+    if args.path == "-":
+        records = _read_records(sys.stdin, args.ndjson)
+    else:
+        with open(args.path, encoding="utf-8") as file:
+            records = _read_records(file, args.ndjson)
+
+    ingest = INGESTERS[args.kind]
+    for start in range(0, len(records), args.batch_size):
+        with SessionLocal() as session:
+            report = ingest(session, records[start : start + args.batch_size])
+        for row in report["ids"] + report["errors"]:
+            row["index"] += start
+        print(json.dumps(report, default=str))
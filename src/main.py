@@ -1,16 +1,255 @@
 """Main module with FastAPI endpoints"""
 
-from fastapi import FastAPI, Request, Response, HTTPException
-from fastapi.responses import RedirectResponse
-from db.models import User, Author, Book, Rent
-from db.core import session
-from hashlib import sha256
-from sqlalchemy.orm import load_only
-from auth import JWTvalidator, TokenHandler, Validation
+from hashlib import md5
+from hmac import compare_digest
+from typing import Annotated, Literal
+from fastapi import (
+    FastAPI,
+    Request,
+    Response,
+    HTTPException,
+    Depends,
+    Query,
+    Body,
+    BackgroundTasks,
+)
+from fastapi.responses import ORJSONResponse, RedirectResponse, StreamingResponse
+from db.models import User, Author, Book, Rent, OverdueRent, RentHistory, TableVersion
+from db.core import SessionLocal, get_session
+from db.search import search_books
+from config import settings
+from cache import create_cache
+from passwords import PasswordHasher, password_hasher
+from pagination import (
+    PageParams,
+    CursorPageParams,
+    OffsetPageParams,
+    paginate,
+    paginate_sorted,
+    make_page,
+    make_sorted_page,
+    make_offset_page,
+)
+from etag import make_etag, etag_matches, set_etag, not_modified
+from export import EXPORT_TABLES, MEDIA_TYPES, export_rows
+from ingest import ingest_authors, ingest_books
+from metrics import CONTENT_TYPE, MetricsMiddleware, render
+from query_budget import query_budget
+from overdue import overdue_sweeper_lifespan
+from pydantic import BaseModel
+from sqlalchemy import Select, bindparam, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, load_only
+from auth import (
+    TokenHandler,
+    TokenRenewalMiddleware,
+    Validation,
+    user_cache,
+    token_cache,
+)
+from starlette.concurrency import run_in_threadpool
 from validators import *
 
 
-app = FastAPI()
+app = FastAPI(default_response_class=ORJSONResponse, lifespan=overdue_sweeper_lifespan)
+app.add_middleware(TokenRenewalMiddleware)
+app.add_middleware(MetricsMiddleware)
+
+# Reader view of book: one joined SELECT of public fields, labeled as response keys.
+# Built once, so SQLAlchemy reuses its compiled form on every request
+BOOK_READER_VIEW = (
+    select(
+        Book.name.label("Book name"),
+        Book.description.label("Description"),
+        Book.genre.label("Genre"),
+        Book.publication_date.label("Publication date"),
+        Author.name.label("Author"),
+        Book.id.label("Book Article"),
+        Book.version.label("book_version"),
+        Author.version.label("author_version"),
+    )
+    .join(Author, Author.id == Book.author_id)
+    .where(Book.id == bindparam("book_id"))
+)
+
+# Versions behind ETag of book, checked before loading the book itself
+BOOK_VERSIONS = (
+    select(Book.version.label("book_version"), Author.version.label("author_version"))
+    .join(Author, Author.id == Book.author_id)
+    .where(Book.id == bindparam("book_id"))
+)
+AUTHOR_VERSION = select(Author.version).where(Author.id == bindparam("author_id"))
+
+# Book and author detail responses, keyed by table, id and role
+response_cache = create_cache(
+    settings.RESPONSE_CACHE_BACKEND,
+    settings.RESPONSE_CACHE_SIZE,
+    settings.RESPONSE_CACHE_TTL_SEC,
+    settings.RESPONSE_CACHE_URL,
+)
+
+
+def detail_cache_key(table: str, id: int, is_admin: bool) -> str:
+    """Returns response cache key of book or author detail view"""
+    return f"{table}:{id}:{'admin' if is_admin else 'reader'}"
+
+
+def book_etag(id: int, is_admin: bool, book_version: int, author_version: int) -> str:
+    """Returns ETag of book detail view\n
+    Reader view contains author name, so its ETag depends on author version too
+    """
+    if is_admin:
+        return make_etag("book", id, "admin", book_version)
+    return make_etag("book", id, "reader", book_version, author_version)
+
+
+def detail_response(cached: dict) -> ORJSONResponse:
+    """Returns cached detail view ({"etag", "body"}) as response with ETag\n
+    Body is already serialized by its response model, so it is returned as is and response_model
+    of the endpoint doesn`t validate it again
+    """
+    response = ORJSONResponse(cached["body"])
+    set_etag(response, cached["etag"])
+    return response
+
+
+def book_body(book, is_admin: bool) -> dict:
+    """Serializes book detail view with its response model\n
+    book is Book for admin and BOOK_READER_VIEW row for reader
+    """
+    if is_admin:
+        return BookResponseModel.model_validate(book).model_dump(mode="json")
+    return BookReaderResponseModel.model_validate(book).model_dump(
+        mode="json", by_alias=True
+    )
+
+
+def list_etag(
+    table_name: str,
+    version: int | str,
+    page: PageParams | CursorPageParams,
+    filters: BaseModel | None = None,
+) -> str:
+    """Returns ETag of listing page built from change counter of table or rows_version of page\n
+    Filters are included as hash, so user input never gets into the header
+    """
+    if filters is None:
+        return make_etag(table_name, version, page.limit, page.after)
+    filters_hash = md5(filters.model_dump_json().encode()).hexdigest()[:16]
+    return make_etag(table_name, version, page.limit, page.after, filters_hash)
+
+
+def rows_version(rows) -> str:
+    """Returns hash of (id, version) pairs of page rows\n
+    It changes when any row of page is changed, deleted or replaced by other row,
+    so listing doesn`t need change counter of the whole table
+    """
+    pairs = ",".join(f"{id}:{version}" for id, version in rows)
+    return md5(pairs.encode()).hexdigest()[:16]
+
+
+# Sort options of book listing: column and direction, ties are ordered by id
+BOOK_SORTS = {
+    "id": (Book.id, False),
+    "publication_date": (Book.publication_date, False),
+    "-publication_date": (Book.publication_date, True),
+}
+
+
+def book_list_statement(filters: BookFilterModel, page: CursorPageParams) -> Select:
+    """Returns statement selecting one page of filtered and sorted books\n
+    Every filter combination is served by an index: author_id by ix_book_table_author_id,
+    genre sorted by id by ix_book_table_genre, publication date range and sort by date
+    by composite indexes on (genre, publication_date, id) and (publication_date, id).
+    'available' filter is checked on rows read by index
+    """
+    statement = select(Book)
+    if filters.genre is not None:
+        statement = statement.where(Book.genre == filters.genre)
+    if filters.author_id is not None:
+        statement = statement.where(Book.author_id == filters.author_id)
+    if filters.published_from is not None:
+        statement = statement.where(Book.publication_date >= filters.published_from)
+    if filters.published_to is not None:
+        statement = statement.where(Book.publication_date <= filters.published_to)
+    if filters.available:
+        statement = statement.where(Book.quantity > 0)
+
+    sort_column, descending = BOOK_SORTS[filters.sort]
+    return paginate_sorted(statement, sort_column, Book.id, page, descending)
+
+
+def overdue_statement(reader_id: int | None, page: PageParams) -> Select:
+    """Returns statement selecting one page of overdue rents ordered by rent_id\n
+    Join with rent_table hides rents returned after the last sweep
+    """
+    statement = select(OverdueRent).join(Rent, Rent.rent_id == OverdueRent.rent_id)
+    if reader_id is not None:
+        statement = statement.where(OverdueRent.reader_id == reader_id)
+    return paginate(statement, OverdueRent.rent_id, page)
+
+
+def rent_history_statement(filters: RentHistoryFilterModel, page: PageParams) -> Select:
+    """Returns statement selecting one page of returned rents ordered by rent_id\n
+    Issue date range limits PostgreSQL scan to partitions of its years
+    """
+    statement = select(RentHistory)
+    if filters.reader_id is not None:
+        statement = statement.where(RentHistory.reader_id == filters.reader_id)
+    if filters.book_id is not None:
+        statement = statement.where(RentHistory.book_id == filters.book_id)
+    if filters.issued_from is not None:
+        statement = statement.where(RentHistory.issue_date >= filters.issued_from)
+    if filters.issued_to is not None:
+        statement = statement.where(RentHistory.issue_date <= filters.issued_to)
+    return paginate(statement, RentHistory.rent_id, page)
+
+
+def create_user(session: Session, user: User) -> tuple[str, str]:
+    """Inserts new user and returns its pair of tokens, runs in threadpool"""
+    try:
+        session.add(user)
+        session.flush()
+        tokens = TokenHandler.generate_user_tokens(user)
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+    return tokens
+
+
+def find_user(session: Session, username: str) -> User | None:
+    """Returns user by username, runs in threadpool"""
+    return session.scalars(select(User).where(User.username == username)).first()
+
+
+def replace_password_hash(user_id: int, old_hash: str, new_hash: str) -> None:
+    """Replaces password hash if it wasn`t changed meanwhile, runs in threadpool"""
+    with SessionLocal() as session:
+        session.execute(
+            update(User)
+            .where(User.id == user_id, User.password == old_hash)
+            .values(password=new_hash)
+        )
+        session.commit()
+
+
+async def rehash_password(user_id: int, password_hash: str, password: str) -> None:
+    """Replaces outdated password hash after login response is sent\n
+    If hashing queue is full, hash stays outdated until next login
+    """
+    try:
+        new_hash = await password_hasher.hash_async(password)
+    except PasswordHasher.Busy:
+        return
+    await run_in_threadpool(replace_password_hash, user_id, password_hash, new_hash)
+
+
+def invalidate_details(table: str, *ids: int) -> None:
+    """Removes cached detail views of all roles for given ids"""
+    for id in ids:
+        for is_admin in (True, False):
+            response_cache.invalidate(detail_cache_key(table, id, is_admin))
 
 
 @app.route(path="/auth/refresh", methods=["GET", "POST", "DELETE", "PUT"])
@@ -30,19 +269,19 @@ def refresh(request: Request):
         HTTPException: If refresh token is missing, invalid or user not found
     """
 
-    try:
-        refresh_token = request.cookies["refresh_token"]
-    except KeyError:
+    if "refresh_token" not in request.cookies:
         raise HTTPException(
             status_code=401,
             detail="Cannot find refresh token. Login or register via /auth/login or /auth/register",
         )
 
-    is_valid = JWTvalidator.check(refresh_token)
-    if not is_valid:
+    try:
+        claims = TokenHandler.get_claims(request, "refresh_token")
+    except Exception:
         raise HTTPException(status_code=401, detail="Invalid refresh token")
 
-    user = TokenHandler.get_user_bytoken(refresh_token)
+    with SessionLocal() as session:
+        user = TokenHandler.get_user_byid(claims["userId"], session)
     if user is None:
         raise HTTPException(status_code=401, detail="User not found")
 
@@ -61,25 +300,37 @@ def refresh(request: Request):
 
 
 @app.post("/auth/register")
-def register(input_user: RegisterUserModel, response: Response, request: Request):
+@query_budget(1)
+async def register(
+    input_user: RegisterUserModel,
+    response: Response,
+    request: Request,
+    session: Session = Depends(get_session),
+):
     """
     Register new user endpoint.
 
     Creates new user account with provided details.
+    Password is hashed in password hashing pool without holding a threadpool thread,
+    if hashing queue is full answers 503 at once.
 
     Args:
         input_user (registerUserModel): User registration details
         response (Response): Response object to set auth tokens
         request (Request): The incoming request object
+        session (Session): Request-scoped database session
 
     Returns:
         dict: Status message confirming account creation
 
     Raises:
-        HTTPException: If account creation fails
+        HTTPException: If account creation fails or password hashing queue is full
     """
-    password = input_user.password
-    hash = sha256(password.encode("utf-8")).hexdigest()
+    try:
+        hash = await password_hasher.hash_async(input_user.password)
+    except PasswordHasher.Busy as e:
+        raise HTTPException(status_code=503, detail=e.reason)
+
     user = User(
         input_user.first_name,
         input_user.second_name,
@@ -89,54 +340,69 @@ def register(input_user: RegisterUserModel, response: Response, request: Request
     )
 
     try:
-        session.add(user)
-        session.commit()
+        tokens = await run_in_threadpool(create_user, session, user)
     except Exception as e:
-        session.rollback()
         raise HTTPException(
             status_code=400, detail="Cannot create your account. Check request."
         )
 
-    TokenHandler.set_tokens(user, response)
+    TokenHandler.set_tokens(user, response, tokens)
     return {"status": "Ok", "detail": "Your account was created"}
 
 
 @app.post("/auth/login")
-def login(input_user: LoginUserModel, response: Response):
+@query_budget(1)
+async def login(
+    input_user: LoginUserModel,
+    response: Response,
+    background_tasks: BackgroundTasks,
+    session: Session = Depends(get_session),
+):
     """
     User login endpoint.
 
     Authenticates user credentials and sets auth tokens.
+    Password is verified in password hashing pool without holding a threadpool thread,
+    if hashing queue is full answers 503 at once. Outdated hash is replaced after response.
 
     Args:
         input_user (loginUserModel): Login credentials
         response (Response): Response object to set auth tokens
+        background_tasks (BackgroundTasks): Tasks run after response, used for rehash
+        session (Session): Request-scoped database session
 
     Returns:
         dict: Status message confirming successful login
 
     Raises:
-        HTTPException: If credentials are invalid
+        HTTPException: If credentials are invalid or password hashing queue is full
     """
 
-    password = input_user.password
-    hash = sha256(password.encode("utf-8")).hexdigest()
-
-    user = session.query(User).filter(User.username == input_user.username).first()
+    user = await run_in_threadpool(find_user, session, input_user.username)
 
     if user is None:
         return {"status": "Failed", "message": "User not found"}
 
-    user_hash = user.password
+    try:
+        is_password_valid = await password_hasher.verify_async(
+            input_user.password, user.password
+        )
+    except PasswordHasher.Busy as e:
+        raise HTTPException(status_code=503, detail=e.reason)
 
-    if user_hash == hash:
-        TokenHandler.set_tokens(user, response)
-        return {"status": "Ok", "detail": f"You logged in as {user.username}"}
-    else:
+    if not is_password_valid:
         raise HTTPException(
             401, detail="Wrong username or password. Check your request"
         )
 
+    if password_hasher.needs_rehash(user.password):
+        background_tasks.add_task(
+            rehash_password, user.id, user.password, input_user.password
+        )
+
+    TokenHandler.set_tokens(user, response)
+    return {"status": "Ok", "detail": f"You logged in as {user.username}"}
+
 
 @app.get("/auth/logout")
 def logout(response: Response):
@@ -159,7 +425,12 @@ def logout(response: Response):
 
 
 @app.post("/author/create")
-def create_author(request: Request, author_input: AuthorCreateModel):
+@query_budget(3)
+def create_author(
+    request: Request,
+    author_input: AuthorCreateModel,
+    session: Session = Depends(get_session),
+):
     """
     Create new author endpoint.
 
@@ -168,6 +439,7 @@ def create_author(request: Request, author_input: AuthorCreateModel):
     Args:
         request (Request): The incoming request object
         author_input (authorCreateModel): Author details
+        session (Session): Request-scoped database session
 
     Returns:
         dict: Status message confirming author creation
@@ -175,7 +447,7 @@ def create_author(request: Request, author_input: AuthorCreateModel):
     Raises:
         HTTPException: If creation fails or unauthorized
     """
-    validation_response = Validation.validate(request, True)
+    validation_response = Validation(request, session).validate(request, True)
     if validation_response is not None:
         return validation_response
 
@@ -192,44 +464,114 @@ def create_author(request: Request, author_input: AuthorCreateModel):
     return {"status": "Ok", "detail": "Author created"}
 
 
-@app.get("/author/{id}")
-def get_author(id: int, request: Request):
+@app.post("/author/bulk")
+@query_budget(3)
+def create_authors_bulk(
+    request: Request,
+    records: list[dict] = Body(..., max_length=settings.BULK_MAX_RECORDS),
+    session: Session = Depends(get_session),
+):
+    """
+    Bulk create authors endpoint.
+
+    Validates and inserts many authors (AuthorCreateModel records) in one transaction.
+    Invalid records and author_hash conflicts are reported per record and don't abort the batch.
+    Requires admin privileges.
+
+    Args:
+        request (Request): The incoming request object
+        records (list[dict]): Author records
+        session (Session): Request-scoped database session
+
+    Returns:
+        dict: Amount of inserted and failed records, IDs of inserted records and errors
+
+    Raises:
+        HTTPException: If unauthorized
+    """
+    validation_response = Validation(request, session).validate(request, True)
+    if validation_response is not None:
+        return validation_response
+
+    return ingest_authors(session, records)
+
+
+@app.get("/author/{id}", response_model=AuthorResponseModel | None)
+@query_budget(3)
+def get_author(
+    id: int,
+    request: Request,
+    session: Session = Depends(get_session),
+):
     """
     Get author by ID endpoint.
 
     Retrieves author details by ID. Requires admin privileges.
+    Response is served from response cache until author is changed.
+    Answers 304 Not Modified if If-None-Match header contains current ETag.
 
     Args:
         id (int): Author ID
         request (Request): The incoming request object
+        session (Session): Request-scoped database session
 
     Returns:
-        Author: Author details if found
+        ORJSONResponse: Author details with ETag if found
 
     Raises:
         HTTPException: If ID invalid or unauthorized
     """
-    validation_response = Validation.validate(request, True)
+    validation_response = Validation(request, session).validate(request, True)
     if validation_response is not None:
         return validation_response
 
     if id not in range(-2_147_483_647, 2_147_483_647):
         raise HTTPException(status_code=400, detail="Value out of int range")
 
-    author = session.query(Author).filter(Author.id == id).first()
-
-    return author
-
-
-@app.get("/author")
-def get_all_authors(request: Request):
+    key = detail_cache_key("author", id, True)
+    cached_author = response_cache.get(key)
+    etag = None
+    if cached_author is not None:
+        etag = cached_author["etag"]
+    elif "if-none-match" in request.headers:
+        version = session.scalar(AUTHOR_VERSION, {"author_id": id})
+        if version is not None:
+            etag = make_etag("author", id, version)
+    if etag is not None and etag_matches(request, etag):
+        return not_modified(etag)
+
+    if cached_author is None:
+        generation = response_cache.generation(key)
+        author = session.get(Author, id)
+        if author is None:
+            return None
+        cached_author = {
+            "etag": make_etag("author", id, author.version),
+            "body": AuthorResponseModel.model_validate(author).model_dump(mode="json"),
+        }
+        response_cache.set(key, cached_author, generation=generation)
+
+    return detail_response(cached_author)
+
+
+@app.get("/author", response_model=PageModel[AuthorResponseModel])
+@query_budget(3)
+def get_all_authors(
+    request: Request,
+    response: Response,
+    page: PageParams = Depends(),
+    session: Session = Depends(get_session),
+):
     """
     Get all authors endpoint.
 
     Retrieves list of all authors. Requires admin privileges.
+    Answers 304 Not Modified without reading authors if author_table wasn`t changed.
 
     Args:
         request (Request): The incoming request object
+        response (Response): Response used to set ETag header
+        session (Session): Request-scoped database session
 
     Returns:
         list[Author]: List of all authors
@@ -237,16 +579,27 @@ def get_all_authors(request: Request):
     Raises:
         HTTPException: If unauthorized
     """
-    validation_response = Validation.validate(request, True)
+    validation_response = Validation(request, session).validate(request, True)
     if validation_response is not None:
         return validation_response
 
-    authors = session.query(Author).all()
-    return authors
+    etag = list_etag("author_table", TableVersion.get(session, "author_table"), page)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+
+    authors = session.scalars(paginate(select(Author), Author.id, page)).all()
+    set_etag(response, etag)
+    return make_page(authors, page)
 
 
 @app.put("/author/{id}")
-def update_author(request: Request, author_input: AuthorCreateModel, id: int):
+@query_budget(5)
+def update_author(
+    request: Request,
+    author_input: AuthorCreateModel,
+    id: int,
+    session: Session = Depends(get_session),
+):
     """
     Update author endpoint.
 
@@ -256,6 +609,7 @@ def update_author(request: Request, author_input: AuthorCreateModel, id: int):
         request (Request): The incoming request object
         author_input (authorCreateModel): Updated author details
         id (int): Author ID to update
+        session (Session): Request-scoped database session
 
     Returns:
         dict: Status message confirming update
@@ -263,13 +617,13 @@ def update_author(request: Request, author_input: AuthorCreateModel, id: int):
     Raises:
         HTTPException: If update fails or unauthorized
     """
-    validation_response = Validation.validate(request, True)
+    validation_response = Validation(request, session).validate(request, True)
     if validation_response is not None:
         return validation_response
 
     if id not in range(-2_147_483_647, 2_147_483_647):
         raise HTTPException(status_code=400, detail="Value out of int range")
-    author = get_author(id, request)
+    author = session.get(Author, id)
 
     try:
         author.name = author_input.name
@@ -283,11 +637,18 @@ def update_author(request: Request, author_input: AuthorCreateModel, id: int):
             detail="Cannot update author information. Check your request.",
         )
 
+    invalidate_details("author", id)
+    # reader view of book contains author name
+    invalidate_details(
+        "book", *session.scalars(select(Book.id).where(Book.author_id == id))
+    )
+
     return {"status": "Ok", "detail": "Author info updated"}
 
 
 @app.delete("/author/{id}")
-def delete_author(request: Request, id: int):
+@query_budget(4)
+def delete_author(request: Request, id: int, session: Session = Depends(get_session)):
     """
     Delete author endpoint.
 
@@ -296,36 +657,43 @@ def delete_author(request: Request, id: int):
     Args:
         request (Request): The incoming request object
         id (int): Author ID to delete
+        session (Session): Request-scoped database session
 
     Returns:
         dict: Status message confirming deletion
 
     Raises:
-        HTTPException: If deletion fails or unauthorized
+        HTTPException: 404 if author not found, 400 if author has books, or if unauthorized
     """
-    validation_response = Validation.validate(request, True)
+    validation_response = Validation(request, session).validate(request, True)
     if validation_response is not None:
         return validation_response
 
     if id not in range(-2_147_483_647, 2_147_483_647):
         raise HTTPException(status_code=400, detail="Value out of int range")
 
+    author = session.get(Author, id)
+    if author is None:
+        raise HTTPException(status_code=404, detail="Author not found")
     try:
-        author = get_author(id, request)
-        if author is None:
-            raise HTTPException(status_code=400, detail="Author not found")
         session.delete(author)
         session.commit()
-    except Exception as e:
-        raise HTTPException(
-            status_code=400, detail="Cannot delete author. Check your request."
-        )
+    except IntegrityError:
+        # books reference author, get_session rolls transaction back
+        raise HTTPException(status_code=400, detail="Cannot delete author with books")
+
+    invalidate_details("author", id)
 
     return {"status": "Ok", "detail": "Author deleted"}
 
 
 @app.post("/book/create")
-def create_book(request: Request, book_input: BookCreateModel):
+@query_budget(4)
+def create_book(
+    request: Request,
+    book_input: BookCreateModel,
+    session: Session = Depends(get_session),
+):
     """
     Create new book endpoint.
 
@@ -334,6 +702,7 @@ def create_book(request: Request, book_input: BookCreateModel):
     Args:
         request (Request): The incoming request object
         book_input (bookCreateModel): Book details
+        session (Session): Request-scoped database session
 
     Returns:
         dict: Status message confirming book creation
@@ -341,7 +710,7 @@ def create_book(request: Request, book_input: BookCreateModel):
     Raises:
         HTTPException: If creation fails or unauthorized
     """
-    validation_response = Validation.validate(request, True)
+    validation_response = Validation(request, session).validate(request, True)
     if validation_response is not None:
         return validation_response
 
@@ -374,24 +743,104 @@ def create_book(request: Request, book_input: BookCreateModel):
     return {"status": "Ok", "detail": "Book was created"}
 
 
-@app.get("/book/{id}")
-def get_book(request: Request, id: int):
+@app.post("/book/bulk")
+@query_budget(4)
+def create_books_bulk(
+    request: Request,
+    records: list[dict] = Body(..., max_length=settings.BULK_MAX_RECORDS),
+    session: Session = Depends(get_session),
+):
+    """
+    Bulk create books endpoint.
+
+    Validates and inserts many books (BookCreateModel records) in one transaction.
+    Invalid records, unknown authors and book_hash conflicts are reported per record
+    and don't abort the batch. Requires admin privileges.
+
+    Args:
+        request (Request): The incoming request object
+        records (list[dict]): Book records
+        session (Session): Request-scoped database session
+
+    Returns:
+        dict: Amount of inserted and failed records, IDs of inserted records and errors
+
+    Raises:
+        HTTPException: If unauthorized
+    """
+    validation_response = Validation(request, session).validate(request, True)
+    if validation_response is not None:
+        return validation_response
+
+    return ingest_books(session, records)
+
+
+@app.get("/book/search", response_model=OffsetPageModel[BookSearchResultModel])
+@query_budget(2)
+def search_book(
+    request: Request,
+    q: str = Query(min_length=1, max_length=200),
+    page: OffsetPageParams = Depends(),
+    session: Session = Depends(get_session),
+):
+    """
+    Search books endpoint.
+
+    Full-text search over book names, author names and descriptions.
+    Books matching all words of query are returned best matches first.
+
+    Args:
+        request (Request): The incoming request object
+        q (str): Search query
+        page (OffsetPageParams): limit and offset of results page
+        session (Session): Request-scoped database session
+
+    Returns:
+        dict: Page of found books with id, name, author, genre, publication_date and rank
+
+    Raises:
+        HTTPException: If query is empty or unauthorized
+    """
+    validation_response = Validation(request, session).validate(request)
+    if validation_response is not None:
+        return validation_response
+    if not q.split():
+        raise HTTPException(status_code=400, detail="Empty search query")
+
+    dialect_name = session.get_bind().dialect.name
+    statement = search_books(dialect_name, q, page.limit, page.offset)
+    books = session.execute(statement).all()
+    return make_offset_page(books, page)
+
+
+@app.get(
+    "/book/{id}", response_model=BookResponseModel | BookReaderResponseModel | None
+)
+@query_budget(3)
+def get_book(
+    request: Request,
+    id: int,
+    session: Session = Depends(get_session),
+):
     """
     Get book by ID endpoint.
 
     Retrieves book details by ID. Returns different fields based on user role.
+    Responses of both roles are served from response cache until book is changed.
+    Answers 304 Not Modified if If-None-Match header contains current ETag.
 
     Args:
         request (Request): The incoming request object
         id (int): Book ID
+        session (Session): Request-scoped database session
 
     Returns:
-        Book|dict: Full book details for admin, limited details for regular users
+        ORJSONResponse: Full book details for admin, limited details for regular users, with ETag
 
     Raises:
         HTTPException: If ID invalid or unauthorized
     """
-    validation = Validation(request)
+    validation = Validation(request, session)
     validation_response = validation.validate(request)
     if validation_response is not None:
         return validation_response
@@ -399,53 +848,62 @@ def get_book(request: Request, id: int):
         raise HTTPException(status_code=400, detail="Value out if int range")
 
     is_admin = validation.is_admin
-
-    if is_admin:
-        book = session.query(Book).filter(Book.id == id).first()
-        return book
-
-    book = (
-        session.query(Book)
-        .options(
-            load_only(
-                Book.name,
-                Book.description,
-                Book.genre,
-                Book.publication_date,
-                Book.author_id,
-                Book.id,
-                Book.description,
-            )
-        )
-        .first()
-    )
-
-    author = (
-        session.query(Author)
-        .filter(Author.id == book.author_id)
-        .options(load_only(Author.name))
-        .first()
-    )
-
-    return {
-        "Book name": book.name,
-        "Description": book.description,
-        "Genre": book.genre,
-        "Publication date": book.publication_date,
-        "Author": author.name,
-        "Book Article": book.id,
-    }
-
-
-@app.get("/book")
-def get_all_books(request: Request):
+    key = detail_cache_key("book", id, is_admin)
+    cached_book = response_cache.get(key)
+    etag = None
+    if cached_book is not None:
+        etag = cached_book["etag"]
+    elif "if-none-match" in request.headers:
+        versions = session.execute(BOOK_VERSIONS, {"book_id": id}).first()
+        if versions is not None:
+            etag = book_etag(id, is_admin, *versions)
+    if etag is not None and etag_matches(request, etag):
+        return not_modified(etag)
+
+    if cached_book is None:
+        generation = response_cache.generation(key)
+        if is_admin:
+            book = session.get(Book, id)
+            versions = (book.version, None) if book is not None else None
+        else:
+            book = session.execute(BOOK_READER_VIEW, {"book_id": id}).mappings().first()
+            if book is not None:
+                book = dict(book)
+                versions = (book.pop("book_version"), book.pop("author_version"))
+        if book is None:
+            return None
+        cached_book = {
+            "etag": book_etag(id, is_admin, *versions),
+            "body": book_body(book, is_admin),
+        }
+        response_cache.set(key, cached_book, generation=generation)
+
+    return detail_response(cached_book)
+
+
+@app.get("/book", response_model=CursorPageModel[BookResponseModel])
+@query_budget(3)
+def get_all_books(
+    request: Request,
+    response: Response,
+    filters: Annotated[BookFilterModel, Query()],
+    page: CursorPageParams = Depends(),
+    session: Session = Depends(get_session),
+):
     """
     Get all books endpoint.
 
-    Retrieves list of all books. Requires admin privileges.
+    Retrieves list of books filtered by genre, author, publication date range
+    and availability, sorted by id or publication date. Requires admin privileges.
+    ETag is built from ids and versions of page rows, so rents and returns of other books
+    don`t change it. Answers 304 Not Modified after reading only ids and versions of page rows.
 
     Args:
         request (Request): The incoming request object
+        response (Response): Response used to set ETag header
+        filters (BookFilterModel): Filter and sort query parameters
+        page (CursorPageParams): limit and after (next_cursor of previous page) of listing page
+        session (Session): Request-scoped database session
 
     Returns:
         list[Book]: List of all books
@@ -453,16 +911,33 @@ def get_all_books(request: Request):
     Raises:
         HTTPException: If unauthorized
     """
-    validation_response = Validation.validate(request, True)
+    validation_response = Validation(request, session).validate(request, True)
     if validation_response is not None:
         return validation_response
 
-    book = session.query(Book).all()
-    return book
+    statement = book_list_statement(filters, page)
+    if "if-none-match" in request.headers:
+        versions = session.execute(
+            statement.with_only_columns(Book.id, Book.version)
+        ).all()
+        etag = list_etag("book_table", rows_version(versions), page, filters)
+        if etag_matches(request, etag):
+            return not_modified(etag)
+
+    books = session.scalars(statement).all()
+    versions = [(book.id, book.version) for book in books]
+    set_etag(response, list_etag("book_table", rows_version(versions), page, filters))
+    return make_sorted_page(books, page, BOOK_SORTS[filters.sort][0], Book.id)
 
 
 @app.put("/book/{id}")
-def update_book(request: Request, book_input: BookCreateModel, id: int):
+@query_budget(5)
+def update_book(
+    request: Request,
+    book_input: BookCreateModel,
+    id: int,
+    session: Session = Depends(get_session),
+):
     """
     Update book endpoint.
 
@@ -472,6 +947,7 @@ def update_book(request: Request, book_input: BookCreateModel, id: int):
         request (Request): The incoming request object
         book_input (bookCreateModel): Updated book details
         id (int): Book ID to update
+        session (Session): Request-scoped database session
 
     Returns:
         dict: Status message confirming update
@@ -479,7 +955,7 @@ def update_book(request: Request, book_input: BookCreateModel, id: int):
     Raises:
         HTTPException: If update fails or unauthorized
     """
-    validation_response = Validation.validate(request, True)
+    validation_response = Validation(request, session).validate(request, True)
     if validation_response is not None:
         return validation_response
 
@@ -494,7 +970,7 @@ def update_book(request: Request, book_input: BookCreateModel, id: int):
             detail=f"Author with author_id = {book_input.author_id} doesn't exist.",
         )
 
-    book = get_book(request, id)
+    book = session.get(Book, id)
 
     try:
         book.name = book_input.name
@@ -510,11 +986,13 @@ def update_book(request: Request, book_input: BookCreateModel, id: int):
             status_code=400, detail="Cannot update book. Check your request."
         )
 
+    invalidate_details("book", id)
     return {"status": "Ok", "detail": "Book was updated"}
 
 
 @app.delete("/book/{id}")
-def delete_book(request: Request, id: int):
+@query_budget(4)
+def delete_book(request: Request, id: int, session: Session = Depends(get_session)):
     """
     Delete book endpoint.
 
@@ -523,34 +1001,43 @@ def delete_book(request: Request, id: int):
     Args:
         request (Request): The incoming request object
         id (int): Book ID to delete
+        session (Session): Request-scoped database session
 
     Returns:
         dict: Status message confirming deletion
 
     Raises:
-        HTTPException: If deletion fails or unauthorized
+        HTTPException: 404 if book not found, 400 if book has active rents, or if unauthorized
     """
-    validation_response = Validation.validate(request, True)
+    validation_response = Validation(request, session).validate(request, True)
     if validation_response is not None:
         return validation_response
 
     if id not in range(-2_147_483_647, 2_147_483_647):
         raise HTTPException(status_code=400, detail="Id value out of int range")
 
+    book = session.get(Book, id)
+    if book is None:
+        raise HTTPException(status_code=404, detail="Book not found")
     try:
-        book = get_book(request, id)
         session.delete(book)
         session.commit()
-    except Exception as e:
-        raise HTTPException(
-            status_code=400, detail="Cannot delete book. Check your request."
-        )
+    except IntegrityError:
+        # active rents reference book, get_session rolls transaction back
+        raise HTTPException(status_code=400, detail="Cannot delete book with active rents")
+
+    invalidate_details("book", id)
 
     return {"status": "Ok", "detail": "Book was deleted"}
 
 
 @app.post("/book/rent")
-def rent_book(request: Request, book_input: BookRentModel):
+@query_budget(5)
+def rent_book(
+    request: Request,
+    book_input: BookRentModel,
+    session: Session = Depends(get_session),
+):
     """
     Rent book endpoint.
 
@@ -559,6 +1046,7 @@ def rent_book(request: Request, book_input: BookRentModel):
     Args:
         request (Request): The incoming request object
         book_input (bookRentModel): Rental details
+        session (Session): Request-scoped database session
 
     Returns:
         dict: Status message with rental ID
@@ -566,31 +1054,141 @@ def rent_book(request: Request, book_input: BookRentModel):
     Raises:
         HTTPException: If rental fails or unauthorized
     """
-    validation_response = Validation.validate(request, True)
+    validation_response = Validation(request, session).validate(request, True)
     if validation_response is not None:
         return validation_response
 
     try:
-        rent = Rent(book_input.reader_id, book_input.book_id, book_input.return_date)
-    except Rent.BooksLimitExceed as e:
+        rent_id = Rent.rent_book(
+            session, book_input.reader_id, book_input.book_id, book_input.return_date
+        )
+    except (
+        Rent.ReaderNotFound,
+        Rent.BooksLimitExceed,
+        Rent.BookNotAvailable,
+    ) as e:
         raise HTTPException(status_code=400, detail=e.reason)
+    except:
+        raise HTTPException(
+            status_code=400, detail="Cannot rent a book. Check your request"
+        )
+
+    invalidate_details("book", book_input.book_id)
+    return {"status": "Ok", "detail": "Book was rented", "rent_id": rent_id}
+
+
+@app.post("/book/rent/batch")
+@query_budget(7)
+def rent_books_batch(
+    request: Request,
+    items: list[BookRentModel] = Body(
+        ..., min_length=1, max_length=settings.RENT_BATCH_MAX_ITEMS
+    ),
+    mode: Literal["all_or_nothing", "per_item"] = "all_or_nothing",
+    session: Session = Depends(get_session),
+):
+    """
+    Batch rent books endpoint.
+
+    Rents many books in one transaction: limits of readers and copies of books
+    are checked once for the whole batch, counters are changed with set-based SQL.
+    In all_or_nothing mode any failed item cancels the batch,
+    in per_item mode failed items are reported and others are rented.
+    Requires admin privileges.
+
+    Args:
+        request (Request): The incoming request object
+        items (list[BookRentModel]): Rentals
+        mode (str): all_or_nothing or per_item
+        session (Session): Request-scoped database session
+
+    Returns:
+        dict: Amount of rented and failed items, rent IDs and errors by item index
+
+    Raises:
+        HTTPException: If batch fails in all_or_nothing mode or unauthorized
+    """
+    validation_response = Validation(request, session).validate(request, True)
+    if validation_response is not None:
+        return validation_response
 
     try:
-        book = session.query(Book).filter(Book.id == book_input.book_id).first()
-        session.add(rent)
-        book.quantity = book.quantity - 1
-        session.commit()
+        report = Rent.rent_books(
+            session,
+            [(item.reader_id, item.book_id, item.return_date) for item in items],
+            all_or_nothing=mode == "all_or_nothing",
+        )
+    except Rent.BatchFailed as e:
+        raise HTTPException(
+            status_code=400, detail={"reason": e.reason, "errors": e.errors}
+        )
     except:
-        session.rollback()
         raise HTTPException(
-            status_code=400, detail="Cannot rent a book. Check your request"
+            status_code=400, detail="Cannot rent books. Check your request"
         )
 
-    return {"status": "Ok", "detail": "Book was rented", "rent_id": rent.rent_id}
+    invalidate_details("book", *{items[row["index"]].book_id for row in report["ids"]})
+    return report
+
+
+@app.post("/book/return/batch")
+@query_budget(6)
+def return_books_batch(
+    request: Request,
+    items: list[RentReturnModel] = Body(
+        ..., min_length=1, max_length=settings.RENT_BATCH_MAX_ITEMS
+    ),
+    mode: Literal["all_or_nothing", "per_item"] = "all_or_nothing",
+    session: Session = Depends(get_session),
+):
+    """
+    Batch return books endpoint.
+
+    Returns many rents in one transaction with set-based SQL.
+    In all_or_nothing mode unknown rent cancels the batch,
+    in per_item mode it is reported and other rents are returned.
+    Requires admin privileges.
+
+    Args:
+        request (Request): The incoming request object
+        items (list[RentReturnModel]): Rents to return
+        mode (str): all_or_nothing or per_item
+        session (Session): Request-scoped database session
+
+    Returns:
+        dict: Amount of returned and failed items, book IDs and errors by item index
+
+    Raises:
+        HTTPException: If batch fails in all_or_nothing mode or unauthorized
+    """
+    validation_response = Validation(request, session).validate(request, True)
+    if validation_response is not None:
+        return validation_response
+
+    try:
+        report = Rent.return_books(
+            session,
+            [item.rent_id for item in items],
+            all_or_nothing=mode == "all_or_nothing",
+        )
+    except Rent.BatchFailed as e:
+        raise HTTPException(
+            status_code=400, detail={"reason": e.reason, "errors": e.errors}
+        )
+    except:
+        raise HTTPException(400, detail="Cannot return books")
+
+    invalidate_details("book", *{row["book_id"] for row in report["ids"]})
+    return report
 
 
 @app.post("/book/return")
-def return_book(request: Request, rent_input: RentReturnModel):
+@query_budget(6)
+def return_book(
+    request: Request,
+    rent_input: RentReturnModel,
+    session: Session = Depends(get_session),
+):
     """
     Return book endpoint.
 
@@ -599,6 +1197,7 @@ def return_book(request: Request, rent_input: RentReturnModel):
     Args:
         request (Request): The incoming request object
         rent_input (rentReturnModule): Return details
+        session (Session): Request-scoped database session
 
     Returns:
         dict: Status message confirming return
@@ -606,25 +1205,97 @@ def return_book(request: Request, rent_input: RentReturnModel):
     Raises:
         HTTPException: If return fails or unauthorized
     """
-    validation_response = Validation.validate(request, True)
+    validation_response = Validation(request, session).validate(request, True)
     if validation_response is not None:
         return validation_response
 
     try:
-        rent = session.query(Rent).filter(Rent.rent_id == rent_input.rent_id).first()
-        book = session.query(Book).filter(Book.id == rent.book_id).first()
-        session.delete(rent)
-        book.quantity = book.quantity + 1
-        session.commit()
+        book_id = Rent.return_book(session, rent_input.rent_id)
+    except Rent.RentNotFound as e:
+        raise HTTPException(400, detail=e.reason)
     except:
-        session.rollback()
         raise HTTPException(400, detail="Cannot return book")
 
+    invalidate_details("book", book_id)
     return {"status": "Ok", "detail": "Book was returned"}
 
 
-@app.get("/reader")
-def get_readers(request: Request):
+@app.get("/rent/overdue", response_model=PageModel[OverdueRentResponseModel])
+@query_budget(2)
+def get_overdue_rents(
+    request: Request,
+    reader_id: int | None = Query(None, gt=0),
+    page: PageParams = Depends(),
+    session: Session = Depends(get_session),
+):
+    """
+    Get overdue rents endpoint.
+
+    Retrieves rents not returned in time, as found by overdue sweeper (overdue.py).
+    Reads only overdue_rent table, optionally filtered by reader. Requires admin privileges.
+
+    Args:
+        request (Request): The incoming request object
+        reader_id (int): Optional reader ID
+        page (PageParams): limit and after (rent_id) of listing page
+        session (Session): Request-scoped database session
+
+    Returns:
+        dict: Page of overdue rents with days_overdue
+
+    Raises:
+        HTTPException: If unauthorized
+    """
+    validation_response = Validation(request, session).validate(request, True)
+    if validation_response is not None:
+        return validation_response
+
+    rents = session.scalars(overdue_statement(reader_id, page)).all()
+    return make_page(rents, page, get_id=lambda rent: rent.rent_id)
+
+
+@app.get("/rent/history", response_model=PageModel[RentHistoryResponseModel])
+@query_budget(2)
+def get_rent_history(
+    request: Request,
+    filters: Annotated[RentHistoryFilterModel, Query()],
+    page: PageParams = Depends(),
+    session: Session = Depends(get_session),
+):
+    """
+    Get rent history endpoint.
+
+    Retrieves returned rents from rent_history, filtered by reader, book and issue date range.
+    Reads only rent_history, so reports don't touch rent_table used by rents and returns.
+    Requires admin privileges.
+
+    Args:
+        request (Request): The incoming request object
+        filters (RentHistoryFilterModel): reader_id, book_id, issued_from and issued_to
+        page (PageParams): limit and after (rent_id) of listing page
+        session (Session): Request-scoped database session
+
+    Returns:
+        dict: Page of returned rents
+
+    Raises:
+        HTTPException: If unauthorized
+    """
+    validation_response = Validation(request, session).validate(request, True)
+    if validation_response is not None:
+        return validation_response
+
+    rents = session.scalars(rent_history_statement(filters, page)).all()
+    return make_page(rents, page, get_id=lambda rent: rent.rent_id)
+
+
+@app.get("/reader", response_model=PageModel[ReaderResponseModel])
+@query_budget(2)
+def get_readers(
+    request: Request,
+    page: PageParams = Depends(),
+    session: Session = Depends(get_session),
+):
     """
     Get all readers endpoint.
 
@@ -632,6 +1303,7 @@ def get_readers(request: Request):
 
     Args:
         request (Request): The incoming request object
+        session (Session): Request-scoped database session
 
     Returns:
         list[User]: List of all readers
@@ -639,12 +1311,12 @@ def get_readers(request: Request):
     Raises:
         HTTPException: If unauthorized
     """
-    validation_response = Validation.validate(request, True)
+    validation_response = Validation(request, session).validate(request, True)
     if validation_response is not None:
         return validation_response
 
-    readers = (
-        session.query(User)
+    statement = (
+        select(User)
         .filter(User.is_admin == False)
         .options(
             load_only(
@@ -655,14 +1327,15 @@ def get_readers(request: Request):
                 User.birth_date,
             )
         )
-        .all()
     )
+    readers = session.scalars(paginate(statement, User.id, page)).all()
 
-    return readers
+    return make_page(readers, page)
 
 
-@app.get("/reader/{id}")
-def get_reader(request: Request, id: int):
+@app.get("/reader/{id}", response_model=ReaderResponseModel | None)
+@query_budget(2)
+def get_reader(request: Request, id: int, session: Session = Depends(get_session)):
     """
     Get reader by ID endpoint.
 
@@ -671,6 +1344,7 @@ def get_reader(request: Request, id: int):
     Args:
         request (Request): The incoming request object
         id (int): Reader ID
+        session (Session): Request-scoped database session
 
     Returns:
         User: Reader details if found
@@ -678,7 +1352,7 @@ def get_reader(request: Request, id: int):
     Raises:
         HTTPException: If ID invalid or unauthorized
     """
-    validation_response = Validation.validate(request, True)
+    validation_response = Validation(request, session).validate(request, True)
     if validation_response is not None:
         return validation_response
 
@@ -704,8 +1378,9 @@ def get_reader(request: Request, id: int):
     return reader
 
 
-@app.get("/profile")
-def get_profile(request: Request):
+@app.get("/profile", response_model=ProfileResponseModel)
+@query_budget(1)
+def get_profile(request: Request, session: Session = Depends(get_session)):
     """
     Get user profile endpoint.
 
@@ -713,6 +1388,7 @@ def get_profile(request: Request):
 
     Args:
         request (Request): The incoming request object
+        session (Session): Request-scoped database session
 
     Returns:
         dict: User profile details
@@ -720,7 +1396,7 @@ def get_profile(request: Request):
     Raises:
         HTTPException: If unauthorized
     """
-    validation = Validation(request)
+    validation = Validation(request, session)
     validation_response = validation.validate(request, False)
     if validation_response is not None:
         return validation_response
@@ -735,7 +1411,12 @@ def get_profile(request: Request):
 
 
 @app.put("/profile")
-def update_profile(input_user: UpdateUserModel, request: Request):
+@query_budget(3)
+def update_profile(
+    input_user: UpdateUserModel,
+    request: Request,
+    session: Session = Depends(get_session),
+):
     """
     Update user profile endpoint.
 
@@ -744,6 +1425,7 @@ def update_profile(input_user: UpdateUserModel, request: Request):
     Args:
         input_user (updateUserModel): Updated profile details
         request (Request): The incoming request object
+        session (Session): Request-scoped database session
 
     Returns:
         dict: Status message confirming update
@@ -751,12 +1433,12 @@ def update_profile(input_user: UpdateUserModel, request: Request):
     Raises:
         HTTPException: If update fails or unauthorized
     """
-    validation = Validation(request)
+    validation = Validation(request, session)
     validation_response = validation.validate(request)
     if validation_response is not None:
         return validation_response
 
-    user = validation.get_user()
+    user = session.get(User, validation.claims["userId"])
 
     try:
         user.first_name = input_user.first_name
@@ -770,3 +1452,104 @@ def update_profile(input_user: UpdateUserModel, request: Request):
         )
 
     return {"status": "Ok", "detail": "Your profile was updated"}
+
+
+@app.get("/export/{table}")
+@query_budget(1)
+def export_table(
+    request: Request,
+    table: Literal["book", "author", "rent", "rent_history"],
+    output_format: Literal["ndjson", "csv"] = Query("ndjson", alias="format"),
+    gzip: bool = False,
+    session: Session = Depends(get_session),
+):
+    """
+    Export table endpoint.
+
+    Streams all rows of book_table, author_table, rent_table or rent_history as NDJSON or CSV.
+    Rows are read with server-side cursor, so memory usage doesn't depend on table size.
+    Requires admin privileges.
+
+    Args:
+        request (Request): The incoming request object
+        table (str): Exported table: book, author, rent or rent_history
+        output_format (str): Output format: ndjson or csv
+        gzip (bool): Compress output with gzip
+        session (Session): Request-scoped database session
+
+    Returns:
+        StreamingResponse: Table rows
+
+    Raises:
+        HTTPException: If unauthorized
+    """
+    validation_response = Validation(request, session).validate(request, True)
+    if validation_response is not None:
+        return validation_response
+
+    filename = f"{table}.{output_format}"
+    media_type = MEDIA_TYPES[output_format]
+    if gzip:
+        filename += ".gz"
+        media_type = "application/gzip"
+
+    return StreamingResponse(
+        export_rows(EXPORT_TABLES[table], output_format, gzip),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
+@app.get("/stats/cache")
+def get_cache_stats(request: Request, session: Session = Depends(get_session)):
+    """
+    Get cache statistics endpoint.
+
+    Returns hit, miss and eviction counters of caches. Requires admin privileges.
+
+    Args:
+        request (Request): The incoming request object
+        session (Session): Request-scoped database session
+
+    Returns:
+        dict: Counters of each cache
+
+    Raises:
+        HTTPException: If unauthorized
+    """
+    validation_response = Validation(request, session).validate(request, True)
+    if validation_response is not None:
+        return validation_response
+
+    return {
+        "user_cache": user_cache.stats(),
+        "token_cache": token_cache.stats(),
+        "response_cache": response_cache.stats(),
+    }
+
+
+@app.get("/metrics", include_in_schema=False)
+def get_metrics(request: Request):
+    """
+    Get metrics endpoint.
+
+    Returns request latency per route, database queries, database time, pool checkout wait
+    and JWT decoding time per request and pool connections in Prometheus text format.
+    Metrics are collected in memory, so rendering is the only work done for scrape.
+    If METRICS_TOKEN is set, requires it as bearer token.
+
+    Args:
+        request (Request): The incoming request object
+
+    Returns:
+        Response: Metrics in Prometheus text format
+
+    Raises:
+        HTTPException: If metrics token is set and request doesn't have it
+    """
+    if settings.METRICS_TOKEN and not compare_digest(
+        request.headers.get("Authorization", ""), f"Bearer {settings.METRICS_TOKEN}"
+    ):
+        raise HTTPException(status_code=401, detail="Invalid metrics token")
+
+    return Response(render(), media_type=CONTENT_TYPE)
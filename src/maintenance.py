@@ -0,0 +1,30 @@
+""" Database maintenance commands \n
+    Run 'python maintenance.py reconcile-rents' from src directory to rebuild readers` active_rents counters
+"""
+
+import argparse
+import json
+import sys
+from db.core import SessionLocal
+from db.models import Rent
+
+
+def reconcile_rents() -> int:
+    """Rebuilds active_rents counters from rent_table, returns exit code"""
+    with SessionLocal() as session:
+        report = Rent.reconcile_active_rents(session)
+    print(json.dumps(report))
+    return 1 if report["over_limit"] else 0
+
+
+COMMANDS = {
+    "reconcile-rents": reconcile_rents,
+}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Database maintenance commands")
+    parser.add_argument("command", choices=COMMANDS.keys())
+    args = parser.parse_args()
+
+    sys.exit(COMMANDS[args.command]())
@@ -0,0 +1,336 @@
+""" Request metrics module \n
+    Records latency of requests per route and, for every request, amount and time of database queries,
+    time of waiting for pooled connections and time of JWT decoding \n
+    class MetricsMiddleware records request metrics, 'instrument_engine' adds query hooks to engine,
+    InstrumentedQueuePool and InstrumentedAsyncQueuePool record connection checkout wait \n
+    Use 'render' to get all metrics in Prometheus text format
+"""
+
+from bisect import bisect_left
+from contextvars import ContextVar
+from threading import Lock
+from time import perf_counter
+from sqlalchemy import event
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+from config import settings
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LATENCY_BUCKETS = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+
+def _escape(value: str) -> str:
+    """Escapes label value for Prometheus text format"""
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names: tuple, values: tuple) -> str:
+    """Formats label set, empty string if there are no labels"""
+    return ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+
+
+class Histogram:
+    """Prometheus histogram with label sets\n
+    observe costs one bisect and few additions under lock, cumulative bucket counts
+    are computed only when metrics are rendered
+    """
+
+    def __init__(self, name: str, help: str, label_names: tuple, buckets: tuple):
+        """
+        Initialization of new histogram.
+
+        :param name: Metric name                                     \n
+        :param help: Metric description                              \n
+        :param label_names: Names of labels, values are passed to observe  \n
+        :param buckets: Sorted upper bounds of buckets               \n
+        """
+        self.name = name
+        self.help = help
+        self.label_names = label_names
+        self.buckets = buckets
+        self.__series = {}  # label values -> [bucket counts, sum, count]
+        self.__lock = Lock()
+
+    def observe(self, label_values: tuple, value: float) -> None:
+        """Adds value to series of label values"""
+        index = bisect_left(self.buckets, value)
+        with self.__lock:
+            series = self.__series.get(label_values)
+            if series is None:
+                series = self.__series[label_values] = [
+                    [0] * (len(self.buckets) + 1),
+                    0.0,
+                    0,
+                ]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self) -> list:
+        """Returns lines of histogram in Prometheus text format"""
+        with self.__lock:
+            series = [
+                (labels, list(counts), total, count)
+                for labels, (counts, total, count) in self.__series.items()
+            ]
+
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for label_values, counts, total, count in sorted(series):
+            labels = _labels(self.label_names, label_values)
+            prefix = labels + "," if labels else ""
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + ("+Inf",), counts):
+                cumulative += bucket_count
+                lines.append(f'{self.name}_bucket{{{prefix}le="{bound}"}} {cumulative}')
+            suffix = f"{{{labels}}}" if labels else ""
+            lines.append(f"{self.name}_sum{suffix} {total}")
+            lines.append(f"{self.name}_count{suffix} {count}")
+        return lines
+
+
+REQUEST_LABELS = ("method", "route")
+
+request_duration = Histogram(
+    "http_request_duration_seconds",
+    "Time of handling request",
+    REQUEST_LABELS + ("status",),
+    LATENCY_BUCKETS,
+)
+request_queries = Histogram(
+    "http_request_db_queries",
+    "Database queries made by request",
+    REQUEST_LABELS,
+    QUERY_BUCKETS,
+)
+request_db_time = Histogram(
+    "http_request_db_seconds",
+    "Time of database queries made by request",
+    REQUEST_LABELS,
+    LATENCY_BUCKETS,
+)
+request_pool_wait = Histogram(
+    "http_request_db_pool_wait_seconds",
+    "Time request waited for pooled connections",
+    REQUEST_LABELS,
+    LATENCY_BUCKETS,
+)
+request_auth_time = Histogram(
+    "http_request_auth_seconds",
+    "Time of JWT decoding made by request",
+    REQUEST_LABELS,
+    LATENCY_BUCKETS,
+)
+query_duration = Histogram(
+    "db_query_duration_seconds", "Time of database query", ("engine",), LATENCY_BUCKETS
+)
+pool_wait = Histogram(
+    "db_pool_checkout_wait_seconds",
+    "Time of getting connection from pool",
+    ("engine",),
+    LATENCY_BUCKETS,
+)
+
+HISTOGRAMS = (
+    request_duration,
+    request_queries,
+    request_db_time,
+    request_pool_wait,
+    request_auth_time,
+    query_duration,
+    pool_wait,
+)
+
+
+class RequestStats:
+    """Database and authentication counters of one request"""
+
+    __slots__ = ("queries", "db_seconds", "pool_wait_seconds", "auth_seconds")
+
+    def __init__(self):
+        """RequestStats constructor"""
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.pool_wait_seconds = 0.0
+        self.auth_seconds = 0.0
+
+
+# Counters of current request, endpoints run in threadpool with copy of request context,
+# so their queries are added to the same object
+_request_stats: ContextVar[RequestStats | None] = ContextVar(
+    "request_stats", default=None
+)
+
+
+def record_auth(seconds: float) -> None:
+    """Adds time of JWT decoding to current request"""
+    stats = _request_stats.get()
+    if stats is not None:
+        stats.auth_seconds += seconds
+
+
+def _record_pool_wait(engine_name: str, seconds: float) -> None:
+    """Records time of connection checkout"""
+    pool_wait.observe((engine_name,), seconds)
+    stats = _request_stats.get()
+    if stats is not None:
+        stats.pool_wait_seconds += seconds
+
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool recording time of waiting for connection, including opening new one"""
+
+    engine_name = "sync"
+
+    def _do_get(self):
+        """Gets connection from pool"""
+        started = perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            _record_pool_wait(self.engine_name, perf_counter() - started)
+
+
+class InstrumentedAsyncQueuePool(AsyncAdaptedQueuePool):
+    """AsyncAdaptedQueuePool recording time of waiting for connection, including opening new one"""
+
+    engine_name = "async"
+
+    def _do_get(self):
+        """Gets connection from pool"""
+        started = perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            _record_pool_wait(self.engine_name, perf_counter() - started)
+
+
+ENGINES = {}  # engine name -> engine, pools are reported when metrics are rendered
+
+
+def instrument_engine(name: str, engine) -> None:
+    """Records time of every query of engine (sync or async) and adds it to current request"""
+    sync_engine = getattr(engine, "sync_engine", engine)
+    ENGINES[name] = sync_engine
+    label_values = (name,)
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _start_query(conn, cursor, statement, parameters, context, executemany) -> None:
+        conn.info["query_started"] = perf_counter()
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _finish_query(
+        conn, cursor, statement, parameters, context, executemany
+    ) -> None:
+        elapsed = perf_counter() - conn.info.pop("query_started")
+        query_duration.observe(label_values, elapsed)
+        stats = _request_stats.get()
+        if stats is not None:
+            stats.queries += 1
+            stats.db_seconds += elapsed
+
+
+def _pool_lines() -> list:
+    """Returns gauges of pooled connections of instrumented engines"""
+    lines = [
+        "# HELP db_pool_connections Connections of engine pool by state",
+        "# TYPE db_pool_connections gauge",
+    ]
+    for name, engine in sorted(ENGINES.items()):
+        pool = engine.pool
+        if not isinstance(pool, QueuePool):
+            continue
+        lines.append(
+            f'db_pool_connections{{engine="{name}",state="checked_out"}} {pool.checkedout()}'
+        )
+        lines.append(
+            f'db_pool_connections{{engine="{name}",state="idle"}} {pool.checkedin()}'
+        )
+    return lines
+
+
+def render() -> str:
+    """Returns all metrics in Prometheus text format"""
+    lines = []
+    for histogram in HISTOGRAMS:
+        lines.extend(histogram.render())
+    lines.extend(_pool_lines())
+    return "\n".join(lines) + "\n"
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording request metrics\n
+    Route label is path template of matched route ('/book/{id}'), so label sets don`t grow with ids.
+    Requests which matched no route are recorded with route 'unmatched'.
+    Does nothing if METRICS_ENABLED is false
+    """
+
+    def __init__(self, app):
+        """MetricsMiddleware constructor"""
+        self.app = app
+        self.__paths = (
+            {}
+        )  # endpoint -> path template of routes without 'route' in scope
+
+    def __route(self, scope) -> str:
+        """Returns path template of route which handled request"""
+        route = scope.get("route")
+        if route is not None:
+            return route.path
+        endpoint = scope.get("endpoint")
+        if endpoint is None:
+            return "unmatched"
+        path = self.__paths.get(endpoint)
+        if path is None:
+            path = next(
+                (
+                    route.path
+                    for route in scope["app"].routes
+                    if getattr(route, "endpoint", None) is endpoint
+                ),
+                "unmatched",
+            )
+            self.__paths[endpoint] = path
+        return path
+
+    async def __call__(self, scope, receive, send):
+        """Handles ASGI request"""
+        if scope["type"] != "http" or not settings.METRICS_ENABLED:
+            return await self.app(scope, receive, send)
+
+        status = 500
+
+        async def send_with_status(message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        stats = RequestStats()
+        token = _request_stats.set(stats)
+        started = perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = perf_counter() - started
+            _request_stats.reset(token)
+            label_values = (scope["method"], self.__route(scope))
+            request_duration.observe(label_values + (str(status),), elapsed)
+            request_queries.observe(label_values, stats.queries)
+            request_db_time.observe(label_values, stats.db_seconds)
+            request_pool_wait.observe(label_values, stats.pool_wait_seconds)
+            request_auth_time.observe(label_values, stats.auth_seconds)
@@ -18,6 +18,21 @@ config.set_main_option("sqlalchemy.url", DB_URL)
 
 target_metadata = Base.metadata
 
+# created by db/search.py DDL and not mapped by models, autogenerate must not drop them
+SEARCH_OBJECTS = {"search_vector", "ix_book_table_search_vector"}
+# partitions of rent_history are created by RentHistory.ensure_partitions
+PARTITION_PREFIX = "rent_history_"
+
+
+def include_object(object, name, type_, reflected, compare_to) -> bool:
+    """Skips full-text search objects and rent_history partitions in autogenerate comparison"""
+    if not reflected or compare_to is not None:
+        return True
+    if type_ == "table" and name.startswith(PARTITION_PREFIX):
+        return False
+    return name not in SEARCH_OBJECTS
+
+
 def run_migrations_offline() -> None:
     """Run migrations in 'offline' mode.
 
@@ -34,6 +49,7 @@ def run_migrations_offline() -> None:
     context.configure(
         url=url,
         target_metadata=target_metadata,
+        include_object=include_object,
         literal_binds=True,
         dialect_opts={"paramstyle": "named"},
     )
@@ -57,7 +73,9 @@ def run_migrations_online() -> None:
 
     with connectable.connect() as connection:
         context.configure(
-            connection=connection, target_metadata=target_metadata
+            connection=connection,
+            target_metadata=target_metadata,
+            include_object=include_object,
         )
 
         with context.begin_transaction():
@@ -0,0 +1,76 @@
+"""initial schema
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18 09:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "0001"
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "author_table",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("name", sa.String(length=100), nullable=False),
+        sa.Column("bio", sa.String(length=1000), nullable=False),
+        sa.Column("birth_date", sa.Date(), nullable=False),
+        sa.Column("author_hash", sa.String(length=32), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("author_hash"),
+    )
+    op.create_table(
+        "user_table",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("first_name", sa.String(length=100), nullable=False),
+        sa.Column("second_name", sa.String(length=100), nullable=False),
+        sa.Column("birth_date", sa.Date(), nullable=False),
+        sa.Column("username", sa.String(length=16), nullable=False),
+        sa.Column("password", sa.String(length=64), nullable=False),
+        sa.Column("is_admin", sa.Boolean(), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("username"),
+    )
+    op.create_table(
+        "book_table",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("name", sa.String(length=64), nullable=False),
+        sa.Column("description", sa.String(length=1000), nullable=False),
+        sa.Column("publication_date", sa.Date(), nullable=False),
+        sa.Column("author_id", sa.Integer(), nullable=False),
+        sa.Column("genre", sa.String(length=32), nullable=False),
+        sa.Column("quantity", sa.Integer(), nullable=False),
+        sa.Column("book_hash", sa.String(length=32), nullable=False),
+        sa.CheckConstraint("quantity >= 0"),
+        sa.ForeignKeyConstraint(["author_id"], ["author_table.id"]),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("book_hash"),
+    )
+    op.create_table(
+        "rent_table",
+        sa.Column("rent_id", sa.Integer(), nullable=False),
+        sa.Column("reader_id", sa.Integer(), nullable=False),
+        sa.Column("book_id", sa.Integer(), nullable=False),
+        sa.Column("issue_date", sa.Date(), nullable=False),
+        sa.Column("return_date", sa.Date(), nullable=False),
+        sa.ForeignKeyConstraint(["book_id"], ["book_table.id"]),
+        sa.ForeignKeyConstraint(["reader_id"], ["user_table.id"]),
+        sa.PrimaryKeyConstraint("rent_id"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("rent_table")
+    op.drop_table("book_table")
+    op.drop_table("user_table")
+    op.drop_table("author_table")
@@ -0,0 +1,38 @@
+"""longer password hashes
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18 09:10:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "0002"
+down_revision: Union[str, None] = "0001"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.alter_column(
+        "user_table",
+        "password",
+        existing_type=sa.String(length=64),
+        type_=sa.String(length=128),
+        existing_nullable=False,
+    )
+
+
+def downgrade() -> None:
+    op.alter_column(
+        "user_table",
+        "password",
+        existing_type=sa.String(length=128),
+        type_=sa.String(length=64),
+        existing_nullable=False,
+    )
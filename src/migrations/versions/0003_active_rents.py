@@ -0,0 +1,39 @@
+"""active_rents counter of readers
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18 09:15:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "0003"
+down_revision: Union[str, None] = "0002"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "user_table",
+        sa.Column("active_rents", sa.Integer(), server_default="0", nullable=False),
+    )
+    # counters of existing readers are filled from rent_table before the check is added
+    op.execute(
+        "UPDATE user_table SET active_rents = "
+        "(SELECT count(*) FROM rent_table WHERE rent_table.reader_id = user_table.id)"
+    )
+    # BOOKS_LIMIT_FOR_READER is checked by conditional updates of rents, so schema doesn`t depend on it
+    op.create_check_constraint(
+        "active_rents_not_negative", "user_table", "active_rents >= 0"
+    )
+
+
+def downgrade() -> None:
+    op.drop_constraint("active_rents_not_negative", "user_table", type_="check")
+    op.drop_column("user_table", "active_rents")
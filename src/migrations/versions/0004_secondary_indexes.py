@@ -0,0 +1,34 @@
+"""secondary indexes on foreign keys, genre and return_date
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18 09:20:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "0004"
+down_revision: Union[str, None] = "0003"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index("ix_book_table_author_id", "book_table", ["author_id"])
+    op.create_index("ix_book_table_genre", "book_table", ["genre"])
+    op.create_index("ix_rent_table_reader_id", "rent_table", ["reader_id"])
+    op.create_index("ix_rent_table_book_id", "rent_table", ["book_id"])
+    op.create_index("ix_rent_table_return_date", "rent_table", ["return_date"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_rent_table_return_date", table_name="rent_table")
+    op.drop_index("ix_rent_table_book_id", table_name="rent_table")
+    op.drop_index("ix_rent_table_reader_id", table_name="rent_table")
+    op.drop_index("ix_book_table_genre", table_name="book_table")
+    op.drop_index("ix_book_table_author_id", table_name="book_table")
@@ -0,0 +1,43 @@
+"""row versions of authors and books, per-table change counters
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18 11:40:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "0005"
+down_revision: Union[str, None] = "0004"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "author_table",
+        sa.Column("version", sa.Integer(), server_default="1", nullable=False),
+    )
+    op.add_column(
+        "book_table",
+        sa.Column("version", sa.Integer(), server_default="1", nullable=False),
+    )
+    table_version = op.create_table(
+        "table_version",
+        sa.Column("table_name", sa.String(length=64), nullable=False),
+        sa.Column("version", sa.BigInteger(), nullable=False),
+        sa.PrimaryKeyConstraint("table_name"),
+    )
+    # book listing ETag is built from row versions, only author_table has table counter
+    op.bulk_insert(table_version, [{"table_name": "author_table", "version": 1}])
+
+
+def downgrade() -> None:
+    op.drop_table("table_version")
+    op.drop_column("book_table", "version")
+    op.drop_column("author_table", "version")
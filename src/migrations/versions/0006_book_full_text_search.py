@@ -0,0 +1,60 @@
+"""full-text search vector of books with GIN index and triggers
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18 13:10:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "0006"
+down_revision: Union[str, None] = "0005"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# copy of db.search.POSTGRESQL_DDL at the time of migration with 'simple' text search configuration
+POSTGRESQL_DDL = [
+    "ALTER TABLE book_table ADD COLUMN IF NOT EXISTS search_vector tsvector",
+    "CREATE INDEX IF NOT EXISTS ix_book_table_search_vector ON book_table USING GIN (search_vector)",
+    """CREATE OR REPLACE FUNCTION book_search_vector_update() RETURNS trigger AS $$
+BEGIN
+    NEW.search_vector :=
+        setweight(to_tsvector('simple', coalesce(NEW.name, '')), 'A') ||
+        setweight(to_tsvector('simple', coalesce((SELECT name FROM author_table WHERE id = NEW.author_id), '')), 'B') ||
+        setweight(to_tsvector('simple', coalesce(NEW.description, '')), 'C');
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql""",
+    """CREATE TRIGGER book_search_vector BEFORE INSERT OR UPDATE OF name, description, author_id
+ON book_table FOR EACH ROW EXECUTE FUNCTION book_search_vector_update()""",
+    """CREATE OR REPLACE FUNCTION author_search_vector_update() RETURNS trigger AS $$
+BEGIN
+    UPDATE book_table SET name = name WHERE author_id = NEW.id;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql""",
+    """CREATE TRIGGER author_search_vector AFTER UPDATE OF name ON author_table
+FOR EACH ROW WHEN (OLD.name IS DISTINCT FROM NEW.name) EXECUTE FUNCTION author_search_vector_update()""",
+]
+
+
+def upgrade() -> None:
+    for statement in POSTGRESQL_DDL:
+        op.execute(statement)
+    # fills search_vector of existing books by book_search_vector trigger
+    op.execute("UPDATE book_table SET name = name")
+
+
+def downgrade() -> None:
+    op.execute("DROP TRIGGER IF EXISTS author_search_vector ON author_table")
+    op.execute("DROP TRIGGER IF EXISTS book_search_vector ON book_table")
+    op.execute("DROP FUNCTION IF EXISTS author_search_vector_update()")
+    op.execute("DROP FUNCTION IF EXISTS book_search_vector_update()")
+    op.drop_index("ix_book_table_search_vector", table_name="book_table")
+    op.drop_column("book_table", "search_vector")
@@ -0,0 +1,34 @@
+"""composite indexes of filtered and sorted book listing
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-18 14:30:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "0007"
+down_revision: Union[str, None] = "0006"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        "ix_book_table_genre_publication_date",
+        "book_table",
+        ["genre", "publication_date", "id"],
+    )
+    op.create_index(
+        "ix_book_table_publication_date", "book_table", ["publication_date", "id"]
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_book_table_publication_date", table_name="book_table")
+    op.drop_index("ix_book_table_genre_publication_date", table_name="book_table")
@@ -0,0 +1,38 @@
+"""overdue_rent table filled by overdue sweeper
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-18 18:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "0008"
+down_revision: Union[str, None] = "0007"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "overdue_rent",
+        sa.Column("rent_id", sa.Integer(), autoincrement=False, nullable=False),
+        sa.Column("reader_id", sa.Integer(), nullable=False),
+        sa.Column("book_id", sa.Integer(), nullable=False),
+        sa.Column("return_date", sa.Date(), nullable=False),
+        sa.Column("detected_date", sa.Date(), nullable=False),
+        sa.PrimaryKeyConstraint("rent_id"),
+    )
+    op.create_index(
+        op.f("ix_overdue_rent_reader_id"), "overdue_rent", ["reader_id"], unique=False
+    )
+
+
+def downgrade() -> None:
+    op.drop_index(op.f("ix_overdue_rent_reader_id"), table_name="overdue_rent")
+    op.drop_table("overdue_rent")
@@ -0,0 +1,50 @@
+"""rent_history archive of returned rents, partitioned by issue_date on PostgreSQL
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-18 19:00:00.000000
+
+"""
+
+from datetime import date
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "0009"
+down_revision: Union[str, None] = "0008"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "rent_history",
+        sa.Column("rent_id", sa.Integer(), autoincrement=False, nullable=False),
+        sa.Column("reader_id", sa.Integer(), nullable=False),
+        sa.Column("book_id", sa.Integer(), nullable=False),
+        sa.Column("issue_date", sa.Date(), nullable=False),
+        sa.Column("return_date", sa.Date(), nullable=False),
+        sa.Column("returned_date", sa.Date(), nullable=False),
+        sa.PrimaryKeyConstraint("rent_id", "issue_date"),
+        postgresql_partition_by="RANGE (issue_date)",
+    )
+    op.create_index(
+        "ix_rent_history_reader_id", "rent_history", ["reader_id", "rent_id"]
+    )
+    op.create_index("ix_rent_history_book_id", "rent_history", ["book_id", "rent_id"])
+    op.execute("CREATE TABLE rent_history_default PARTITION OF rent_history DEFAULT")
+    # partitions of older issue years of active rents: python history.py partitions
+    for year in (date.today().year, date.today().year + 1):
+        op.execute(
+            f"CREATE TABLE rent_history_y{year} PARTITION OF rent_history "
+            f"FOR VALUES FROM ('{year}-01-01') TO ('{year + 1}-01-01')"
+        )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_rent_history_book_id", table_name="rent_history")
+    op.drop_index("ix_rent_history_reader_id", table_name="rent_history")
+    op.drop_table("rent_history")
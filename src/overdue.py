@@ -0,0 +1,128 @@
+""" Overdue rents sweeper module \n
+    Use 'sweep_overdue' to copy rents with past return_date into overdue_rent table \n
+    Use 'overdue_sweeper_lifespan' as FastAPI lifespan to sweep periodically inside the app process \n
+    Run 'python overdue.py' from src directory to start standalone worker, 'python overdue.py --once' for one sweep
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import time
+from contextlib import asynccontextmanager
+from datetime import date
+from sqlalchemy import select, tuple_
+from config import settings
+from db.core import SessionLocal
+from db.models import Rent, OverdueRent
+
+logger = logging.getLogger(__name__)
+
+
+def sweep_overdue(
+    batch_size: int = settings.OVERDUE_SWEEP_BATCH_SIZE,
+    pause_sec: float = settings.OVERDUE_SWEEP_PAUSE_SEC,
+    today: date | None = None,
+) -> dict:
+    """Finds rents with return_date before today and adds them to overdue_rent\n
+    Rents are read by ix_rent_table_return_date in batches of 'batch_size' rows with keyset
+    condition (return_date, rent_id) > last processed rent, each batch in its own short transaction.
+    rent_table is only read and overdue_rent has no foreign key to it, so sweep takes no row locks there
+    and doesn`t block rents and returns. Rent returned after its batch was read is still inserted,
+    rows of returned rents are removed at the end. Returns counters of the sweep
+    """
+    today = today or date.today()
+    found = inserted = batches = 0
+    last = None
+    while True:
+        statement = select(
+            Rent.rent_id, Rent.reader_id, Rent.book_id, Rent.return_date
+        ).where(Rent.return_date < today)
+        if last is not None:
+            statement = statement.where(
+                tuple_(Rent.return_date, Rent.rent_id) > tuple_(*last)
+            )
+        statement = statement.order_by(Rent.return_date, Rent.rent_id).limit(batch_size)
+
+        with SessionLocal() as session:
+            rents = session.execute(statement).all()
+            if rents:
+                inserted += OverdueRent.add(session, rents, today)
+                session.commit()
+
+        found += len(rents)
+        batches += 1
+        if len(rents) < batch_size:
+            break
+        last = (rents[-1].return_date, rents[-1].rent_id)
+        if pause_sec:
+            # gives database time to other clients between batches
+            time.sleep(pause_sec)
+
+    with SessionLocal() as session:
+        purged = OverdueRent.purge_returned(session)
+        session.commit()
+
+    return {
+        "date": today.isoformat(),
+        "found": found,
+        "inserted": inserted,
+        "purged": purged,
+        "batches": batches,
+    }
+
+
+def run_worker(interval_sec: float) -> None:
+    """Sweeps overdue rents every 'interval_sec' seconds until interrupted"""
+    while True:
+        started = time.monotonic()
+        try:
+            print(json.dumps(sweep_overdue()))
+        except Exception:
+            logger.exception("Overdue sweep failed")
+        time.sleep(max(interval_sec - (time.monotonic() - started), 0))
+
+
+async def _sweep_periodically(interval_sec: float) -> None:
+    """Runs sweep in worker thread every 'interval_sec' seconds, so event loop is never blocked"""
+    while True:
+        try:
+            report = await asyncio.to_thread(sweep_overdue)
+            logger.info("Overdue sweep: %s", report)
+        except Exception:
+            logger.exception("Overdue sweep failed")
+        await asyncio.sleep(interval_sec)
+
+
+@asynccontextmanager
+async def overdue_sweeper_lifespan(app):
+    """FastAPI lifespan, starts periodic sweep if OVERDUE_SWEEP_INTERVAL_SEC > 0\n
+    With several app workers prefer the standalone worker, so rents are swept by one process
+    """
+    task = None
+    if settings.OVERDUE_SWEEP_INTERVAL_SEC > 0:
+        task = asyncio.create_task(
+            _sweep_periodically(settings.OVERDUE_SWEEP_INTERVAL_SEC)
+        )
+    try:
+        yield
+    finally:
+        if task is not None:
+            task.cancel()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Overdue rents sweeper")
+    parser.add_argument("--once", action="store_true", help="sweep once and exit")
+    parser.add_argument(
+        "--interval",
+        type=float,
+        default=settings.OVERDUE_SWEEP_INTERVAL_SEC or 300,
+        help="seconds between sweeps",
+    )
+    args = parser.parse_args()
+
+    if args.once:
+        print(json.dumps(sweep_overdue()))
+    else:
+        run_worker(args.interval)
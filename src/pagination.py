@@ -0,0 +1,167 @@
+""" Keyset pagination module \n
+    class PageParams provides 'limit' and 'after' query parameters as FastAPI dependency \n
+    Use 'paginate' to limit select statement and 'make_page' to form response \n
+    class CursorPageParams and 'paginate_sorted' provide pages ordered by other column than id,
+    their opaque cursor holds sort value and id of the last item \n
+    class OffsetPageParams provides 'limit' and 'offset' for ranked results, which have no id order
+"""
+
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from binascii import Error as Base64Error
+from fastapi import HTTPException, Query
+from sqlalchemy import Select, tuple_
+from config import settings
+
+
+class PageParams:
+    """Pagination query parameters\n
+    Attributes:
+    * limit - max amount of items in page, from 1 to MAX_PAGE_SIZE
+    * after - id of the last item of previous page (next_cursor of previous response)
+    """
+
+    def __init__(
+        self,
+        limit: int = Query(settings.DEFAULT_PAGE_SIZE, ge=1, le=settings.MAX_PAGE_SIZE),
+        after: int | None = Query(None, ge=0),
+    ):
+        """PageParams constructor"""
+        self.limit = limit
+        self.after = after
+
+
+def paginate(statement: Select, id_column, page: PageParams) -> Select:
+    """Limits statement to one page ordered by id column\n
+    Uses 'id > after' condition instead of offset, so any page costs one index range scan.
+    One extra row is selected to find out if next page exists
+    """
+    if page.after is not None:
+        statement = statement.where(id_column > page.after)
+    return statement.order_by(id_column).limit(page.limit + 1)
+
+
+class CursorPageParams:
+    """Pagination query parameters of listing with opaque cursor\n
+    Attributes:
+    * limit - max amount of items in page, from 1 to MAX_PAGE_SIZE
+    * after - next_cursor of previous response
+    """
+
+    def __init__(
+        self,
+        limit: int = Query(settings.DEFAULT_PAGE_SIZE, ge=1, le=settings.MAX_PAGE_SIZE),
+        after: str | None = Query(None, max_length=256),
+    ):
+        """CursorPageParams constructor"""
+        self.limit = limit
+        self.after = after
+
+
+def _sort_columns(sort_column, id_column) -> tuple:
+    """Returns columns whose values are stored in cursor"""
+    if sort_column is id_column:
+        return (id_column,)
+    return (sort_column, id_column)
+
+
+def encode_cursor(*values) -> str:
+    """Returns opaque cursor holding values, dates are stored in ISO format"""
+    data = json.dumps(
+        [
+            value.isoformat() if hasattr(value, "isoformat") else value
+            for value in values
+        ]
+    )
+    return urlsafe_b64encode(data.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, *columns) -> tuple:
+    """Returns values stored in cursor converted to python types of columns\n
+    Raises HTTPException 400 if cursor is malformed or was made for other columns
+    """
+    try:
+        values = json.loads(urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        if not isinstance(values, list) or len(values) != len(columns):
+            raise ValueError("wrong amount of values")
+        decoded = []
+        for column, value in zip(columns, values):
+            python_type = column.type.python_type
+            if hasattr(python_type, "fromisoformat"):
+                value = python_type.fromisoformat(value)
+            elif type(value) is not python_type:
+                raise ValueError("wrong type of value")
+            decoded.append(value)
+        return tuple(decoded)
+    except (Base64Error, UnicodeDecodeError, TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def paginate_sorted(
+    statement: Select, sort_column, id_column, page: CursorPageParams, descending=False
+) -> Select:
+    """Limits statement to one page ordered by sort column, then by id column\n
+    'after' cursor holds sort value and id of the last item (only id if sort column is id column),
+    next page starts with row-value comparison (sort_column, id) > (sort value, id).
+    Cursor doesn`t depend on the last item itself, so deleted or changed item doesn`t end
+    or shift listing. Composite index on (sort_column, id) serves any page with one index range scan
+    """
+    columns = _sort_columns(sort_column, id_column)
+    order = tuple_(*columns)
+    if page.after is not None:
+        after = tuple_(*decode_cursor(page.after, *columns))
+        statement = statement.where(order < after if descending else order > after)
+    if descending:
+        statement = statement.order_by(*(column.desc() for column in columns))
+    else:
+        statement = statement.order_by(*columns)
+    return statement.limit(page.limit + 1)
+
+
+def make_sorted_page(
+    items: list, page: CursorPageParams, sort_column, id_column
+) -> dict:
+    """Forms page response from items selected by paginate_sorted statement"""
+    columns = _sort_columns(sort_column, id_column)
+    return make_page(
+        items,
+        page,
+        get_id=lambda item: encode_cursor(
+            *(getattr(item, column.key) for column in columns)
+        ),
+    )
+
+
+def make_page(items: list, page: PageParams, get_id=lambda item: item.id) -> dict:
+    """Forms page response from items selected by paginated statement"""
+    next_cursor = None
+    if len(items) > page.limit:
+        items = items[: page.limit]
+        next_cursor = get_id(items[-1])
+    return {"items": items, "next_cursor": next_cursor}
+
+
+class OffsetPageParams:
+    """Offset pagination query parameters of ranked results\n
+    Attributes:
+    * limit - max amount of items in page, from 1 to MAX_PAGE_SIZE
+    * offset - amount of items to skip (next_offset of previous response), up to MAX_SEARCH_OFFSET
+    """
+
+    def __init__(
+        self,
+        limit: int = Query(settings.DEFAULT_PAGE_SIZE, ge=1, le=settings.MAX_PAGE_SIZE),
+        offset: int = Query(0, ge=0, le=settings.MAX_SEARCH_OFFSET),
+    ):
+        """OffsetPageParams constructor"""
+        self.limit = limit
+        self.offset = offset
+
+
+def make_offset_page(items: list, page: OffsetPageParams) -> dict:
+    """Forms page response from items selected with limit + 1 rows"""
+    next_offset = None
+    if len(items) > page.limit:
+        items = items[: page.limit]
+        next_offset = page.offset + page.limit
+    return {"items": items, "next_offset": next_offset}
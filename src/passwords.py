@@ -0,0 +1,157 @@
+""" Password hashing module \n
+    class PasswordHasher hashes and verifies passwords with scrypt in worker pool \n
+    Use 'password_hasher' object configured from settings
+"""
+
+import hmac
+from asyncio import wrap_future
+from base64 import b64decode, b64encode
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from hashlib import scrypt, sha256
+from os import urandom
+from threading import BoundedSemaphore
+from config import settings
+
+SCRYPT_PREFIX = "scrypt"
+SALT_BYTES = 16
+HASH_BYTES = 32
+
+
+def _scrypt_hash(password: str, salt: bytes, n: int, r: int, p: int) -> bytes:
+    """Computes scrypt key of password, runs in worker pool"""
+    return scrypt(
+        password.encode("utf-8"),
+        salt=salt,
+        n=n,
+        r=r,
+        p=p,
+        maxmem=256 * n * r + 1024 * 1024,
+        dklen=HASH_BYTES,
+    )
+
+
+def _encode(password: str, n: int, r: int, p: int) -> str:
+    """Hashes password with new salt into 'scrypt$n$r$p$salt$hash' string"""
+    salt = urandom(SALT_BYTES)
+    key = _scrypt_hash(password, salt, n, r, p)
+    fields = (str(n), str(r), str(p), b64encode(salt).decode(), b64encode(key).decode())
+    return "$".join((SCRYPT_PREFIX,) + fields)
+
+
+def _verify(password: str, password_hash: str) -> bool:
+    """Checks password against scrypt or legacy unsalted sha256 hash"""
+    if not password_hash.startswith(SCRYPT_PREFIX + "$"):
+        legacy_hash = sha256(password.encode("utf-8")).hexdigest()
+        return hmac.compare_digest(legacy_hash, password_hash)
+
+    _, n, r, p, salt, key = password_hash.split("$")
+    actual_key = _scrypt_hash(password, b64decode(salt), int(n), int(r), int(p))
+    return hmac.compare_digest(actual_key, b64decode(key))
+
+
+class PasswordHasher:
+    """Hashes and verifies passwords with scrypt\n
+    Hashing runs in bounded thread or process pool, amount of hashing requests
+    in work and in queue is limited, so login storms can`t take all request workers\n
+    Methods:
+    * hash - returns hash of password
+    * verify - checks password against stored hash
+    * needs_rehash - true if hash is legacy sha256 or uses outdated cost parameters
+    * hash_async, verify_async - same as hash and verify for async code
+    """
+
+    class Busy(Exception):
+        """Exception of overflowing hashing queue"""
+
+        reason: str = "Too many authentication requests. Try again later"
+
+    def __init__(
+        self,
+        n: int,
+        r: int,
+        p: int,
+        workers: int,
+        max_pending: int,
+        queue_timeout_sec: float,
+        use_processes: bool = False,
+    ):
+        """
+        Initialization of new PasswordHasher object.
+
+        :param n: scrypt CPU/memory cost, power of 2                     \n
+        :param r: scrypt block size                                      \n
+        :param p: scrypt parallelization                                 \n
+        :param workers: Amount of pool workers                           \n
+        :param max_pending: Max amount of hashing requests in work and in queue \n
+        :param queue_timeout_sec: Max wait time for free place in queue  \n
+        :param use_processes: Use process pool instead of thread pool    \n
+        """
+        self.n = n
+        self.r = r
+        self.p = p
+        self.workers = workers
+        self.queue_timeout_sec = queue_timeout_sec
+        self.use_processes = use_processes
+        self.__limiter = BoundedSemaphore(max_pending)
+        pool_class = ProcessPoolExecutor if use_processes else ThreadPoolExecutor
+        self.__pool = pool_class(max_workers=workers)  # workers start on first job
+
+    def __submit(self, function, *args, wait: bool = True) -> Future:
+        """Submits job to pool\n
+        Raises Busy if queue is full for queue_timeout_sec, or at once if wait is false
+        """
+        if wait:
+            acquired = self.__limiter.acquire(timeout=self.queue_timeout_sec)
+        else:
+            acquired = self.__limiter.acquire(blocking=False)
+        if not acquired:
+            raise self.Busy
+        try:
+            future = self.__pool.submit(function, *args)
+        except Exception:
+            self.__limiter.release()
+            raise
+        future.add_done_callback(lambda _: self.__limiter.release())
+        return future
+
+    def hash(self, password: str) -> str:
+        """Returns hash of password"""
+        return self.__submit(_encode, password, self.n, self.r, self.p).result()
+
+    def verify(self, password: str, password_hash: str) -> bool:
+        """Checks password against stored hash"""
+        return self.__submit(_verify, password, password_hash).result()
+
+    async def hash_async(self, password: str) -> str:
+        """Returns hash of password without blocking event loop"""
+        return await wrap_future(
+            self.__submit(_encode, password, self.n, self.r, self.p, wait=False)
+        )
+
+    async def verify_async(self, password: str, password_hash: str) -> bool:
+        """Checks password against stored hash without blocking event loop"""
+        return await wrap_future(
+            self.__submit(_verify, password, password_hash, wait=False)
+        )
+
+    def needs_rehash(self, password_hash: str) -> bool:
+        """True if hash is legacy sha256 or uses outdated cost parameters"""
+        if not password_hash.startswith(SCRYPT_PREFIX + "$"):
+            return True
+        _, n, r, p, _, _ = password_hash.split("$")
+        return (int(n), int(r), int(p)) != (self.n, self.r, self.p)
+
+    def shutdown(self) -> None:
+        """Stops worker pool"""
+        self.__pool.shutdown()
+
+
+password_hasher = PasswordHasher(
+    n=settings.PASSWORD_HASH_N,
+    r=settings.PASSWORD_HASH_R,
+    p=settings.PASSWORD_HASH_P,
+    workers=settings.PASSWORD_HASH_WORKERS,
+    max_pending=settings.PASSWORD_HASH_MAX_PENDING,
+    queue_timeout_sec=settings.PASSWORD_HASH_QUEUE_TIMEOUT_SEC,
+    use_processes=settings.PASSWORD_HASH_USE_PROCESSES,
+)
@@ -0,0 +1,168 @@
+""" Query budget module \n
+    Counts database queries of code block and compares their number with declared budget,
+    so N+1 loading and repeated queries are caught in tests and staging \n
+    Use 'query_budget' as endpoint decorator or as context manager \n
+    QUERY_BUDGET_MODE setting selects what happens when budget is exceeded:
+    'off' - decorators do nothing, 'log' - warning with all queries is logged,
+    'raise' - QueryBudgetExceeded is raised
+"""
+
+import functools
+import inspect
+import logging
+from contextlib import contextmanager
+from contextvars import ContextVar
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+MODES = ("off", "log", "raise")
+
+
+class QueryBudgetExceeded(Exception):
+    """Raised in 'raise' mode when block made more queries than its budget"""
+
+
+class QueryCounter:
+    """Queries made inside one budgeted block"""
+
+    __slots__ = ("name", "limit", "statements")
+
+    def __init__(self, name: str, limit: int):
+        """QueryCounter constructor"""
+        self.name = name
+        self.limit = limit
+        self.statements = []
+
+    @property
+    def count(self) -> int:
+        """Number of queries made"""
+        return len(self.statements)
+
+
+# Counters of budgeted blocks which are active in current context, nested blocks count the same query.
+# Sync endpoints run in threadpool and async sessions run in greenlets with the context of request
+_counters: ContextVar[tuple] = ContextVar("query_budget_counters", default=())
+
+
+@event.listens_for(Engine, "before_execute")
+def _count_query(conn, clauseelement, multiparams, params, execution_options) -> None:
+    """Adds statement to every active counter, listens to all engines\n
+    Statement is counted once even if driver runs it as several batches (executemany, insertmanyvalues),
+    so budgets don`t depend on database dialect
+    """
+    for counter in _counters.get():
+        counter.statements.append(clauseelement)
+
+
+class query_budget:
+    """Checks that block makes no more than 'limit' database queries\n
+    As decorator of sync or async function (endpoint) counts queries of every call:
+
+        @app.get("/book/{id}")
+        @query_budget(4)
+        def get_book(...):
+
+    As context manager returns QueryCounter of the block:
+
+        with query_budget(2, mode="raise") as counter:
+            ...
+
+    'mode' overrides QUERY_BUDGET_MODE. Decorated functions are called directly in 'off' mode,
+    context manager always counts queries, but checks them only in 'log' and 'raise' modes.
+    Blocks which ended with exception are not checked
+    """
+
+    def __init__(self, limit: int, name: str | None = None, mode: str | None = None):
+        """
+        Initialization of query budget.
+
+        :param limit: Maximum number of queries                          \n
+        :param name: Name of block in reports, function name by default   \n
+        :param mode: 'off', 'log' or 'raise', QUERY_BUDGET_MODE by default \n
+        """
+        if mode is not None and mode not in MODES:
+            raise ValueError(f"Unknown query budget mode '{mode}'")
+        self.limit = limit
+        self.name = name
+        self.mode = mode
+
+    def get_mode(self) -> str:
+        """Returns mode of budget"""
+        mode = self.mode or settings.QUERY_BUDGET_MODE
+        if mode not in MODES:
+            raise ValueError(f"Unknown query budget mode '{mode}'")
+        return mode
+
+    @contextmanager
+    def count(self, name: str):
+        """Counts queries of block and checks them when block is done"""
+        counter = QueryCounter(name, self.limit)
+        token = _counters.set(_counters.get() + (counter,))
+        try:
+            yield counter
+        finally:
+            _counters.reset(token)
+        self.check(counter)
+
+    def check(self, counter: QueryCounter) -> None:
+        """Logs or raises if counter exceeded budget"""
+        if counter.count <= self.limit:
+            return
+        mode = self.get_mode()
+        if mode == "off":
+            return
+        message = (
+            f"{counter.name} made {counter.count} queries, budget is {self.limit}:\n"
+        )
+        message += "\n".join(
+            f"{number}. {statement}"
+            for number, statement in enumerate(counter.statements, 1)
+        )
+        if mode == "raise":
+            raise QueryBudgetExceeded(message)
+        logger.warning(message)
+
+    def __enter__(self) -> QueryCounter:
+        """Starts counting queries\n
+        Counter is kept only in context variable, so one budget object can be used
+        by nested blocks and by concurrent threads and tasks
+        """
+        counter = QueryCounter(self.name or "block", self.limit)
+        _counters.set(_counters.get() + (counter,))
+        return counter
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        """Stops counting queries and checks budget"""
+        counters = _counters.get()
+        counter = counters[-1]  # blocks of one context exit in reverse order of entering
+        _counters.set(counters[:-1])
+        if exc_type is None:
+            self.check(counter)
+
+    def __call__(self, func):
+        """Decorates function, queries of every call are counted separately"""
+        name = self.name or func.__name__
+
+        if inspect.iscoroutinefunction(func):
+
+            @functools.wraps(func)
+            async def wrapper(*args, **kwargs):
+                if self.get_mode() == "off":
+                    return await func(*args, **kwargs)
+                with self.count(name):
+                    return await func(*args, **kwargs)
+
+        else:
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if self.get_mode() == "off":
+                    return func(*args, **kwargs)
+                with self.count(name):
+                    return func(*args, **kwargs)
+
+        wrapper.query_budget = self.limit
+        return wrapper
@@ -1,7 +1,15 @@
-"""Module containing Pydantic models for request validation"""
+"""Module containing Pydantic models for request validation and responses"""
 
 import datetime
-from pydantic import BaseModel, Field, field_validator
+from typing import Generic, Literal, TypeVar
+from pydantic import (
+    BaseModel,
+    ConfigDict,
+    Field,
+    computed_field,
+    field_validator,
+    model_validator,
+)
 
 
 class RegisterUserModel(BaseModel):
@@ -85,6 +93,27 @@ class BookCreateModel(BaseModel):
         return value
 
 
+class BookFilterModel(BaseModel):
+    """Model for validating filter and sort query parameters of book listing"""
+    genre: str | None = Field(None, max_length=32, min_length=1)
+    author_id: int | None = Field(None, gt=0)
+    published_from: datetime.date | None = None
+    published_to: datetime.date | None = None
+    available: bool = False
+    sort: Literal["id", "publication_date", "-publication_date"] = "id"
+
+    @model_validator(mode="after")
+    def check_publication_date_range(self):
+        """Validate that publication date range is not empty"""
+        if (
+            self.published_from is not None
+            and self.published_to is not None
+            and self.published_from > self.published_to
+        ):
+            raise ValueError("published_from must not be after published_to")
+        return self
+
+
 class BookRentModel(BaseModel):
     """Model for validating book rental requests"""
     reader_id: int
@@ -104,3 +133,153 @@ class BookRentModel(BaseModel):
 class RentReturnModel(BaseModel):
     """Model for validating book return requests"""
     rent_id: int
+
+
+class RentHistoryFilterModel(BaseModel):
+    """Model for validating filter query parameters of rent history listing"""
+    reader_id: int | None = Field(None, gt=0)
+    book_id: int | None = Field(None, gt=0)
+    issued_from: datetime.date | None = None
+    issued_to: datetime.date | None = None
+
+    @model_validator(mode="after")
+    def check_issue_date_range(self):
+        """Validate that issue date range is not empty"""
+        if (
+            self.issued_from is not None
+            and self.issued_to is not None
+            and self.issued_from > self.issued_to
+        ):
+            raise ValueError("issued_from must not be after issued_to")
+        return self
+
+
+class RentHistoryRecordModel(BaseModel):
+    """Model for validating returned rent records loaded by rent history backfill"""
+    rent_id: int = Field(gt=0)
+    reader_id: int = Field(gt=0)
+    book_id: int = Field(gt=0)
+    issue_date: datetime.date
+    return_date: datetime.date
+    returned_date: datetime.date
+
+    @model_validator(mode="after")
+    def check_returned_date(self):
+        """Validate that book was returned after issue"""
+        if self.returned_date < self.issue_date:
+            raise ValueError("returned_date must not be before issue_date")
+        return self
+
+
+class ResponseModel(BaseModel):
+    """Base of response models\n
+    Fields are read from ORM object attributes or dict keys,
+    response keys with spaces are declared as aliases
+    """
+    model_config = ConfigDict(from_attributes=True, populate_by_name=True)
+
+
+class AuthorResponseModel(ResponseModel):
+    """Author as returned to administrators"""
+    id: int
+    name: str
+    bio: str
+    birth_date: datetime.date
+    author_hash: str
+    version: int
+
+
+class BookResponseModel(ResponseModel):
+    """Book as returned to administrators"""
+    id: int
+    name: str
+    description: str
+    publication_date: datetime.date
+    author_id: int
+    genre: str
+    quantity: int
+    book_hash: str
+    version: int
+
+
+class BookReaderResponseModel(ResponseModel):
+    """Public fields of book returned to readers"""
+    name: str = Field(alias="Book name")
+    description: str = Field(alias="Description")
+    genre: str = Field(alias="Genre")
+    publication_date: datetime.date = Field(alias="Publication date")
+    author: str = Field(alias="Author")
+    id: int = Field(alias="Book Article")
+
+
+class BookSearchResultModel(ResponseModel):
+    """Book found by full-text search"""
+    id: int
+    name: str
+    author: str
+    genre: str
+    publication_date: datetime.date
+    rank: float
+
+
+class OverdueRentResponseModel(ResponseModel):
+    """Overdue rent found by overdue sweeper"""
+    rent_id: int
+    reader_id: int
+    book_id: int
+    return_date: datetime.date
+    detected_date: datetime.date
+
+    @computed_field
+    @property
+    def days_overdue(self) -> int:
+        """Days since return date"""
+        return (datetime.date.today() - self.return_date).days
+
+
+class RentHistoryResponseModel(ResponseModel):
+    """Returned rent from rent history"""
+    rent_id: int
+    reader_id: int
+    book_id: int
+    issue_date: datetime.date
+    return_date: datetime.date
+    returned_date: datetime.date
+
+
+class ReaderResponseModel(ResponseModel):
+    """Reader as returned to administrators"""
+    id: int
+    username: str
+    first_name: str
+    second_name: str
+    birth_date: datetime.date
+
+
+class ProfileResponseModel(ResponseModel):
+    """Profile of current user"""
+    username: str = Field(alias="Username")
+    first_name: str = Field(alias="First name")
+    second_name: str = Field(alias="Second name")
+    birth_date: datetime.date = Field(alias="Birth date")
+
+
+ItemModel = TypeVar("ItemModel", bound=BaseModel)
+
+
+class PageModel(BaseModel, Generic[ItemModel]):
+    """Keyset page of listing, see pagination.make_page"""
+    items: list[ItemModel]
+    next_cursor: int | None
+
+
+class CursorPageModel(BaseModel, Generic[ItemModel]):
+    """Keyset page of listing with opaque cursor, see pagination.make_sorted_page"""
+    items: list[ItemModel]
+    next_cursor: str | None
+
+
+class OffsetPageModel(BaseModel, Generic[ItemModel]):
+    """Offset page of ranked results, see pagination.make_offset_page"""
+    items: list[ItemModel]
+    next_offset: int | None
@@ -0,0 +1,119 @@
+"""Shared fixtures of tests
+
+Settings are read from .test.env, tables are created in throwaway SQLite database
+in pytest temporary directory, so tests never touch database from src/.env.
+"""
+
+from pathlib import Path
+from dotenv import load_dotenv
+
+load_dotenv(Path(__file__).parent.parent / ".test.env")
+
+import importlib
+from datetime import date
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event, update
+from sqlalchemy.ext.asyncio import create_async_engine
+import db.core as core
+import db.search  # registers full-text search DDL before tables are created
+from auth import token_cache, user_cache
+from config import settings
+from db.models import Base, User
+from overdue import sweep_overdue
+
+
+def _sqlite_pragmas(connection, record) -> None:
+    """Readers don`t wait for writers and foreign keys are checked, as in PostgreSQL"""
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("PRAGMA foreign_keys=ON")
+
+
+@pytest.fixture
+def engine(tmp_path):
+    """File-backed SQLite engine with all tables, bound to SessionLocal"""
+    engine = create_engine(
+        f"sqlite:///{tmp_path / 'test.sqlite'}",
+        connect_args={"timeout": 60, "check_same_thread": False},
+    )
+    event.listen(engine, "connect", _sqlite_pragmas)
+    Base.metadata.create_all(engine)
+    core.SessionLocal.configure(bind=engine)
+    yield engine
+    core.SessionLocal.configure(bind=core.engine)
+    engine.dispose()
+
+
+PASSWORD = "password1"
+
+
+@pytest.fixture(params=["main", "async_main"])
+def client(engine, request, monkeypatch):
+    """Client of sync or async app logged in as admin, with authors, books and rents"""
+    monkeypatch.setattr(settings, "QUERY_BUDGET_MODE", "raise")
+    async_engine = create_async_engine(
+        engine.url.set(drivername="sqlite+aiosqlite"), connect_args={"timeout": 60}
+    )
+    event.listen(async_engine.sync_engine, "connect", _sqlite_pragmas)
+    core.AsyncSessionLocal.configure(bind=async_engine)
+    module = importlib.import_module(request.param)
+    for cache in (
+        importlib.import_module("main").response_cache,
+        user_cache,
+        token_cache,
+    ):
+        cache.clear()
+
+    client = TestClient(module.app)
+    for username in ("admin", "reader"):
+        client.post(
+            "/auth/register",
+            json={
+                "first_name": "First",
+                "second_name": "Second",
+                "birth_date": "1990-01-01",
+                "username": username,
+                "password": PASSWORD,
+            },
+        ).raise_for_status()
+    with engine.begin() as connection:
+        connection.execute(
+            update(User).where(User.username == "admin").values(is_admin=True)
+        )
+    login(client, "admin")
+    for i in range(3):
+        client.post(
+            "/author/create",
+            json={"name": f"Author {i}", "bio": "bio", "birth_date": "1900-01-01"},
+        ).raise_for_status()
+        client.post(
+            "/book/create",
+            json={
+                "name": f"Book {i}",
+                "description": "description",
+                "publication_date": f"200{i}-01-01",
+                "author_id": i + 1,
+                "genre": "genre",
+                "quantity": 2,
+            },
+        ).raise_for_status()
+    for book_id in (1, 2):
+        rent = client.post(
+            "/book/rent",
+            json={"reader_id": 2, "book_id": book_id, "return_date": "2099-01-01"},
+        )
+        rent.raise_for_status()
+    client.post(
+        "/book/return", json={"rent_id": rent.json()["rent_id"]}
+    ).raise_for_status()
+    sweep_overdue(pause_sec=0, today=date(2100, 1, 1))  # the other rent is overdue
+
+    yield client
+    core.AsyncSessionLocal.configure(bind=core.async_engine)
+
+
+def login(client: TestClient, username: str) -> None:
+    """Logs client in, tokens are kept in its cookies"""
+    client.post(
+        "/auth/login", json={"username": username, "password": PASSWORD}
+    ).raise_for_status()
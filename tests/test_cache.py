@@ -0,0 +1,32 @@
+"""Read-through fills must not store values loaded before concurrent invalidation"""
+
+from cache import TTLCache
+
+
+def test_fill_after_invalidation_is_skipped():
+    cache = TTLCache(10, 60)
+    generation = cache.generation("book:1:admin")
+    cache.invalidate("book:1:admin")  # row changed while value was loaded
+    cache.set("book:1:admin", "stale", generation=generation)
+    assert cache.get("book:1:admin") is None
+
+    generation = cache.generation("book:1:admin")
+    cache.set("book:1:admin", "fresh", generation=generation)
+    assert cache.get("book:1:admin") == "fresh"
+
+
+def test_forgotten_generations_still_block_fill():
+    cache = TTLCache(2, 60)
+    generation = cache.generation("author:1:admin")
+    for key in ("author:1:admin", "author:2:admin", "author:3:admin"):
+        cache.invalidate(key)
+    cache.set("author:1:admin", "stale", generation=generation)
+    assert cache.get("author:1:admin") is None
+
+
+def test_clear_blocks_fills_started_before_it():
+    cache = TTLCache(10, 60)
+    generation = cache.generation("book:2:reader")
+    cache.clear()
+    cache.set("book:2:reader", "stale", generation=generation)
+    assert cache.get("book:2:reader") is None
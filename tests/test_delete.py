@@ -0,0 +1,29 @@
+"""Deletes answer 404 for missing rows and 400 for rows still referenced"""
+
+import pytest
+
+
+@pytest.mark.parametrize("path", ["/author/99", "/book/99"])
+def test_missing_row_is_not_found(client, path):
+    response = client.delete(path)
+    assert response.status_code == 404, response.text
+
+
+@pytest.mark.parametrize(
+    "path, detail",
+    [
+        ("/author/1", "Cannot delete author with books"),
+        ("/book/1", "Cannot delete book with active rents"),
+    ],
+)
+def test_referenced_row_is_kept(client, path, detail):
+    response = client.delete(path)
+    assert response.status_code == 400
+    assert response.json()["detail"] == detail
+    assert client.get(path).status_code == 200
+
+
+def test_unreferenced_rows_are_deleted(client):
+    for path in ("/book/3", "/author/3"):
+        assert client.delete(path).status_code == 200
+        assert client.get(path).json() is None
@@ -0,0 +1,80 @@
+"""Overdue sweep must not fail on rents returned while it runs"""
+
+from datetime import date
+from sqlalchemy import delete, insert, select
+from db.models import User, Author, Book, Rent, OverdueRent
+import overdue
+
+
+def test_rent_returned_during_sweep_is_skipped(engine, monkeypatch):
+    with engine.begin() as connection:
+        connection.execute(
+            insert(User),
+            [
+                {
+                    "id": 1,
+                    "first_name": "Reader",
+                    "second_name": "1",
+                    "birth_date": date(1990, 1, 1),
+                    "username": "reader1",
+                    "password": "-",
+                    "is_admin": False,
+                }
+            ],
+        )
+        connection.execute(
+            insert(Author),
+            [
+                {
+                    "id": 1,
+                    "name": "Author",
+                    "bio": "bio",
+                    "birth_date": date(1900, 1, 1),
+                    "author_hash": "a" * 32,
+                }
+            ],
+        )
+        connection.execute(
+            insert(Book),
+            [
+                {
+                    "id": 1,
+                    "name": "Book",
+                    "description": "description",
+                    "publication_date": date(2000, 1, 1),
+                    "author_id": 1,
+                    "genre": "genre",
+                    "quantity": 2,
+                    "book_hash": "b" * 32,
+                }
+            ],
+        )
+        connection.execute(
+            insert(Rent),
+            [
+                {
+                    "rent_id": i,
+                    "reader_id": 1,
+                    "book_id": 1,
+                    "issue_date": date(2020, 1, 1),
+                    "return_date": date(2020, 2, 1),
+                }
+                for i in (1, 2)
+            ],
+        )
+
+    add = OverdueRent.add
+
+    def add_after_return(session, rents, detected_date):
+        # rent 1 is returned between reading of the batch and its insert
+        with engine.begin() as connection:
+            connection.execute(delete(Rent).where(Rent.rent_id == 1))
+        return add(session, rents, detected_date)
+
+    monkeypatch.setattr(OverdueRent, "add", add_after_return)
+    report = overdue.sweep_overdue(pause_sec=0, today=date(2020, 3, 1))
+
+    assert not OverdueRent.__table__.foreign_keys
+    assert (report["found"], report["inserted"], report["purged"]) == (2, 2, 1)
+    with engine.connect() as connection:
+        assert connection.scalars(select(OverdueRent.rent_id)).all() == [2]
@@ -0,0 +1,101 @@
+"""Sorted book listing must continue from cursor values, not from the row they were taken from"""
+
+from datetime import date
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import delete, insert, update
+from sqlalchemy.orm import Session
+from db.models import Author, Book
+from main import BOOK_SORTS, book_list_statement
+from pagination import CursorPageParams, encode_cursor, make_sorted_page
+from validators import BookFilterModel
+
+BOOKS = 9
+
+
+@pytest.fixture
+def books(engine):
+    """Books with ids 1..BOOKS, three of them per publication year"""
+    with engine.begin() as connection:
+        connection.execute(
+            insert(Author),
+            [
+                {
+                    "id": 1,
+                    "name": "Author",
+                    "bio": "bio",
+                    "birth_date": date(1900, 1, 1),
+                    "author_hash": "a" * 32,
+                }
+            ],
+        )
+        connection.execute(
+            insert(Book),
+            [
+                {
+                    "id": i,
+                    "name": f"Book {i}",
+                    "description": "description",
+                    "publication_date": date(2000 + i % 3, 1, 1),
+                    "author_id": 1,
+                    "genre": "genre",
+                    "quantity": 1,
+                    "book_hash": f"{i:032x}",
+                }
+                for i in range(1, BOOKS + 1)
+            ],
+        )
+    return engine
+
+
+def list_page(engine, sort: str, after: str | None, limit: int = 3) -> dict:
+    """Returns page of book listing as make_sorted_page forms it for response"""
+    filters = BookFilterModel(sort=sort)
+    page = CursorPageParams(limit=limit, after=after)
+    with Session(engine) as session:
+        items = session.scalars(book_list_statement(filters, page)).all()
+        return make_sorted_page(items, page, BOOK_SORTS[sort][0], Book.id)
+
+
+def order(sort: str) -> list:
+    """Expected ids of listing sorted by publication date, then by id"""
+    keys = {i: (2000 + i % 3, i) for i in range(1, BOOKS + 1)}
+    return sorted(keys, key=keys.get, reverse=sort.startswith("-"))
+
+
+@pytest.mark.parametrize("sort", ["publication_date", "-publication_date"])
+def test_deleted_last_item_does_not_end_listing(books, sort):
+    first = list_page(books, sort, None)
+    with books.begin() as connection:
+        connection.execute(delete(Book).where(Book.id == first["items"][-1].id))
+
+    second = list_page(books, sort, first["next_cursor"])
+    assert [book.id for book in second["items"]] == order(sort)[3:6]
+
+
+def test_changed_sort_value_does_not_skip_rows(books):
+    first = list_page(books, "publication_date", None)
+    with books.begin() as connection:
+        connection.execute(
+            update(Book)
+            .where(Book.id == first["items"][-1].id)
+            .values(publication_date=date(1990, 1, 1))
+        )
+
+    second = list_page(books, "publication_date", first["next_cursor"])
+    assert [book.id for book in second["items"]] == order("publication_date")[3:6]
+
+
+@pytest.mark.parametrize(
+    "sort, cursor",
+    [
+        ("id", "not a cursor"),
+        ("id", encode_cursor(date(2000, 1, 1), 1)),
+        ("publication_date", encode_cursor(1)),
+        ("publication_date", encode_cursor("2000-13-01", 1)),
+    ],
+)
+def test_malformed_cursor_is_rejected(books, sort, cursor):
+    with pytest.raises(HTTPException) as error:
+        list_page(books, sort, cursor)
+    assert error.value.status_code == 400
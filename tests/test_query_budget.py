@@ -0,0 +1,59 @@
+"""Catalog reads must stay within their query budgets in 'raise' mode"""
+
+import pytest
+from sqlalchemy import create_engine, text
+from conftest import login
+from query_budget import QueryBudgetExceeded, query_budget
+
+
+@pytest.mark.parametrize(
+    "path, params",
+    [
+        ("/author", {}),
+        ("/author", {"limit": 1, "after": 1}),
+        ("/book", {}),
+        ("/book", {"genre": "genre", "available": True, "sort": "-publication_date"}),
+        ("/reader", {}),
+        ("/rent/overdue", {}),
+        ("/rent/history", {}),
+    ],
+)
+def test_list_endpoints_within_budget(client, path, params):
+    response = client.get(path, params=params)
+    assert response.status_code == 200, response.text
+    assert response.json()["items"]
+
+
+@pytest.mark.parametrize("path", ["/author/1", "/book/1", "/reader/2", "/profile"])
+def test_detail_endpoints_within_budget(client, path):
+    for _ in range(2):  # response cache miss, then hit
+        response = client.get(path)
+        assert response.status_code == 200, response.text
+        assert response.json()
+
+
+def test_reader_book_view_within_budget(client):
+    login(client, "reader")
+    for _ in range(2):
+        response = client.get("/book/1")
+        assert response.status_code == 200, response.text
+        assert response.json()["Author"] == "Author 0"
+
+
+def test_conditional_reads_within_budget(client):
+    for path in ("/author", "/book", "/author/1", "/book/1"):
+        etag = client.get(path).headers["etag"]
+        response = client.get(path, headers={"If-None-Match": etag})
+        assert response.status_code == 304, path
+
+
+def test_exceeded_budget_raises():
+    engine = create_engine("sqlite://")
+    budget = query_budget(1, name="two selects", mode="raise")
+    with engine.connect() as connection:
+        with pytest.raises(QueryBudgetExceeded, match="two selects made 2 queries"):
+            with budget:
+                connection.execute(text("SELECT 1"))
+                with budget as inner:  # the same budget object counts nested block separately
+                    connection.execute(text("SELECT 2"))
+                assert inner.count == 1
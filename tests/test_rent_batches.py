@@ -0,0 +1,108 @@
+"""Batch returns must not drive active_rents below zero and must name rows that failed"""
+
+from datetime import date
+import pytest
+from sqlalchemy import insert, select, update
+from config import settings
+from db.core import SessionLocal
+from db.models import User, Author, Book, Rent
+
+RETURN_DATE = date(2099, 1, 1)
+
+
+@pytest.fixture
+def rents(engine):
+    """Two readers with one rent each, returns their rent ids"""
+    with engine.begin() as connection:
+        connection.execute(
+            insert(User),
+            [
+                {
+                    "id": i,
+                    "first_name": "Reader",
+                    "second_name": str(i),
+                    "birth_date": date(1990, 1, 1),
+                    "username": f"reader{i}",
+                    "password": "-",
+                    "is_admin": False,
+                }
+                for i in (1, 2)
+            ],
+        )
+        connection.execute(
+            insert(Author),
+            [
+                {
+                    "id": 1,
+                    "name": "Author",
+                    "bio": "bio",
+                    "birth_date": date(1900, 1, 1),
+                    "author_hash": "a" * 32,
+                }
+            ],
+        )
+        connection.execute(
+            insert(Book),
+            [
+                {
+                    "id": 1,
+                    "name": "Book",
+                    "description": "description",
+                    "publication_date": date(2000, 1, 1),
+                    "author_id": 1,
+                    "genre": "genre",
+                    "quantity": 2,
+                    "book_hash": "b" * 32,
+                }
+            ],
+        )
+    with SessionLocal() as session:
+        report = Rent.rent_books(
+            session, [(1, 1, RETURN_DATE), (2, 1, RETURN_DATE)], all_or_nothing=True
+        )
+    return [item["rent_id"] for item in report["ids"]]
+
+
+def test_return_with_drifted_counter_names_reader(engine, rents):
+    with engine.begin() as connection:
+        connection.execute(update(User).where(User.id == 2).values(active_rents=0))
+
+    with SessionLocal() as session:
+        with pytest.raises(Rent.BatchFailed) as error:
+            Rent.return_books(session, rents, all_or_nothing=False)
+
+    assert error.value.errors == [
+        {"index": 1, "detail": "Reader 2 has fewer active rents than returned"}
+    ]
+    with engine.connect() as connection:
+        assert connection.scalar(select(Book.quantity).where(Book.id == 1)) == 0
+        assert connection.scalars(
+            select(User.active_rents).order_by(User.id)
+        ).all() == [1, 0]
+        assert len(connection.execute(select(Rent.rent_id)).all()) == 2
+
+
+def test_returns_restore_counters(engine, rents):
+    with SessionLocal() as session:
+        report = Rent.return_books(session, rents)
+
+    assert report["returned"] == 2
+    with engine.connect() as connection:
+        assert connection.scalar(select(Book.quantity).where(Book.id == 1)) == 2
+        assert connection.scalars(
+            select(User.active_rents).order_by(User.id)
+        ).all() == [0, 0]
+
+
+def test_reader_above_lowered_limit_can_return(engine, rents, monkeypatch):
+    with SessionLocal() as session:
+        Rent.return_books(session, rents[1:])
+        second = Rent.rent_books(session, [(1, 1, RETURN_DATE)])["ids"][0]["rent_id"]
+    monkeypatch.setattr(settings, "BOOKS_LIMIT_FOR_READER", 0)
+
+    with SessionLocal() as session:
+        report = Rent.return_books(session, [second])
+
+    assert report["returned"] == 1
+    with engine.connect() as connection:
+        assert connection.scalar(select(User.active_rents).where(User.id == 1)) == 1